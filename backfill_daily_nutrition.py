@@ -0,0 +1,27 @@
+"""Перестраивает таблицу daily_nutrition из истории eatlog.
+
+Usage:
+  python backfill_daily_nutrition.py              # все ученики
+  python backfill_daily_nutrition.py STUDENT_ID   # один ученик
+"""
+import sys
+
+from flask_app import app
+from models import db
+from daily_nutrition import backfill
+
+
+def run_backfill(student_id=None):
+    with app.app_context():
+        try:
+            rows = backfill(student_id)
+            db.session.commit()
+            target = f"student {student_id}" if student_id is not None else "all students"
+            print(f"Backfill completed for {target}: {rows} daily rows written")
+        except Exception as e:
+            print(f"Error during backfill: {str(e)}")
+            db.session.rollback()
+
+
+if __name__ == "__main__":
+    run_backfill(int(sys.argv[1]) if len(sys.argv) > 1 else None)
@@ -0,0 +1,87 @@
+"""Поиск блюда по штрихкоду с LRU-кэшем barcode -> Eat.id.
+
+В очереди на обед один и тот же упакованный продукт сканируют десятки раз
+подряд. Кэш на процесс (воркер) запоминает id найденного блюда, дальше
+строка берётся по первичному ключу. Попадание проверяется (у строки всё ещё
+этот штрихкод), поэтому удаление/изменение блюда в другом воркере не даёт
+устаревшего результата. Отсутствующие штрихкоды не кэшируются — продукт
+могли только что добавить через add_food.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from models import db, Eat
+
+
+class BarcodeCache:
+    """Потокобезопасный LRU barcode -> id с ограничением размера."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, barcode: str) -> Optional[int]:
+        with self._lock:
+            food_id = self._data.get(barcode)
+            if food_id is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(barcode)
+            self.hits += 1
+            return food_id
+
+    def put(self, barcode: str, food_id: int) -> None:
+        with self._lock:
+            self._data[barcode] = food_id
+            self._data.move_to_end(barcode)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, barcode: str) -> None:
+        with self._lock:
+            self._data.pop(barcode, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+barcode_cache = BarcodeCache()
+
+
+def normalize_barcode(barcode) -> Optional[str]:
+    """Обрезает пробелы; пустой штрихкод -> None (в БД хранится NULL)."""
+    if barcode is None:
+        return None
+    barcode = str(barcode).strip()
+    return barcode or None
+
+
+def find_food_by_barcode(barcode) -> Optional[Eat]:
+    """Eat с данным штрихкодом или None."""
+    barcode = normalize_barcode(barcode)
+    if barcode is None:
+        return None
+
+    food_id = barcode_cache.get(barcode)
+    if food_id is not None:
+        # get() сначала смотрит identity map сессии, затем — SELECT по первичному ключу
+        food = db.session.get(Eat, food_id)
+        if food is not None and food.barcode == barcode:
+            return food
+        barcode_cache.discard(barcode)
+
+    food = Eat.query.filter_by(barcode=barcode).first()
+    if food is not None:
+        barcode_cache.put(barcode, food.id)
+    return food
+
+
+__all__ = ["BarcodeCache", "barcode_cache", "find_food_by_barcode", "normalize_barcode"]
@@ -0,0 +1,63 @@
+"""Сброс кэшей в памяти воркеров после изменения данных.
+
+Кэши на процесс (food_suggest, school_menu) сбрасываются после commit,
+затронувшего нужные модели. Текущий воркер делает это сразу (watch_commits),
+а остальные узнают об изменении по mtime stamp-файла в instance/ (ChangeStamp).
+"""
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class ChangeStamp:
+    """Файл, mtime которого — версия данных, общая для всех воркеров."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def version(self) -> Optional[int]:
+        try:
+            return self.path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def touch(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.touch()
+            os.utime(self.path)
+        except OSError:
+            pass
+
+
+def watch_commits(models: Iterable[type], callback: Callable[[], None],
+                  predicate: Optional[Callable[[object], bool]] = None) -> None:
+    """Вызывает callback после каждого commit, добавившего/изменившего/удалившего объект models.
+
+    predicate(obj), если задан, дополнительно отбирает объекты, изменение которых важно.
+    """
+    models = tuple(models)
+    # у каждого наблюдателя свой флаг в session.info
+    flag = f'changed:{id(callback)}'
+
+    @event.listens_for(Session, 'after_flush')
+    def _mark_changed(session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, models) and (predicate is None or predicate(obj)):
+                session.info[flag] = True
+                return
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop(flag, False):
+            callback()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop(flag, None)
+
+
+__all__ = ["ChangeStamp", "watch_commits"]
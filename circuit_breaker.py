@@ -0,0 +1,185 @@
+"""Предохранитель (circuit breaker) и гистограммы задержек для вызовов внешних API.
+
+После failure_threshold ошибок или таймаутов подряд предохранитель
+размыкается: вызовы сразу получают CircuitOpenError, не занимая поток на
+время ожидания ответа. Через reset_timeout секунд пропускается ровно один
+пробный вызов (half-open). Если он успешен, предохранитель замыкается. Если
+нет — снова размыкается на reset_timeout. Остальные вызовы, пришедшие во
+время пробы, тоже получают CircuitOpenError.
+
+Состояние и гистограммы — на процесс (воркер), как счетчики кэша анализа фото.
+Предохранители регистрируются по имени (get_breaker), чтобы приложение могло
+отдать их состояние для мониторинга, не импортируя модули, где они созданы.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# верхние границы корзин, секунды
+DEFAULT_BUCKETS = (0.25, 0.5, 1, 2, 5, 10, 20, 30, 60)
+
+
+class CircuitOpenError(Exception):
+    """Вызов не выполнялся: предохранитель разомкнут; retry_after — секунд до пробного вызова."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f'Circuit {name} is open, retry in {retry_after:.0f}s')
+        self.name = name
+        self.retry_after = retry_after
+
+
+class LatencyHistogram:
+    """Накопительная гистограмма задержек в стиле Prometheus: le -> число вызовов не дольше le."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sum += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for le, count in zip(list(self.buckets) + ['+Inf'], counts):
+            running += count
+            cumulative[str(le)] = running
+        return {'buckets': cumulative, 'count': running, 'sum': round(total, 3)}
+
+
+class CircuitBreaker:
+    """Предохранитель одного внешнего API.
+
+    is_timeout(exc) отличает таймауты от прочих ошибок в счетчиках и
+    гистограммах; для предохранителя и то и другое — неудачный вызов.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 is_timeout: Optional[Callable[[BaseException], bool]] = None,
+                 clock: Callable[[], float] = time.monotonic, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.is_timeout = is_timeout or (lambda exc: isinstance(exc, TimeoutError))
+        self.clock = clock
+        self.latency = {outcome: LatencyHistogram(buckets) for outcome in ('ok', 'error', 'timeout')}
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.counters = {'calls': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Можно ли вызывать API сейчас; в half-open разрешает только один пробный вызов."""
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.counters['opened'] += 1
+                self._state = OPEN
+                self._opened_at = self.clock()
+                self._probe_in_flight = False
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) под защитой предохранителя; CircuitOpenError, если он разомкнут."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            outcome = 'timeout' if self.is_timeout(exc) else 'error'
+            self.latency[outcome].observe(time.perf_counter() - start)
+            with self._lock:
+                self.counters['calls'] += 1
+                self.counters['failures'] += 1
+                if outcome == 'timeout':
+                    self.counters['timeouts'] += 1
+            self.record_failure()
+            raise
+        self.latency['ok'].observe(time.perf_counter() - start)
+        with self._lock:
+            self.counters['calls'] += 1
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            failures = self._failures
+        return {
+            'state': self.state,
+            'consecutive_failures': failures,
+            'failure_threshold': self.failure_threshold,
+            'reset_timeout': self.reset_timeout,
+            'retry_after': round(self.retry_after(), 1),
+            **counters,
+            'latency': {outcome: h.snapshot() for outcome, h in self.latency.items()},
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Предохранитель с этим именем; при первом обращении создается с параметрами kwargs."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
+
+
+def breakers() -> Dict[str, CircuitBreaker]:
+    with _breakers_lock:
+        return dict(_breakers)
+
+
+__all__ = ["CLOSED", "HALF_OPEN", "OPEN", "CircuitBreaker", "CircuitOpenError", "LatencyHistogram",
+           "breakers", "get_breaker"]
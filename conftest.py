@@ -0,0 +1,67 @@
+"""Общие фикстуры тестов.
+
+Каждый тест, которому нужна база, получает свою SQLite-базу в tmp_path
+(фикстура app_db): тесты не зависят друг от друга и от порядка запуска и могут
+идти параллельно (pytest-xdist). flask_app при импорте создает таблицы в
+DATABASE_URL, поэтому до импорта она указывает на базу во временном каталоге
+этого процесса, а не на instance/.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+_import_dir = tempfile.mkdtemp(prefix='school_food_test_')
+atexit.register(shutil.rmtree, _import_dir, ignore_errors=True)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_import_dir, 'school_food.db')
+
+import pytest
+from sqlalchemy import create_engine, event
+
+
+@pytest.fixture
+def app_db(tmp_path, monkeypatch):
+    """Пустая база со всеми таблицами в tmp_path на время теста; возвращает ее engine.
+
+    Stamp-файлы кэшей воркера (их трогает каждый commit, меняющий Eat/PackItem)
+    на время теста тоже лежат в tmp_path, а не в instance/.
+    """
+    import flask_app
+    from change_stamp import ChangeStamp
+    from flask_app import app
+    from models import db
+
+    for cache in (flask_app.school_menu, flask_app.food_suggest_index, flask_app.food_classifier):
+        monkeypatch.setattr(cache, 'stamp', ChangeStamp(tmp_path / cache.stamp.path.name))
+
+    engine = create_engine('sqlite:///' + str(tmp_path / 'school_food.db'))
+    # db.engines — словарь engine'ов приложения; контекст нужен только для доступа к нему,
+    # держать его на время теста нельзя: запросы тестового клиента делили бы с ним g
+    with app.app_context():
+        engines = db.engines
+        previous = engines[None]
+        engines[None] = engine
+        db.create_all()
+    try:
+        yield engine
+    finally:
+        with app.app_context():
+            db.session.remove()
+        engines[None] = previous
+        engine.dispose()
+
+
+@pytest.fixture
+def count_queries(app_db):
+    """with count_queries() as statements: — SQL-запросы к тестовой базе внутри блока."""
+    @contextmanager
+    def counting():
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(app_db, 'before_cursor_execute', listener)
+        try:
+            yield statements
+        finally:
+            event.remove(app_db, 'before_cursor_execute', listener)
+    return counting
@@ -0,0 +1,164 @@
+"""Материализованная дневная сводка питания (таблица daily_nutrition).
+
+Каждый новый EatLog добавляется через `add_log`, который в той же транзакции
+увеличивает строку (student_id, day). Страницы и отчёты читают суммы отсюда,
+а не пересчитывают сырые логи. Накопленную историю переносит `backfill`:
+при старте приложения, если сводка пуста, а логи есть, и вручную через
+backfill_daily_nutrition.py.
+"""
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, DailyNutrition, EatLog
+
+
+def today_key() -> date:
+    """Текущий день сводки. Логи пишутся с created_at = datetime.utcnow(), поэтому
+    и «сегодня» считается по UTC, а не по локальной дате сервера."""
+    return datetime.utcnow().date()
+
+
+def _empty_totals() -> Dict[str, float]:
+    return {'calories': 0.0, 'protein': 0.0, 'fat': 0.0, 'carbs': 0.0, 'count': 0}
+
+
+def _row_totals(row) -> Dict[str, float]:
+    return {
+        'calories': round(float(row.calories or 0), 1),
+        'protein': round(float(row.protein or 0), 1),
+        'fat': round(float(row.fat or 0), 1),
+        'carbs': round(float(row.carbs or 0), 1),
+        'count': int(row.log_count or 0),
+    }
+
+
+def _increment(student_id: int, day: date, calories: float, protein: float,
+               fat: float, carbs: float, count: int) -> None:
+    # Одна вставка с ON CONFLICT DO UPDATE: первый лог дня создает строку, следующие
+    # увеличивают ее выражением — параллельные запросы не теряют обновлений
+    stmt = sqlite_insert(DailyNutrition).values(
+        student_id=student_id, day=day,
+        calories=calories, protein=protein,
+        fat=fat, carbs=carbs, log_count=count,
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[DailyNutrition.student_id, DailyNutrition.day],
+        set_={
+            'calories': DailyNutrition.calories + stmt.excluded.calories,
+            'protein': DailyNutrition.protein + stmt.excluded.protein,
+            'fat': DailyNutrition.fat + stmt.excluded.fat,
+            'carbs': DailyNutrition.carbs + stmt.excluded.carbs,
+            'log_count': DailyNutrition.log_count + stmt.excluded.log_count,
+        },
+    ))
+
+
+def add_log(log: EatLog) -> EatLog:
+    """Добавляет лог в сессию и учитывает его в дневной сводке.
+
+    Commit не выполняется — вызывающий код коммитит лог и сводку вместе.
+    """
+    if log.created_at is None:
+        log.created_at = datetime.utcnow()
+    db.session.add(log)
+    _increment(log.student_id, log.created_at.date(),
+               float(log.calories or 0), float(log.protein or 0),
+               float(log.fat or 0), float(log.carbs or 0), 1)
+    return log
+
+
+def add_logs(logs: Iterable[EatLog]) -> List[EatLog]:
+    """Пакетный вариант add_log: все логи — одной вставкой (executemany),
+    сводка — одним обновлением на (ученик, день). Commit выполняет вызывающий код.
+
+    Объекты не добавляются в сессию и id не получают (RETURNING заставил бы
+    SQLite вставлять строки по одной).
+    """
+    logs = list(logs)
+    if not logs:
+        return logs
+    now = datetime.utcnow()
+    groups: Dict[tuple, List[EatLog]] = {}
+    for log in logs:
+        if log.created_at is None:
+            log.created_at = now
+        groups.setdefault((log.student_id, log.created_at.date()), []).append(log)
+    db.session.execute(insert(EatLog), [
+        {'student_id': l.student_id, 'food_id': l.food_id, 'name': l.name,
+         'calories': l.calories, 'protein': l.protein, 'fat': l.fat, 'carbs': l.carbs,
+         'created_at': l.created_at}
+        for l in logs
+    ])
+    for (student_id, day), group in groups.items():
+        _increment(student_id, day,
+                   sum(float(l.calories or 0) for l in group),
+                   sum(float(l.protein or 0) for l in group),
+                   sum(float(l.fat or 0) for l in group),
+                   sum(float(l.carbs or 0) for l in group),
+                   len(group))
+    return logs
+
+
+def get_daily_totals(student_id: int, start: Optional[date] = None,
+                     end: Optional[date] = None) -> Dict[str, Dict[str, float]]:
+    """Возвращает {'YYYY-MM-DD': {calories, protein, fat, carbs, count}} за период (включительно)."""
+    q = DailyNutrition.query.filter(DailyNutrition.student_id == student_id)
+    if start is not None:
+        q = q.filter(DailyNutrition.day >= start)
+    if end is not None:
+        q = q.filter(DailyNutrition.day <= end)
+    return {row.day.isoformat(): _row_totals(row) for row in q.order_by(DailyNutrition.day).all()}
+
+
+def get_day_totals(student_ids: Iterable[int], day: Optional[date] = None) -> Dict[int, Dict[str, float]]:
+    """Сводка за один день для нескольких учеников одним запросом: {student_id: totals}.
+
+    Для учеников без логов за день возвращаются нули.
+    """
+    ids = list(student_ids)
+    day = day or today_key()
+    result = {sid: _empty_totals() for sid in ids}
+    if not ids:
+        return result
+    rows = DailyNutrition.query.filter(
+        DailyNutrition.student_id.in_(ids),
+        DailyNutrition.day == day
+    ).all()
+    for row in rows:
+        result[row.student_id] = _row_totals(row)
+    return result
+
+
+def backfill(student_id: Optional[int] = None) -> int:
+    """Перестраивает сводку из истории EatLog (для всех учеников или одного).
+
+    Возвращает количество записанных дневных строк. Commit выполняет вызывающий код.
+    """
+    clear = delete(DailyNutrition)
+    source = select(
+        EatLog.student_id,
+        func.date(EatLog.created_at),
+        func.coalesce(func.sum(EatLog.calories), 0.0),
+        func.coalesce(func.sum(EatLog.protein), 0.0),
+        func.coalesce(func.sum(EatLog.fat), 0.0),
+        func.coalesce(func.sum(EatLog.carbs), 0.0),
+        func.count(EatLog.id),
+    )
+    if student_id is not None:
+        clear = clear.where(DailyNutrition.student_id == student_id)
+        source = source.where(EatLog.student_id == student_id)
+    source = source.group_by(EatLog.student_id, func.date(EatLog.created_at))
+
+    db.session.execute(clear)
+    res = db.session.execute(
+        insert(DailyNutrition).from_select(
+            ['student_id', 'day', 'calories', 'protein', 'fat', 'carbs', 'log_count'], source
+        )
+    )
+    return res.rowcount
+
+
+__all__ = ["add_log", "add_logs", "get_daily_totals", "get_day_totals", "backfill", "today_key"]
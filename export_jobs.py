@@ -0,0 +1,265 @@
+"""Фоновые задачи выгрузки отчётов.
+
+POST создаёт задачу, пул потоков воркера строит файл, статус опрашивается
+по id. Состояние задачи и готовый файл лежат на диске (result_dir), поэтому
+статус и скачивание работают из любого воркера gunicorn. Готовые файлы живут
+ttl секунд. Одинаковые задачи (ключ — ученик, формат, водяной знак логов),
+которые ещё выполняются, не запускаются повторно — в том числе из другого
+воркера: ключ занимается lock-файлом <хэш ключа>.lock в result_dir, который
+создаётся атомарно (os.link, как O_EXCL, но сразу с id задачи внутри) и
+удаляется по завершении задачи. Lock упавшего воркера снимает следующая
+такая же задача или purge_expired, когда его задача истекла.
+
+Та же очередь обслуживает анализ фото (см. photo_jobs в flask_app.py): там
+max_pending ограничивает число задач воркера, чтобы всплеск загрузок не
+копил бесконечный хвост обращений к Gemini.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class QueueFull(Exception):
+    """В очереди воркера уже max_pending задач"""
+
+
+class ExportJobQueue:
+    """Очередь выгрузок: пул из max_workers потоков и каталог с результатами.
+
+    render(path) вызывается в потоке пула, пишет файл в path и возвращает
+    описание результата: {'download_name', 'mimetype'} для файла или {'url'}
+    для внешнего отчёта (Google Sheets). max_pending — предел задач воркера
+    (в очереди и выполняющихся), None — без предела.
+    """
+
+    def __init__(self, result_dir, max_workers: int = 2, ttl: int = 3600, max_pending: Optional[int] = None):
+        self.result_dir = Path(result_dir)
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor = None
+        self._jobs: Dict[str, dict] = {}
+        self._inflight: Dict[Hashable, str] = {}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # пул создаётся лениво — уже в воркере, а не в мастере gunicorn до fork
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='export')
+        return self._executor
+
+    def _meta_path(self, job_id: str) -> Path:
+        return self.result_dir / f'{job_id}.json'
+
+    def result_path(self, job_id: str) -> Path:
+        return self.result_dir / f'{job_id}.data'
+
+    def _lock_path(self, key: Hashable) -> Path:
+        return self.result_dir / f"{hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]}.lock"
+
+    @staticmethod
+    def _lock_owner(path: Path) -> Optional[str]:
+        try:
+            return path.read_text(encoding='utf-8')
+        except OSError:
+            return None
+
+    def _claim(self, key: Hashable, job_id: str) -> Optional[dict]:
+        """Занимает ключ за job_id во всех воркерах.
+
+        Возвращает незавершённую задачу другого воркера, если ключ уже занят ею,
+        иначе None (ключ занят за job_id).
+        """
+        path = self._lock_path(key)
+        tmp = path.with_name(f'{path.name}.{job_id}.tmp')
+        tmp.write_text(job_id, encoding='utf-8')
+        try:
+            for _ in range(2):
+                try:
+                    os.link(tmp, path)
+                    return None
+                except FileExistsError:
+                    pass
+                owner = self._lock_owner(path)
+                job = self._load(owner) if owner else None
+                if job is not None and job['status'] in (QUEUED, RUNNING):
+                    return job
+                # lock остался от завершённой задачи или умершего воркера
+                if self._lock_owner(path) == owner:
+                    self._remove_file(path)
+            return None
+        finally:
+            self._remove_file(tmp)
+
+    def _release(self, key: Hashable, job_id: str) -> None:
+        path = self._lock_path(key)
+        if self._lock_owner(path) == job_id:
+            self._remove_file(path)
+
+    def _save(self, job: dict) -> None:
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.result_dir / f"{job['id']}.json.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path(job['id']))
+
+    def submit(self, key: Hashable, owner_id: int, render: Callable[[Path], dict], **info) -> dict:
+        """Ставит задачу в очередь или возвращает уже выполняющуюся с тем же ключом (в любом воркере).
+
+        Raises:
+            QueueFull: в воркере уже max_pending задач
+        """
+        self.purge_expired()
+        with self._lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return dict(self._jobs[job_id])
+            if self.max_pending is not None and len(self._inflight) >= self.max_pending:
+                raise QueueFull(f'В очереди уже {len(self._inflight)} задач')
+            job = {
+                'id': uuid.uuid4().hex,
+                'owner_id': owner_id,
+                'status': QUEUED,
+                'created_at': time.time(),
+                'finished_at': None,
+                'expires_at': None,
+                'error': None,
+                'result': None,
+            }
+            job.update(info)
+            # метаданные пишутся до lock-файла: другой воркер, увидевший lock, найдёт задачу
+            self._save(job)
+            other = self._claim(key, job['id'])
+            if other is not None:
+                self._remove_file(self._meta_path(job['id']))
+                return other
+            self._jobs[job['id']] = job
+            self._inflight[key] = job['id']
+            self._pool().submit(self._run, key, job['id'], render)
+            return dict(job)
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._save(job)
+
+    def _run(self, key: Hashable, job_id: str, render: Callable[[Path], dict]) -> None:
+        self._update(job_id, status=RUNNING)
+        path = self.result_path(job_id)
+        try:
+            result = render(path)
+            fields = {'status': DONE, 'result': result}
+        except Exception as e:
+            logger.exception('Export job %s failed', job_id)
+            self._remove_file(path)
+            fields = {'status': FAILED, 'error': str(e) or e.__class__.__name__}
+        finished = time.time()
+        self._update(job_id, finished_at=finished, expires_at=finished + self.ttl, **fields)
+        self._release(key, job_id)
+        with self._lock:
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+            # состояние дальше читается с диска, как в остальных воркерах
+            self._jobs.pop(job_id, None)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Задача по id (из памяти или с диска); None, если её нет или срок хранения истёк."""
+        if not _JOB_ID_RE.match(job_id or ''):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        job = self._load(job_id)
+        if job is None:
+            self._delete(job_id)
+        return job
+
+    def _load(self, job_id: str) -> Optional[dict]:
+        """Задача с диска; None, если её нет или срок хранения истёк."""
+        try:
+            with open(self._meta_path(job_id), encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(job, time.time()):
+            return None
+        return job
+
+    def _expired(self, job: dict, now: float) -> bool:
+        if job.get('expires_at') is not None:
+            return job['expires_at'] <= now
+        # незавершённая задача умершего воркера
+        return job.get('created_at', 0) + self.ttl <= now
+
+    def purge_expired(self) -> int:
+        """Удаляет задачи и файлы с истёкшим сроком хранения; возвращает число удалённых задач."""
+        now = time.time()
+        removed = 0
+        try:
+            metas = list(self.result_dir.glob('*.json'))
+        except OSError:
+            return 0
+        with self._lock:
+            active = set(self._jobs)
+        for meta in metas:
+            job_id = meta.stem
+            if job_id in active:
+                continue
+            try:
+                with open(meta, encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if self._expired(job, now):
+                self._delete(job_id)
+                removed += 1
+        # lock-файлы задач, которых больше нет (воркер умер, задача истекла)
+        for lock in self.result_dir.glob('*.lock'):
+            owner = self._lock_owner(lock)
+            if owner is not None and not (self.result_dir / f'{owner}.json').exists():
+                self._remove_file(lock)
+        return removed
+
+    def _delete(self, job_id: str) -> None:
+        self._remove_file(self.result_path(job_id))
+        self._remove_file(self._meta_path(job_id))
+
+    @staticmethod
+    def _remove_file(path) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Ждёт завершения всех задач этого воркера (для тестов и скриптов)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if not self._inflight:
+                    return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            time.sleep(0.01)
+
+
+__all__ = ["DONE", "ExportJobQueue", "FAILED", "QUEUED", "QueueFull", "RUNNING"]
@@ -1,15 +1,128 @@
 """
-Ленивая обёртка для analyze_image_with_gemini.
-Импорт реализации выполняется при первом вызове, чтобы не ломать
-загрузку приложения, если модуль или зависимости отсутствуют на старом/целевом хосте.
+Анализ фото еды через подключаемые бэкенды.
+
+Бэкенд — объект с методом analyze(image_path), который возвращает словарь
+{name, serving_size, calories, protein, fat, carbs} или None, если он
+недоступен или не распознал блюдо. Бэкенды регистрируются по имени
+(register_backend), а analyze_image проходит цепочку имён (например,
+"gemini,local") до первого результата. Цепочка берётся из конфигурации
+FOOD_ANALYSIS_BACKENDS (по умолчанию "gemini").
+
+Встроенные бэкенды:
+- gemini — Google Gemini (food_detection_impl, импортируется лениво, чтобы не
+  ломать загрузку приложения, если модуль или зависимости отсутствуют);
+- stub — детерминированный ответ без сети для тестов, CI и нагрузочных прогонов;
+- local — классификатор на CPU по фото из таблицы Eat (food_detection_local),
+  регистрируется приложением.
 """
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, List, Union
+import hashlib
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+Result = Dict[str, Union[str, float]]
+
+DEFAULT_BACKENDS = os.environ.get('FOOD_ANALYSIS_BACKENDS', 'gemini')
+
+
+class AnalysisBackend:
+	"""Бэкенд анализа фото; name — имя в FOOD_ANALYSIS_BACKENDS."""
+
+	name = ''
+
+	def analyze(self, image_path: str) -> Optional[Result]:
+		raise NotImplementedError
+
+
+class GeminiBackend(AnalysisBackend):
+	name = 'gemini'
+
+	def analyze(self, image_path: str) -> Optional[Result]:
+		return analyze_image_with_gemini(image_path)
+
+
+class StubBackend(AnalysisBackend):
+	"""Одно из фиксированных блюд, выбранное по sha1 файла: одно фото — всегда один ответ.
+
+	delay (FOOD_STUB_DELAY, секунды) имитирует время ответа модели в нагрузочных прогонах.
+	"""
+
+	name = 'stub'
+	DISHES = (
+		('Гречка с котлетой', '250г', 380.0, 21.0, 15.0, 40.0),
+		('Борщ со сметаной', '300г', 180.0, 6.0, 9.0, 18.0),
+		('Омлет', '150г', 230.0, 15.0, 17.0, 3.0),
+		('Макароны с сыром', '250г', 420.0, 16.0, 14.0, 56.0),
+	)
+
+	def __init__(self, delay: float = 0.0):
+		self.delay = delay
+
+	def analyze(self, image_path: str) -> Optional[Result]:
+		with open(image_path, 'rb') as f:
+			digest = hashlib.sha1(f.read()).digest()
+		if self.delay:
+			time.sleep(self.delay)
+		name, serving, calories, protein, fat, carbs = self.DISHES[digest[0] % len(self.DISHES)]
+		return {'name': name, 'serving_size': serving, 'calories': calories,
+		        'protein': protein, 'fat': fat, 'carbs': carbs}
 
-def analyze_image_with_gemini(image_path: str) -> Optional[Dict[str, Union[str, float]]]:
+
+_backends: Dict[str, AnalysisBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def register_backend(backend: AnalysisBackend, name: Optional[str] = None) -> None:
+	"""Регистрирует (или заменяет) бэкенд под именем name (по умолчанию backend.name)."""
+	with _backends_lock:
+		_backends[name or backend.name] = backend
+
+
+def get_backend(name: str) -> Optional[AnalysisBackend]:
+	return _backends.get(name)
+
+
+def backend_names() -> List[str]:
+	return sorted(_backends)
+
+
+def parse_chain(value: Union[str, List[str], None]) -> List[str]:
+	"""'gemini, local' или ['gemini', 'local'] -> ['gemini', 'local']."""
+	if value is None:
+		value = DEFAULT_BACKENDS
+	if isinstance(value, str):
+		value = value.split(',')
+	return [name.strip().lower() for name in value if name and name.strip()]
+
+
+def analyze_image(image_path: str, backends: Union[str, List[str], None] = None) -> Optional[Result]:
+	"""Первый непустой результат по цепочке бэкендов; в результате source — имя бэкенда.
+
+	Ошибка или None одного бэкенда — переход к следующему; None, если не ответил ни один.
+	"""
+	for name in parse_chain(backends):
+		backend = get_backend(name)
+		if backend is None:
+			logger.warning(f'Unknown food analysis backend: {name}')
+			continue
+		try:
+			result = backend.analyze(image_path)
+		except Exception:
+			logger.exception(f'Food analysis backend {name} failed')
+			result = None
+		if result:
+			result = dict(result)
+			result.setdefault('source', name)
+			return result
+		logger.info(f'Food analysis backend {name} returned no result, trying next')
+	return None
+
+
+def analyze_image_with_gemini(image_path: str) -> Optional[Result]:
 	"""Вызвать реальную реализацию из food_detection_impl, если она доступна.
 
 	Возвращает результат или None при ошибке / отсутствии SDK / ключа.
@@ -28,4 +141,9 @@ def analyze_image_with_gemini(image_path: str) -> Optional[Dict[str, Union[str,
 		return None
 
 
-__all__ = ["analyze_image_with_gemini"]
\ No newline at end of file
+register_backend(GeminiBackend())
+register_backend(StubBackend(delay=float(os.environ.get('FOOD_STUB_DELAY', 0))))
+
+
+__all__ = ["AnalysisBackend", "GeminiBackend", "StubBackend", "analyze_image", "analyze_image_with_gemini",
+           "backend_names", "get_backend", "parse_chain", "register_backend"]
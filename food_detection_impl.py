@@ -9,6 +9,23 @@ implementation is defensive:
 - Any exceptions during the call are caught and logged; the function returns
   None on failure.
 
+Successful results are cached by image content (see image_cache.py), so the
+same photo uploaded again or by another student does not hit the API.
+The photo is downscaled and re-encoded as a metadata-free JPEG before it is
+sent (see image_prep.py).
+
+The SDK setup (.env loading, import, genai.configure, GenerativeModel and the
+generation config) is done once per process by get_client() and reused by all
+requests and threads; gunicorn calls warm_up() in post_fork so that the first
+upload in a worker does not pay for it either.
+
+Each request has a deadline (GEMINI_TIMEOUT seconds, no SDK retries), so a hung
+upstream call does not pin a worker until gunicorn kills it. The call goes through
+the "gemini" circuit breaker (see circuit_breaker.py): after
+GEMINI_BREAKER_FAILURES failures or timeouts in a row, requests fail fast without
+calling the API for GEMINI_BREAKER_RESET seconds, then a single probe decides
+whether to close it again. Cached results are still served while it is open.
+
 If you prefer the previous behaviour (always return "food not found" with 0
 values), we can change the fallback to return that stub instead of None.
 """
@@ -17,10 +34,150 @@ from typing import Dict, Union, Optional
 import os
 import json
 import logging
+import threading
 from PIL import Image
 
+from circuit_breaker import CircuitOpenError, get_breaker
+from image_cache import default_cache, fingerprint
+from image_prep import image_blob, load_for_analysis
+
 logger = logging.getLogger(__name__)
 
+MODEL_NAME = 'gemini-2.5-flash'
+
+# Define response schema (mirror the JS example). We will request JSON.
+NUTRITION_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "foodName": {"type": "STRING", "description": "Detected food name"},
+        "servingSize": {"type": "STRING", "description": "Estimated serving size"},
+        "calories": {"type": "NUMBER", "description": "Estimated calories"},
+        "protein": {"type": "NUMBER", "description": "Protein grams"},
+        "fat": {"type": "NUMBER", "description": "Fat grams"},
+        "carbohydrates": {"type": "NUMBER", "description": "Carbs grams"},
+    },
+    "required": ["foodName", "servingSize", "calories", "protein", "fat", "carbohydrates"],
+}
+
+# Дедлайн одного запроса, секунды; должен быть заметно меньше timeout воркера gunicorn
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 30))
+
+PROMPT = "Определи еду на этом изображении. Оцени размер порции и предоставь примерную оценку пищевой ценности для порции, показанной на фото. Если на изображении нет еды, укажи это в 'foodName' и установи все значения питательных веществ на 0. Ответ должен быть только в формате JSON."
+
+
+class GeminiClient:
+    """Configured model and generation config, shared by all threads of the process."""
+
+    def __init__(self, model, generation_config):
+        self.model = model
+        self.generation_config = generation_config
+
+    def generate(self, prompt, timeout: Optional[float] = None):
+        # retry=None: одна попытка в пределах дедлайна, повторы решает предохранитель
+        return self.model.generate_content(prompt, generation_config=self.generation_config,
+                                           request_options={'timeout': timeout, 'retry': None})
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    if isinstance(exc, TimeoutError):
+        return True
+    try:
+        from google.api_core.exceptions import DeadlineExceeded
+    except Exception:
+        return False
+    return isinstance(exc, DeadlineExceeded)
+
+
+breaker = get_breaker(
+    'gemini',
+    failure_threshold=int(os.environ.get('GEMINI_BREAKER_FAILURES', 5)),
+    reset_timeout=float(os.environ.get('GEMINI_BREAKER_RESET', 30)),
+    is_timeout=_is_timeout,
+)
+
+
+_client: Optional[GeminiClient] = None
+_client_lock = threading.Lock()
+_dotenv_loaded = False
+
+
+def _load_dotenv_once() -> None:
+    # Загружаем переменные окружения из .env файла (один раз на процесс)
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        logger.info("Loaded environment variables from .env file")
+    except ImportError:
+        logger.warning("python-dotenv not installed, skipping .env file")
+
+
+def _create_client() -> Optional[GeminiClient]:
+    # Lazy import of SDK to avoid hard dependency at module import time
+    try:
+        import google.generativeai as genai
+        logger.info('Successfully imported google.generativeai')
+    except Exception as e:
+        logger.error(f'Failed to import google.generativeai: {str(e)}')
+        return None
+
+    # Read API key from environment or .env (prefer env)
+    api_key = os.getenv('GEMINI_API_KEY') or os.getenv('API_KEY')
+    if not api_key:
+        logger.warning('GEMINI_API_KEY or API_KEY not set; image analysis disabled.')
+        return None
+    logger.info('Using GEMINI API key from environment (value not logged).')
+
+    try:
+        genai.configure(api_key=api_key)
+        # configure() drops the SDK's cached service clients; building the client here
+        # once keeps one gRPC channel (and its TLS connection) for all requests
+        from google.generativeai import client as genai_client
+        genai_client.get_default_generative_client()
+        model = genai.GenerativeModel(MODEL_NAME)
+        generation_config = genai.types.GenerationConfig(
+            response_mime_type='application/json',
+            response_schema=NUTRITION_SCHEMA,
+        )
+        logger.info('Successfully configured google.generativeai SDK')
+    except Exception as e:
+        logger.error(f'Failed to configure google.generativeai SDK: {e}. Check SDK installation/version.')
+        return None
+    return GeminiClient(model, generation_config)
+
+
+def get_client() -> Optional[GeminiClient]:
+    """Client of this process, created on first use; None if the SDK or API key is missing.
+
+    A failed setup is not cached, so a key added later (e.g. to .env before a
+    reload) is picked up by the next call.
+    """
+    global _client
+    client = _client
+    if client is not None:
+        return client
+    with _client_lock:
+        if _client is None:
+            _load_dotenv_once()
+            _client = _create_client()
+        return _client
+
+
+def reset_client() -> None:
+    """Forget the client (after an API key change, in tests)."""
+    global _client, _dotenv_loaded
+    with _client_lock:
+        _client = None
+        _dotenv_loaded = False
+
+
+def warm_up() -> bool:
+    """Create the client ahead of the first request (gunicorn post_fork hook)."""
+    return get_client() is not None
+
 
 def _safe_float(v: Union[str, float, int, None]) -> float:
     try:
@@ -37,77 +194,55 @@ def analyze_image_with_gemini(image_path: str) -> Optional[Dict[str, Union[str,
     Returns a dict with keys: name, serving_size, calories, protein, fat, carbs
     or None if analysis is not available (API key missing or error).
     """
-    # Загружаем переменные окружения из .env файла
-    try:
-        from dotenv import load_dotenv
-        load_dotenv()
-        logger.info("Loaded environment variables from .env file")
-    except ImportError:
-        logger.warning("python-dotenv not installed, skipping .env file")
+    # open image downscaled to IMAGE_MAX_EDGE (see image_prep.py); this also checks the file is readable
     try:
-        # Lazy import of SDK to avoid hard dependency at module import time
-        try:
-            import google.generativeai as genai
-            logger.info('Successfully imported google.generativeai')
-        except Exception as e:
-            logger.error(f'Failed to import google.generativeai: {str(e)}')
-            return None
+        img_copy = load_for_analysis(image_path)
+        logger.info(f'Opened image {image_path}, prepared size={img_copy.size}')
+    except Exception as e:
+        logger.error(f'Failed to open image {image_path}: {e}')
+        return None
 
-        # Read API key from environment or .env (prefer env)
-        api_key = os.getenv('GEMINI_API_KEY') or os.getenv('API_KEY')
-        if not api_key:
-            logger.warning('GEMINI_API_KEY or API_KEY not set; image analysis disabled.')
-            return None
-        logger.info('Using GEMINI API key from environment (value not logged).')
+    # Тот же (или почти тот же) снимок уже анализировали — отдаем из кэша
+    cache = fp = None
+    try:
+        cache = default_cache()
+        fp = fingerprint(img_copy)
+        cached = cache.get(fp)
+        if cached is not None:
+            logger.info(f'Image analysis cache hit for {image_path}')
+            return cached
+    except Exception as e:
+        logger.exception(f'Image analysis cache lookup failed: {e}')
 
+    result = _analyze_with_gemini(img_copy)
+    if result is not None and fp is not None:
         try:
-            genai.configure(api_key=api_key)
-            logger.info('Successfully configured google.generativeai SDK')
+            cache.put(fp, result)
         except Exception as e:
-            logger.error(f'Failed to configure google.generativeai SDK: {e}. Check SDK installation/version.')
-            return None
+            logger.exception(f'Failed to store image analysis result in cache: {e}')
+    return result
 
-        # open image to ensure file exists and is readable; make a copy to pass to SDK
-        try:
-            with Image.open(image_path) as img:
-                img_copy = img.copy()
-                logger.info(f'Opened image {image_path}, size={img.size}')
-        except Exception as e:
-            logger.error(f'Failed to open image {image_path}: {e}')
-            return None
 
-        # Define response schema (mirror the JS example). We will request JSON.
-        nutrition_schema = {
-            "type": "OBJECT",
-            "properties": {
-                "foodName": {"type": "STRING", "description": "Detected food name"},
-                "servingSize": {"type": "STRING", "description": "Estimated serving size"},
-                "calories": {"type": "NUMBER", "description": "Estimated calories"},
-                "protein": {"type": "NUMBER", "description": "Protein grams"},
-                "fat": {"type": "NUMBER", "description": "Fat grams"},
-                "carbohydrates": {"type": "NUMBER", "description": "Carbs grams"},
-            },
-            "required": ["foodName", "servingSize", "calories", "protein", "fat", "carbohydrates"],
-        }
+def _analyze_with_gemini(img_copy: Image.Image) -> Optional[Dict[str, Union[str, float]]]:
+    """Один запрос к Gemini для подготовленного изображения (JPEG без EXIF); None при ошибке."""
+    try:
+        client = get_client()
+        if client is None:
+            return None
 
-        prompt = [
-            "Определи еду на этом изображении. Оцени размер порции и предоставь примерную оценку пищевой ценности для порции, показанной на фото. Если на изображении нет еды, укажи это в 'foodName' и установи все значения питательных веществ на 0. Ответ должен быть только в формате JSON.",
-            img_copy,
-        ]
+        blob = image_blob(img_copy)
+        logger.info(f'Sending {len(blob["data"])} bytes of JPEG to Gemini')
+        prompt = [PROMPT, blob]
 
         # Call the SDK to generate content. Wrap in try/except because SDK public
         # API may differ between versions; surface clear logs if it's incompatible.
         try:
             logger.info('Calling genai.GenerativeModel.generate_content...')
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    response_mime_type='application/json',
-                    response_schema=nutrition_schema,
-                ),
-            )
+            response = breaker.call(client.generate, prompt, timeout=GEMINI_TIMEOUT)
             logger.info('Gemini API call succeeded')
+        except CircuitOpenError as e:
+            logger.warning(f'Skipping Gemini API call: {e}')
+            return None
         except Exception as e:
             logger.exception(f'Error while calling google.generativeai SDK: {e}')
             return None
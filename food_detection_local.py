@@ -0,0 +1,160 @@
+"""Локальное распознавание блюд на CPU — без сети и без внешних моделей.
+
+Эталоны — фото блюд из таблицы Eat (Eat.image, файлы в static/uploads и
+static/img). Для каждого эталона считается цветовая гистограмма (64 корзины
+RGB по уменьшенному кадру), загруженное фото относится к ближайшему эталону
+по пересечению гистограмм, а КБЖУ берутся из строки Eat этого блюда. Если
+сходство ниже min_similarity, бэкенд ничего не возвращает и цепочка
+(см. food_detection.analyze_image) идёт дальше.
+
+Для школьной столовой с постоянным меню этого хватает, чтобы узнать
+знакомые блюда, когда Gemini недоступен. Набор эталонов строится лениво и
+сбрасывается так же, как индекс подсказок (food_suggest): после commit,
+затронувшего Eat, и по stamp-файлу в остальных воркерах. Гистограммы
+неизменившихся файлов при пересборке берутся из кэша (путь + mtime).
+"""
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from change_stamp import ChangeStamp, watch_commits
+from food_detection import AnalysisBackend
+from image_prep import load_for_analysis
+from models import db, Eat
+
+# сторона кадра, по которому строится гистограмма
+FEATURE_EDGE = 64
+_LEVELS = 4  # уровней на канал: 4 * 4 * 4 = 64 корзины
+
+
+def color_histogram(img) -> Tuple[float, ...]:
+    """Нормированная 64-корзинная RGB-гистограмма изображения."""
+    small = img.convert('RGB').resize((FEATURE_EDGE, FEATURE_EDGE))
+    data = small.tobytes()
+    counts = [0] * (_LEVELS ** 3)
+    shift = 8 - (_LEVELS.bit_length() - 1)
+    for i in range(0, len(data), 3):
+        r, g, b = data[i] >> shift, data[i + 1] >> shift, data[i + 2] >> shift
+        counts[(r * _LEVELS + g) * _LEVELS + b] += 1
+    total = float(len(data) // 3)
+    return tuple(c / total for c in counts)
+
+
+def similarity(a: Tuple[float, ...], b: Tuple[float, ...]) -> float:
+    """Пересечение гистограмм: 1.0 — одинаковое распределение цветов."""
+    return sum(min(x, y) for x, y in zip(a, b))
+
+
+class LocalFoodClassifier:
+    """Ближайший эталон из Eat по цветовой гистограмме, на процесс (воркер)."""
+
+    def __init__(self, stamp_path, image_dirs: Iterable, min_similarity: float = 0.8,
+                 check_interval: float = 1.0):
+        self.stamp = ChangeStamp(stamp_path)
+        self.image_dirs = [Path(d) for d in image_dirs]
+        self.min_similarity = min_similarity
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._refs = None
+        self._features: Dict[Tuple[str, int], Tuple[float, ...]] = {}
+
+    def _resolve(self, image: Optional[str]) -> Optional[Path]:
+        if not image or '://' in image:
+            return None
+        for directory in self.image_dirs:
+            path = directory / Path(image).name
+            if path.is_file():
+                return path
+        return None
+
+    def _feature(self, path: Path) -> Optional[Tuple[float, ...]]:
+        key = (str(path), path.stat().st_mtime_ns)
+        feature = self._features.get(key)
+        if feature is None:
+            try:
+                feature = color_histogram(load_for_analysis(path, max_edge=FEATURE_EDGE * 2))
+            except Exception:
+                return None
+            self._features[key] = feature
+        return feature
+
+    def _build(self, rows) -> List[Tuple[dict, Tuple[float, ...]]]:
+        refs = []
+        used = set()
+        for food_id, name, calories, protein, fat, carbs, image in rows:
+            path = self._resolve(image)
+            feature = self._feature(path) if path else None
+            if feature is None:
+                continue
+            used.add((str(path), path.stat().st_mtime_ns))
+            refs.append(({'id': food_id, 'name': name, 'calories': float(calories or 0),
+                          'protein': float(protein or 0), 'fat': float(fat or 0),
+                          'carbs': float(carbs or 0)}, feature))
+        # гистограммы удаленных или замененных файлов больше не нужны
+        self._features = {k: v for k, v in self._features.items() if k in used}
+        return refs
+
+    def _current(self) -> List[Tuple[dict, Tuple[float, ...]]]:
+        now = time.monotonic()
+        refs = self._refs
+        if refs is not None and now - refs['checked_at'] < self.check_interval:
+            return refs['items']
+
+        with self._lock:
+            refs = self._refs
+            if refs is not None and now - refs['checked_at'] < self.check_interval:
+                return refs['items']
+            mtime = self.stamp.version()
+            if refs is not None and refs['mtime'] == mtime:
+                refs['checked_at'] = now
+                return refs['items']
+
+            rows = db.session.query(Eat.id, Eat.name, Eat.calories, Eat.protein, Eat.fat, Eat.carbs,
+                                    Eat.image).filter(Eat.image.isnot(None)).all()
+            refs = {'items': self._build(rows), 'mtime': mtime, 'checked_at': now}
+            self._refs = refs
+            return refs['items']
+
+    def classify(self, image_path) -> Optional[Tuple[dict, float]]:
+        """(блюдо из Eat, сходство) для ближайшего эталона или None, если сходство ниже порога."""
+        refs = self._current()
+        if not refs:
+            return None
+        feature = color_histogram(load_for_analysis(image_path, max_edge=FEATURE_EDGE * 2))
+        food, score = max(((food, similarity(feature, ref)) for food, ref in refs), key=lambda fs: fs[1])
+        if score < self.min_similarity:
+            return None
+        return food, score
+
+    def invalidate(self) -> None:
+        """Сбрасывает эталоны в этом воркере и сообщает остальным через stamp-файл."""
+        with self._lock:
+            self._refs = None
+        self.stamp.touch()
+
+
+class LocalClassifierBackend(AnalysisBackend):
+    """Бэкенд "local": КБЖУ распознанного блюда на одну порцию из таблицы Eat."""
+
+    name = 'local'
+
+    def __init__(self, classifier: LocalFoodClassifier):
+        self.classifier = classifier
+
+    def analyze(self, image_path: str):
+        match = self.classifier.classify(image_path)
+        if match is None:
+            return None
+        food, score = match
+        return {'name': food['name'], 'serving_size': '1 порция', 'calories': food['calories'],
+                'protein': food['protein'], 'fat': food['fat'], 'carbs': food['carbs'],
+                'food_id': food['id'], 'confidence': round(score, 3)}
+
+
+def watch_food_images(classifier: LocalFoodClassifier) -> None:
+    """Сбрасывает эталоны после каждого commit, добавившего/изменившего/удалившего Eat."""
+    watch_commits((Eat,), classifier.invalidate)
+
+
+__all__ = ["LocalClassifierBackend", "LocalFoodClassifier", "color_histogram", "similarity", "watch_food_images"]
@@ -0,0 +1,162 @@
+"""Полнотекстовый поиск блюд (SQLite FTS5).
+
+Таблица eat_fts — external-content FTS5 индекс поверх eat(name, type).
+Синхронизацию делают триггеры на eat, поэтому индекс обновляется при любых
+INSERT/UPDATE/DELETE (cook_menu, add_food, админские скрипты) без изменений
+в обработчиках. Запрос разбивается на слова, каждое ищется как префикс
+("бор" находит "Борщ"), результаты сортируются по bm25.
+
+Если FTS5 недоступен (не SQLite или sqlite собран без FTS5), `search_foods`
+использует прежний поиск через LIKE.
+"""
+import logging
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Eat
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'eat_fts'
+
+# unicode61 приводит к нижнему регистру и кириллицу, но "ё" не сводит к "е"
+# (remove_diacritics касается только латиницы), поэтому название нормализуется
+# в триггерах, при перестроении и в запросе (см. build_match_query)
+_NORMALIZED_NAME = "replace(replace({0}.name, 'ё', 'е'), 'Ё', 'Е')"
+
+_FTS_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "name, type, content='eat', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS eat_fts_ai AFTER INSERT ON eat BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, type) VALUES (new.id, {_NORMALIZED_NAME.format('new')}, new.type); END",
+    f"CREATE TRIGGER IF NOT EXISTS eat_fts_ad AFTER DELETE ON eat BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, type) "
+    f"VALUES ('delete', old.id, {_NORMALIZED_NAME.format('old')}, old.type); END",
+    f"CREATE TRIGGER IF NOT EXISTS eat_fts_au AFTER UPDATE OF name, type ON eat BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, type) "
+    f"VALUES ('delete', old.id, {_NORMALIZED_NAME.format('old')}, old.type); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, type) VALUES (new.id, {_NORMALIZED_NAME.format('new')}, new.type); END",
+]
+
+# Состояние индекса по URL движка: True — eat_fts есть и синхронизируется
+_fts_ready: Dict[str, bool] = {}
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _engine_key(bind) -> str:
+    engine = getattr(bind, 'engine', bind)
+    return str(engine.url)
+
+
+def create_fts_index(connection, rebuild: bool = True) -> bool:
+    """Создаёт eat_fts и триггеры на соединении SQLAlchemy. Возвращает False без FTS5."""
+    if connection.dialect.name != 'sqlite':
+        return False
+    try:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+        ).first()
+        for ddl in _FTS_DDL:
+            connection.exec_driver_sql(ddl)
+        if rebuild and not exists:
+            # перенос уже существующих блюд в новый индекс ('rebuild' взял бы
+            # названия без нормализации)
+            connection.exec_driver_sql(
+                f"INSERT INTO {FTS_TABLE}(rowid, name, type) "
+                f"SELECT id, {_NORMALIZED_NAME.format('eat')}, type FROM eat"
+            )
+    except OperationalError as e:
+        logger.warning('FTS5 is not available, food search falls back to LIKE: %s', e)
+        _fts_ready[_engine_key(connection)] = False
+        return False
+    _fts_ready[_engine_key(connection)] = True
+    return True
+
+
+def ensure_fts_index() -> bool:
+    """Создаёт индекс для уже существующей базы (вызывается при запуске приложения)."""
+    with db.engine.begin() as connection:
+        return create_fts_index(connection)
+
+
+@event.listens_for(Eat.__table__, 'after_create')
+def _create_fts_after_eat(target, connection, **kw):
+    create_fts_index(connection, rebuild=False)
+
+
+@event.listens_for(Eat.__table__, 'before_drop')
+def _drop_fts_before_eat(target, connection, **kw):
+    if connection.dialect.name != 'sqlite':
+        return
+    # триггеры удаляются вместе с eat, а виртуальную таблицу нужно удалить явно
+    connection.exec_driver_sql(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    _fts_ready[_engine_key(connection)] = False
+
+
+def build_match_query(q: str) -> Optional[str]:
+    """Превращает пользовательский ввод в FTS5 запрос: все слова как префиксы."""
+    words = _WORD_RE.findall((q or '').replace('ё', 'е').replace('Ё', 'Е'))
+    if not words:
+        return None
+    # слова берутся в кавычки, поэтому операторы FTS5 (OR, NEAR, -) не интерпретируются
+    return ' '.join(f'"{w}"*' for w in words)
+
+
+def fts_enabled() -> bool:
+    key = _engine_key(db.engine)
+    if key not in _fts_ready:
+        if db.engine.dialect.name != 'sqlite':
+            _fts_ready[key] = False
+        else:
+            with db.engine.connect() as connection:
+                _fts_ready[key] = connection.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+                ).first() is not None
+    return _fts_ready[key]
+
+
+def _search_like(q: str, limit: Optional[int] = None) -> List[Eat]:
+    search_pattern = f"%{q}%"
+    query = Eat.query.filter(
+        db.or_(
+            Eat.name.ilike(search_pattern),
+            Eat.type.ilike(search_pattern)
+        )
+    )
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def search_foods(q: str, limit: Optional[int] = None) -> List[Eat]:
+    """Ищет блюда по названию/типу; с FTS5 — по префиксам слов, лучшие совпадения первыми."""
+    q = (q or '').strip()
+    if not q:
+        return []
+    match = build_match_query(q)
+    if match is None or not fts_enabled():
+        return _search_like(q, limit)
+
+    sql = (
+        f"SELECT eat.* FROM {FTS_TABLE} JOIN eat ON eat.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :match ORDER BY {FTS_TABLE}.rank"
+    )
+    params = {'match': match}
+    if limit:
+        sql += " LIMIT :limit"
+        params['limit'] = int(limit)
+    try:
+        return Eat.query.from_statement(text(sql)).params(**params).all()
+    except OperationalError:
+        db.session.rollback()
+        logger.exception('FTS search failed, falling back to LIKE')
+        _fts_ready[_engine_key(db.engine)] = False
+        return _search_like(q, limit)
+
+
+__all__ = ["build_match_query", "create_fts_index", "ensure_fts_index", "fts_enabled", "search_foods"]
@@ -0,0 +1,125 @@
+"""Автодополнение названий блюд из памяти воркера.
+
+FoodSuggestIndex держит два отсортированных списка ключей — нормализованные
+названия целиком и их хвосты со второго слова — и ищет префикс через bisect,
+без запросов к БД. Индекс строится лениво при первом обращении и сбрасывается,
+когда меняется таблица eat: после commit, затронувшего Eat, текущий воркер
+сбрасывает индекс сразу, а остальные замечают новый mtime stamp-файла
+(проверка не чаще раза в check_interval секунд, как у TranslationCatalog).
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from heapq import nsmallest
+from typing import Dict, List, Tuple
+
+from change_stamp import ChangeStamp, watch_commits
+from models import db, Eat
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# сколько совпадений по второму и следующим словам рассматривается для короткого
+# префикса; совпадения с начала названия ранжируются все
+MAX_CANDIDATES = 500
+
+
+def normalize(value: str) -> str:
+    return (value or '').lower().replace('ё', 'е').strip()
+
+
+class FoodSuggestIndex:
+    """Префиксный индекс по Eat.name на процесс (воркер)."""
+
+    def __init__(self, stamp_path, check_interval: float = 1.0):
+        self.stamp = ChangeStamp(stamp_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = None
+
+    @property
+    def stamp_path(self):
+        return self.stamp.path
+
+    @staticmethod
+    def _build(rows) -> dict:
+        starts: List[Tuple[str, int]] = []
+        words: List[Tuple[str, int]] = []
+        foods: Dict[int, dict] = {}
+        for food_id, name, calories in rows:
+            foods[food_id] = {'id': food_id, 'name': name, 'calories': calories}
+            normalized = normalize(name)
+            # ключ с начала каждого слова: "суп с борщом" ищется и по "бор"
+            for pos, match in enumerate(_WORD_RE.finditer(normalized)):
+                (words if pos else starts).append((normalized[match.start():], food_id))
+        starts.sort()
+        words.sort()
+        return {'starts': starts, 'words': words, 'foods': foods}
+
+    @staticmethod
+    def _matches(keys: List[Tuple[str, int]], prefix: str, limit=None) -> List[int]:
+        """id блюд с ключами на prefix, по порядку ключей (не больше limit ключей)."""
+        found = []
+        i = bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            if limit is not None and len(found) >= limit:
+                break
+            found.append(keys[i][1])
+            i += 1
+        return found
+
+    def _current(self) -> dict:
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - index['checked_at'] < self.check_interval:
+            return index
+
+        with self._lock:
+            index = self._index
+            if index is not None and now - index['checked_at'] < self.check_interval:
+                return index
+            mtime = self.stamp.version()
+            if index is not None and index['mtime'] == mtime:
+                index['checked_at'] = now
+                return index
+
+            rows = db.session.query(Eat.id, Eat.name, Eat.calories).all()
+            index = self._build(rows)
+            index['mtime'] = mtime
+            index['checked_at'] = now
+            self._index = index
+            return index
+
+    def suggest(self, q: str, limit: int = 10) -> List[dict]:
+        """До limit блюд, в названии которых есть слово с префиксом q.
+
+        Сначала блюда, название которых начинается с q, затем более короткие названия.
+        """
+        prefix = normalize(q)
+        if not prefix:
+            return []
+        index = self._current()
+        foods = index['foods']
+        rank = lambda fid: (len(foods[fid]['name']), foods[fid]['name'])
+
+        # названия, начинающиеся с q, ранжируются все, а не первые по алфавиту ключи
+        starts = set(self._matches(index['starts'], prefix))
+        ranked = nsmallest(limit, starts, key=rank)
+        if len(ranked) < limit:
+            words = set(self._matches(index['words'], prefix, MAX_CANDIDATES)) - starts
+            ranked += nsmallest(limit - len(ranked), words, key=rank)
+        return [foods[fid] for fid in ranked]
+
+    def invalidate(self) -> None:
+        """Сбрасывает индекс в этом воркере и сообщает остальным через stamp-файл."""
+        with self._lock:
+            self._index = None
+        self.stamp.touch()
+
+
+def watch_eat_changes(index: FoodSuggestIndex) -> None:
+    """Сбрасывает индекс после каждого commit, добавившего/изменившего/удалившего Eat."""
+    watch_commits((Eat,), index.invalidate)
+
+
+__all__ = ["FoodSuggestIndex", "normalize", "watch_eat_changes"]
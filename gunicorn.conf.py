@@ -32,4 +32,14 @@ pidfile = str(Path(__file__).parent / "school.pid")
 # Настройки безопасности
 limit_request_line = 4094
 limit_request_fields = 100
-limit_request_field_size = 8190
\ No newline at end of file
+limit_request_field_size = 8190
+
+
+def post_fork(server, worker):
+    """Создаем клиента Gemini в воркере сразу после fork, а не на первой загрузке фото"""
+    try:
+        from food_detection_impl import warm_up
+        if not warm_up():
+            server.log.warning("Gemini client is not configured in worker %s", worker.pid)
+    except Exception:
+        server.log.exception("Failed to warm up Gemini client in worker %s", worker.pid)
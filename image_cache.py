@@ -0,0 +1,202 @@
+"""Кэш результатов анализа фото еды (Gemini) по содержимому изображения.
+
+Одно и то же фото обеда загружают многие ученики, а после обновления
+страницы — повторно. Ключ кэша — sha256 декодированных пикселей (после
+поворота по EXIF и приведения к RGB), поэтому пересохранение файла с другими
+метаданными или именем дает тот же ключ. Для почти одинаковых фото
+(пересжатие мессенджером, небольшое масштабирование) дополнительно хранится
+dHash — 64-битный перцептивный хэш; запись с расстоянием Хэмминга не больше
+max_distance считается тем же снимком.
+
+Кэш лежит в отдельном файле SQLite (instance/image_analysis_cache.db) и общий
+для всех воркеров gunicorn. Записи старше ttl не отдаются; при превышении
+max_entries вытесняются давно не использованные (LRU по last_used).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+Fingerprint = Tuple[str, int]
+
+# dHash режется на 4 полосы по 16 бит: при расстоянии до 3 хотя бы одна полоса
+# совпадает точно, и кандидатов можно искать по индексу, а не перебором
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS image_analysis (
+    content_hash TEXT PRIMARY KEY,
+    dhash TEXT NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_image_analysis_band0 ON image_analysis (band0);
+CREATE INDEX IF NOT EXISTS ix_image_analysis_band1 ON image_analysis (band1);
+CREATE INDEX IF NOT EXISTS ix_image_analysis_band2 ON image_analysis (band2);
+CREATE INDEX IF NOT EXISTS ix_image_analysis_band3 ON image_analysis (band3);
+CREATE INDEX IF NOT EXISTS ix_image_analysis_last_used ON image_analysis (last_used);
+'''
+
+
+def dhash(img: Image.Image) -> int:
+    """64-битный difference hash: яркость соседних пикселей уменьшенного 9x8 изображения."""
+    small = img.convert('L').resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def fingerprint(img: Image.Image) -> Fingerprint:
+    """(sha256 нормализованных пикселей, dHash) открытого изображения."""
+    normalized = ImageOps.exif_transpose(img).convert('RGB')
+    digest = hashlib.sha256(f'{normalized.width}x{normalized.height}:'.encode('ascii'))
+    digest.update(normalized.tobytes())
+    return digest.hexdigest(), dhash(normalized)
+
+
+def _bands(value: int):
+    mask = (1 << _BAND_BITS) - 1
+    return [(value >> (i * _BAND_BITS)) & mask for i in range(_BANDS)]
+
+
+class ImageAnalysisCache:
+    """Результаты анализа по отпечатку изображения в файле SQLite.
+
+    hits — точные совпадения, near_hits — найденные по dHash, misses —
+    промахи (счетчики в памяти процесса, как у ReportCache).
+    """
+
+    def __init__(self, path, ttl: int = 7 * 24 * 3600, max_entries: int = 5000,
+                 max_distance: int = 3, clock=time.time):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._ready = False
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=5)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    conn.execute('PRAGMA journal_mode=WAL')
+                    conn.executescript(_SCHEMA)
+                    self._ready = True
+        return conn
+
+    def get(self, fp: Fingerprint) -> Optional[Dict]:
+        """Результат для отпечатка (точный или ближайший по dHash) либо None."""
+        content_hash, dh = fp
+        now = self.clock()
+        fresh_after = now - self.ttl
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT content_hash, result FROM image_analysis '
+                               'WHERE content_hash = ? AND created_at > ?',
+                               (content_hash, fresh_after)).fetchone()
+            near = False
+            if row is None and self.max_distance >= 0:
+                row = self._nearest(conn, dh, fresh_after)
+                near = row is not None
+            if row is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            with conn:
+                conn.execute('UPDATE image_analysis SET last_used = ? WHERE content_hash = ?', (now, row[0]))
+        with self._lock:
+            if near:
+                self.near_hits += 1
+            else:
+                self.hits += 1
+        return json.loads(row[1])
+
+    def _nearest(self, conn: sqlite3.Connection, dh: int, fresh_after: float):
+        if self.max_distance < _BANDS:
+            bands = _bands(dh)
+            candidates = conn.execute(
+                'SELECT content_hash, result, dhash FROM image_analysis WHERE created_at > ? AND '
+                '(band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)', (fresh_after, *bands))
+        else:
+            candidates = conn.execute('SELECT content_hash, result, dhash FROM image_analysis '
+                                      'WHERE created_at > ?', (fresh_after,))
+        best = None
+        for content_hash, result, other in candidates:
+            distance = (dh ^ int(other, 16)).bit_count()
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, content_hash, result)
+        return best[1:] if best else None
+
+    def put(self, fp: Fingerprint, result: Dict) -> None:
+        """Сохраняет результат; заодно удаляет просроченные и лишние (LRU) записи."""
+        content_hash, dh = fp
+        now = self.clock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO image_analysis '
+                         '(content_hash, dhash, band0, band1, band2, band3, result, created_at, last_used) '
+                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (content_hash, f'{dh:016x}', *_bands(dh), json.dumps(result, ensure_ascii=False), now, now))
+            conn.execute('DELETE FROM image_analysis WHERE created_at <= ?', (now - self.ttl,))
+            conn.execute('DELETE FROM image_analysis WHERE content_hash IN ('
+                         'SELECT content_hash FROM image_analysis ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT COUNT(*) FROM image_analysis').fetchone()[0]
+
+    def clear(self) -> None:
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM image_analysis')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = {'hits': self.hits, 'near_hits': self.near_hits, 'misses': self.misses}
+        stats['entries'] = len(self)
+        return stats
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ImageAnalysisCache:
+    """Кэш процесса; путь и лимиты — из переменных окружения IMAGE_CACHE_*."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            path = os.environ.get('IMAGE_CACHE_PATH') or os.path.join(
+                os.path.dirname(__file__), 'instance', 'image_analysis_cache.db')
+            _default = ImageAnalysisCache(
+                path,
+                ttl=int(os.environ.get('IMAGE_CACHE_TTL', 7 * 24 * 3600)),
+                max_entries=int(os.environ.get('IMAGE_CACHE_MAX_ENTRIES', 5000)),
+                max_distance=int(os.environ.get('IMAGE_CACHE_MAX_DISTANCE', 3)),
+            )
+        return _default
+
+
+__all__ = ["ImageAnalysisCache", "default_cache", "dhash", "fingerprint"]
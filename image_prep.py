@@ -0,0 +1,52 @@
+"""Подготовка фото еды перед отправкой в Gemini.
+
+Телефон присылает JPEG 4000x3000 (несколько МБ), а модели для оценки блюда
+хватает ~1024 px по длинной стороне. Раньше в SDK уходил полноразмерный
+img.copy(), который google.generativeai кодирует в lossless WebP — десятки
+МБ и секунды на кодирование и загрузку. Здесь:
+
+- JPEG декодируется сразу в уменьшенном масштабе (Image.draft, DCT-scaling
+  libjpeg: 1/2, 1/4, 1/8), без распаковки полного кадра в память;
+- поворот по EXIF применяется к пикселям, затем thumbnail до max_edge;
+- результат перекодируется в JPEG заданного качества без EXIF/ICC/GPS
+  (метаданные не уходят во внешний API).
+
+Настройки — переменные окружения IMAGE_MAX_EDGE и IMAGE_JPEG_QUALITY.
+"""
+import io
+import os
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', 1024))
+JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', 85))
+
+
+def load_for_analysis(image_path, max_edge: Optional[int] = None) -> Image.Image:
+    """Открывает фото уменьшенным до max_edge по длинной стороне, в RGB и с учетом поворота по EXIF."""
+    max_edge = max_edge or MAX_EDGE
+    with Image.open(image_path) as img:
+        # draft выбирает наименьший масштаб, при котором кадр не меньше запрошенного
+        img.draft('RGB', (max_edge, max_edge))
+        img = ImageOps.exif_transpose(img)
+        img = img.convert('RGB')
+    img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    # метаданные исходного файла дальше не нужны (и не должны попасть в запрос)
+    img.info = {}
+    return img
+
+
+def encode_jpeg(img: Image.Image, quality: Optional[int] = None) -> bytes:
+    """JPEG без метаданных для отправки в API."""
+    buf = io.BytesIO()
+    img.save(buf, 'JPEG', quality=quality or JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+
+def image_blob(img: Image.Image, quality: Optional[int] = None) -> dict:
+    """Часть запроса generate_content: {'mime_type', 'data'} вместо PIL-изображения."""
+    return {'mime_type': 'image/jpeg', 'data': encode_jpeg(img, quality)}
+
+
+__all__ = ["JPEG_QUALITY", "MAX_EDGE", "encode_jpeg", "image_blob", "load_for_analysis"]
@@ -96,13 +96,17 @@ class Eat(db.Model):
     protein = db.Column(db.Float, nullable=False)
     fat = db.Column(db.Float, nullable=False)
     carbs = db.Column(db.Float, nullable=False)
-    type = db.Column(db.String(20), nullable=False, default="school")
+    # active_history: при смене типа старое значение загружается, чтобы кэш школьного
+    # меню сбросился и когда блюдо перестает быть школьным (см. school_menu.py)
+    type = db.column_property(db.Column(db.String(20), nullable=False, default="school"), active_history=True)
     image = db.Column(db.String(250), nullable=True)
     week = db.Column(db.Integer, nullable=True)  # 1 или 2 для школьной еды
     day = db.Column(db.Integer, nullable=True)   # 1-7 для школьной еды
+    # Штрихкод упакованного продукта (уникальный, NULL — без штрихкода)
+    barcode = db.Column(db.String(64), nullable=True, unique=True, index=True)
 
     def __init__(self, name, calories, protein, fat, carbs, type="school", 
-                 image=None, week=None, day=None):
+                 image=None, week=None, day=None, barcode=None):
         self.name = name
         self.calories = calories
         self.protein = protein
@@ -112,6 +116,7 @@ class Eat(db.Model):
         self.image = image
         self.week = week
         self.day = day
+        self.barcode = barcode
 
 
 class EatLog(db.Model):
@@ -129,6 +134,11 @@ class EatLog(db.Model):
     student = db.relationship('Student', backref='eat_logs')
     food = db.relationship('Eat', backref='eat_logs')
 
+    # Все горячие страницы фильтруют логи по ученику и диапазону дат
+    __table_args__ = (
+        db.Index('ix_eatlog_student_created', 'student_id', 'created_at'),
+    )
+
     def __init__(self, student_id: int, food_id: int | None, name: str, 
                  calories: float, protein: float, fat: float, carbs: float):
         self.student_id = student_id
@@ -140,6 +150,50 @@ class EatLog(db.Model):
         self.carbs = float(carbs)
 
 
+class DailyNutrition(db.Model):
+    """Дневная сводка КБЖУ ученика, обновляется вместе с каждым EatLog."""
+    __tablename__ = 'daily_nutrition'
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Float, nullable=False, default=0.0)
+    protein = db.Column(db.Float, nullable=False, default=0.0)
+    fat = db.Column(db.Float, nullable=False, default=0.0)
+    carbs = db.Column(db.Float, nullable=False, default=0.0)
+    log_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __init__(self, student_id: int, day, calories: float = 0.0, protein: float = 0.0,
+                 fat: float = 0.0, carbs: float = 0.0, log_count: int = 0):
+        self.student_id = student_id
+        self.day = day
+        self.calories = float(calories)
+        self.protein = float(protein)
+        self.fat = float(fat)
+        self.carbs = float(carbs)
+        self.log_count = int(log_count)
+
+
+class SheetsSync(db.Model):
+    """Таблица Google Sheets ученика для инкрементальной выгрузки (см. sheets_sync.py)."""
+    __tablename__ = 'sheets_sync'
+    student_id = db.Column(db.Integer, db.ForeignKey('student.id'), primary_key=True)
+    # NULL — строка зарезервирована выгрузкой, которая сейчас создает таблицу
+    spreadsheet_id = db.Column(db.String(128), nullable=True)
+    # последний выгруженный EatLog.id и строка (с 0) листа журнала, куда пойдёт следующий лог
+    last_log_id = db.Column(db.Integer, nullable=False, default=0)
+    next_row = db.Column(db.Integer, nullable=False, default=1)
+    targets_digest = db.Column(db.String(16), nullable=True)
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, student_id: int, spreadsheet_id: str | None, last_log_id: int = 0, next_row: int = 1,
+                 targets_digest: str | None = None, synced_at: datetime | None = None):
+        self.student_id = student_id
+        self.spreadsheet_id = spreadsheet_id
+        self.last_log_id = last_log_id
+        self.next_row = next_row
+        self.targets_digest = targets_digest
+        self.synced_at = synced_at
+
+
 class City(db.Model):
     __tablename__ = 'cities'
     id = db.Column(db.Integer, primary_key=True)
@@ -196,6 +250,10 @@ class Admin(db.Model):
 # --- Packs (наборы еды по дням) ---
 class Pack(db.Model):
     __tablename__ = 'packs'
+    # Один пак на день цикла (паки создаются один раз, см. ensure_packs_exist)
+    __table_args__ = (
+        db.Index('uq_packs_week_day', 'week', 'day', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     week = db.Column(db.Integer, nullable=False)  # Номер недели (1 или 2)
     day = db.Column(db.Integer, nullable=False)   # День недели (1-7)
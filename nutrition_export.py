@@ -0,0 +1,282 @@
+"""Потоковая выгрузка истории питания ученика (CSV / NDJSON / XLSX).
+
+Логи читаются из БД порциями (yield_per), итоги за день считаются на лету,
+когда в потоке меняется дата. CSV и NDJSON отдаются кусками через streaming
+response, XLSX пишется openpyxl в write-only режиме во временный файл.
+Память воркера не зависит от длины истории.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from models import db, DailyNutrition, EatLog
+
+# сколько строк EatLog забирать из курсора за раз
+BATCH_SIZE = 500
+# примерный размер куска ответа, байт
+CHUNK_SIZE = 64 * 1024
+
+CSV_HEADER = ['Дата', 'Время', 'Блюдо', 'Ккал', 'Белки', 'Жиры', 'Углеводы']
+XLSX_HEADER = ['Время', 'Блюдо', 'Калории', 'Белки', 'Жиры', 'Углеводы']
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbs')
+
+
+def history_range(student_id: int) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Первая и последняя дата логов ученика одним агрегирующим запросом."""
+    return db.session.execute(
+        select(func.min(EatLog.created_at), func.max(EatLog.created_at))
+        .where(EatLog.student_id == student_id)
+    ).one()
+
+
+def iter_logs(student_id: int, batch_size: int = BATCH_SIZE):
+    """Логи ученика по времени; из курсора читается batch_size строк за раз."""
+    stmt = (
+        select(EatLog.created_at, EatLog.name, EatLog.calories,
+               EatLog.protein, EatLog.fat, EatLog.carbs)
+        .where(EatLog.student_id == student_id)
+        .order_by(EatLog.created_at, EatLog.id)
+        .execution_options(yield_per=batch_size)
+    )
+    return db.session.execute(stmt)
+
+
+def _zero() -> Dict[str, float]:
+    return {k: 0.0 for k in NUTRIENTS}
+
+
+def _rounded(totals: Dict[str, float]) -> Dict[str, float]:
+    return {k: round(totals[k], 1) for k in NUTRIENTS}
+
+
+def iter_events(rows: Iterable, targets: Optional[Dict[str, float]] = None) -> Iterator[tuple]:
+    """Превращает поток логов в события ('log', row), ('day', дата, итоги, отклонения), ('total', итоги).
+
+    Итог дня выдаётся, как только в потоке появляется следующая дата.
+    """
+    day: Optional[date] = None
+    day_total = _zero()
+    grand_total = _zero()
+
+    def day_event():
+        totals = _rounded(day_total)
+        deviation = ({k: round(day_total[k] - float(targets[k]), 1) for k in NUTRIENTS}
+                     if targets else None)
+        return ('day', day, totals, deviation)
+
+    for row in rows:
+        row_day = row.created_at.date()
+        if day is not None and row_day != day:
+            yield day_event()
+            day_total = _zero()
+        day = row_day
+        for k in NUTRIENTS:
+            value = float(getattr(row, k) or 0)
+            day_total[k] += value
+            grand_total[k] += value
+        yield ('log', row)
+
+    if day is not None:
+        yield day_event()
+    yield ('total', _rounded(grand_total))
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    for piece in pieces:
+        buf.write(piece)
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue().encode('utf-8')
+            buf = io.StringIO()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+def _csv_line(values) -> str:
+    line = io.StringIO()
+    csv.writer(line).writerow(values)
+    return line.getvalue()
+
+
+def stream_csv(events: Iterable[tuple]) -> Iterator[bytes]:
+    """CSV для Excel (с BOM) с итогом после каждого дня и общим итогом в конце."""
+
+    def lines():
+        # BOM для Excel (UTF-8) — поможет корректно показать кириллицу в Excel на Windows
+        yield '\ufeff' + _csv_line(CSV_HEADER)
+        for event in events:
+            kind = event[0]
+            if kind == 'log':
+                row = event[1]
+                yield _csv_line([row.created_at.date().isoformat(), row.created_at.time().strftime('%H:%M:%S'),
+                                 row.name, row.calories, row.protein, row.fat, row.carbs])
+            elif kind == 'day':
+                _, day, totals, _deviation = event
+                yield _csv_line([day.isoformat(), '', 'Итого за день'] + [totals[k] for k in NUTRIENTS])
+            else:
+                totals = event[1]
+                yield _csv_line(['Итого', '', ''] + [totals[k] for k in NUTRIENTS])
+
+    return _chunked(lines())
+
+
+def stream_ndjson(events: Iterable[tuple]) -> Iterator[bytes]:
+    """NDJSON: по объекту на строку с полем type = log | day | total."""
+
+    def lines():
+        for event in events:
+            kind = event[0]
+            if kind == 'log':
+                row = event[1]
+                obj = {'type': 'log', 'created_at': row.created_at.isoformat(), 'name': row.name}
+                obj.update({k: getattr(row, k) for k in NUTRIENTS})
+            elif kind == 'day':
+                _, day, totals, deviation = event
+                obj = {'type': 'day', 'date': day.isoformat(), **totals}
+                if deviation is not None:
+                    obj['deviation'] = deviation
+            else:
+                obj = {'type': 'total', **event[1]}
+            yield json.dumps(obj, ensure_ascii=False) + '\n'
+
+    return _chunked(lines())
+
+
+class ColumnWidths:
+    """Ширина колонок как в прежнем экспорте: самое длинное значение + 2, от 10 до 50.
+
+    В write-only режиме ширины записываются до первой строки, поэтому значения
+    учитываются заранее (observe) — по подписям и агрегатам из БД (см. xlsx_column_widths).
+    """
+
+    def __init__(self, columns: int, min_width: int = 10, max_width: int = 50):
+        self.min_width = min_width
+        self.max_width = max_width
+        self.max_len = [0] * columns
+
+    def observe(self, col: int, value) -> None:
+        if value is None:
+            return
+        length = len(str(value))
+        if length > self.max_len[col - 1]:
+            self.max_len[col - 1] = length
+
+    def observe_row(self, values) -> None:
+        for col, value in enumerate(values, start=1):
+            self.observe(col, value)
+
+    def width(self, col: int) -> int:
+        return min(self.max_width, max(self.min_width, self.max_len[col - 1] + 2))
+
+    def apply(self, ws) -> None:
+        for col in range(1, len(self.max_len) + 1):
+            ws.column_dimensions[chr(64 + col)].width = self.width(col)
+
+
+def _deviation_text(diff: float) -> str:
+    if diff > 0:
+        return f'+{diff}'
+    if diff < 0:
+        return f'-{abs(diff)}'
+    return '0'
+
+
+def xlsx_column_widths(student_id: int, title_lines, targets: Dict[str, float]) -> ColumnWidths:
+    """Ширины колонок XLSX по двум агрегирующим запросам вместо повторного обхода ячеек."""
+    widths = ColumnWidths(len(XLSX_HEADER))
+    for line in title_lines:
+        widths.observe(1, line)
+    widths.observe_row(XLSX_HEADER)
+    widths.observe_row(['Итого за день:'])
+    widths.observe_row(['Отклонение'])
+    widths.observe_row(['Норма:', None] + [round(targets[k], 1) for k in NUTRIENTS])
+    widths.observe(1, '0000-00-00')
+    widths.observe(1, '00:00')
+
+    log_max = db.session.execute(
+        select(func.max(func.length(EatLog.name)),
+               *[func.max(getattr(EatLog, k)) for k in NUTRIENTS])
+        .where(EatLog.student_id == student_id)
+    ).one()
+    day_max = db.session.execute(
+        select(*[func.max(getattr(DailyNutrition, k)) for k in NUTRIENTS])
+        .where(DailyNutrition.student_id == student_id)
+    ).one()
+    widths.max_len[1] = max(widths.max_len[1], int(log_max[0] or 0))
+    for col, k in enumerate(NUTRIENTS, start=3):
+        for value in (log_max[col - 2], day_max[col - 3]):
+            if value is not None:
+                widths.observe(col, round(float(value), 1))
+                widths.observe(col, _deviation_text(round(float(value) - targets[k], 1)))
+        widths.observe(col, _deviation_text(round(-targets[k], 1)))
+    return widths
+
+
+def write_xlsx(path, events: Iterable[tuple], title_lines, targets: Dict[str, float],
+               widths: Optional[ColumnWidths] = None) -> None:
+    """Пишет отчёт (по дню: дата, шапка, блюда, итог, отклонение, норма) в файл path.
+
+    Используется write-only книга openpyxl: строки уходят в файл по мере записи,
+    стили создаются один раз.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Nutrition')
+    if widths is not None:
+        widths.apply(ws)
+
+    bold = Font(bold=True)
+    red_font = Font(color='00FF0000', bold=True)
+    blue_font = Font(color='000000FF', bold=True)
+
+    def styled(value, font):
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = font
+        return cell
+
+    def deviation_cell(diff):
+        text = _deviation_text(diff)
+        if diff > 0:
+            return styled(text, red_font)
+        if diff < 0:
+            return styled(text, blue_font)
+        return text
+
+    header = [styled(h, bold) for h in XLSX_HEADER]
+    norms = ['Норма:', None] + [round(targets[k], 1) for k in NUTRIENTS]
+
+    for line in title_lines:
+        ws.append([line])
+        ws.append([])
+
+    day = None
+    for event in events:
+        kind = event[0]
+        if kind == 'log':
+            row = event[1]
+            row_day = row.created_at.date()
+            if row_day != day:
+                day = row_day
+                ws.append([styled(day.isoformat(), bold)])
+                ws.append(header)
+            ws.append([row.created_at.time().strftime('%H:%M'), row.name]
+                      + [round(float(getattr(row, k) or 0), 1) for k in NUTRIENTS])
+        elif kind == 'day':
+            _, _day, totals, deviation = event
+            ws.append([styled('Итого за день:', bold), None] + [totals[k] for k in NUTRIENTS])
+            ws.append([styled('Отклонение', bold), None] + [deviation_cell(deviation[k]) for k in NUTRIENTS])
+            ws.append(norms)
+            ws.append([])
+
+    wb.save(path)
+
+
+__all__ = ["ColumnWidths", "history_range", "iter_events", "iter_logs", "stream_csv", "stream_ndjson", "write_xlsx",
+           "xlsx_column_widths"]
@@ -0,0 +1,171 @@
+"""Кэш готовых отчётов по питанию с «водяным знаком» по логам ученика.
+
+Водяной знак — (max(EatLog.id), count, время последнего лога) по ученику:
+новый приём пищи меняет max id, удаление лога — count, а время последнего лога
+различает случай, когда SQLite заново выдал id удалённой строки (логи не
+редактируются). Повторный просмотр отчёта стоит одного агрегирующего запроса
+(history_watermark), который заодно отдаёт первую и последнюю дату для
+периода и имени файла.
+
+ReportCache — посчитанные сводки по дням в памяти воркера (LRU).
+ExportFileCache — готовые файлы выгрузок на диске, общие для всех воркеров.
+В обоих при новом водяном знаке ученика сбрасываются только его записи.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from models import db, EatLog
+
+Watermark = Tuple[Optional[int], int, Optional[str]]
+
+
+def history_watermark(student_id: int, start=None, end=None):
+    """Одним запросом: first, last (даты логов), max_id и count за период [start, end]."""
+    stmt = select(func.min(EatLog.created_at).label('first'), func.max(EatLog.created_at).label('last'),
+                  func.max(EatLog.id).label('max_id'), func.count(EatLog.id).label('count')
+                  ).where(EatLog.student_id == student_id)
+    if start is not None:
+        stmt = stmt.where(EatLog.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(EatLog.created_at <= end)
+    return db.session.execute(stmt).one()
+
+
+def watermark_of(row) -> Watermark:
+    """Водяной знак из строки history_watermark."""
+    return row.max_id, row.count, row.last.isoformat() if row.last else None
+
+
+def targets_digest(targets: Dict[str, float]) -> str:
+    """Короткий хэш норм: изменение норм ребёнка даёт новый ключ кэша."""
+    raw = json.dumps({k: round(float(v), 3) for k, v in targets.items()}, sort_keys=True)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+class ReportCache:
+    """Потокобезопасный LRU (student_id, key) -> значение с водяным знаком ученика."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+        self._watermarks: Dict[int, Watermark] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, student_id: int, watermark: Watermark, key: Hashable):
+        with self._lock:
+            entry = (student_id, key)
+            if self._watermarks.get(student_id) != watermark or entry not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(entry)
+            self.hits += 1
+            return self._data[entry]
+
+    def put(self, student_id: int, watermark: Watermark, key: Hashable, value) -> None:
+        with self._lock:
+            if self._watermarks.get(student_id) != watermark:
+                self._drop_student(student_id)
+                self._watermarks[student_id] = watermark
+            self._data[(student_id, key)] = value
+            self._data.move_to_end((student_id, key))
+            while len(self._data) > self.maxsize:
+                (old_student, _), _ = self._data.popitem(last=False)
+                if not any(sid == old_student for sid, _ in self._data):
+                    self._watermarks.pop(old_student, None)
+
+    def _drop_student(self, student_id: int) -> None:
+        for entry in [e for e in self._data if e[0] == student_id]:
+            del self._data[entry]
+
+    def discard_student(self, student_id: int) -> None:
+        with self._lock:
+            self._drop_student(student_id)
+            self._watermarks.pop(student_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._watermarks.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ExportFileCache:
+    """Готовые файлы выгрузок: <student_id>-<хэш водяного знака>-<хэш ключа>.<ext> в каталоге cache_dir.
+
+    Файлы ученика со старым водяным знаком удаляются при записи нового,
+    файлы старше max_age секунд — при любой записи.
+    """
+
+    def __init__(self, cache_dir, max_age: int = 7 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(value) -> str:
+        return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()[:16]
+
+    def _prefix(self, student_id: int, watermark: Watermark) -> str:
+        return f'{student_id}-{self._digest(watermark)}-'
+
+    def path(self, student_id: int, watermark: Watermark, key: Hashable, ext: str) -> Path:
+        return self.cache_dir / f'{self._prefix(student_id, watermark)}{self._digest(key)}.{ext}'
+
+    def get(self, student_id: int, watermark: Watermark, key: Hashable, ext: str) -> Optional[Path]:
+        path = self.path(student_id, watermark, key, ext)
+        if path.exists():
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    def put(self, student_id: int, watermark: Watermark, key: Hashable, ext: str,
+            write: Callable[[Path], None]) -> Path:
+        """Пишет файл через write(tmp_path) и атомарно кладёт его в кэш."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path(student_id, watermark, key, ext)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            self._remove(tmp)
+        self._evict(student_id, watermark)
+        return path
+
+    def _evict(self, student_id: int, watermark: Watermark) -> None:
+        keep = self._prefix(student_id, watermark)
+        expire_before = time.time() - self.max_age
+        for path in self.cache_dir.glob('*-*-*.*'):
+            name = path.name
+            if name.endswith('.tmp'):
+                continue
+            stale = name.startswith(f'{student_id}-') and not name.startswith(keep)
+            try:
+                if stale or path.stat().st_mtime < expire_before:
+                    self._remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove(path) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+__all__ = ["ExportFileCache", "ReportCache", "history_watermark", "targets_digest", "watermark_of"]
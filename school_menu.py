@@ -0,0 +1,125 @@
+"""Школьное меню на сегодня: двухнедельный цикл и кэш на процесс (воркер).
+
+Неделя цикла и день считаются от REFERENCE_DATE один раз на дату, меню дня
+хранится уже сериализованным отдельно для каждого языка. Главная страница и
+/eat берут его из памяти без запросов к БД. Кэш сбрасывается после commit,
+затронувшего школьное блюдо (Eat.type == 'school') или PackItem (правки в
+cook_menu), в остальных воркерах — по stamp-файлу (см. change_stamp.py).
+Свои блюда учеников и родителей меню не сбрасывают.
+"""
+import threading
+import time
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+
+from change_stamp import ChangeStamp, watch_commits
+from models import Eat, PackItem
+
+# Цикл начинается от 2025-01-01. Если нужно другое начало — поменяйте REFERENCE_DATE.
+REFERENCE_DATE = date(2025, 1, 1)
+
+DAY_NAMES = {
+    'ru': ('Понедельник', 'Вторник', 'Среда', 'Четверг', 'Пятница', 'Суббота', 'Воскресенье'),
+    'kk': ('Дүйсенбі', 'Сейсенбі', 'Сәрсенбі', 'Бейсенбі', 'Жұма', 'Сенбі', 'Жексенбі'),
+}
+
+
+@lru_cache(maxsize=32)
+def menu_cycle(today: date) -> Tuple[int, int]:
+    """(неделя 1-2, день 1-7) двухнедельного цикла для даты."""
+    weeks_since = (today - REFERENCE_DATE).days // 7
+    return (weeks_since % 2) + 1, today.weekday() + 1
+
+
+def serialize_food(food: Eat) -> dict:
+    return {
+        'id': food.id,
+        'name': food.name,
+        'calories': food.calories,
+        'protein': food.protein,
+        'fat': food.fat,
+        'carbs': food.carbs,
+        'type': food.type,
+        'image': food.image,
+        'week': food.week,
+        'day': food.day,
+    }
+
+
+class SchoolMenuCache:
+    """Сериализованное меню дня по ключу (дата, язык)."""
+
+    def __init__(self, stamp_path, translate: Callable[[str, str], str], check_interval: float = 1.0):
+        self.stamp = ChangeStamp(stamp_path)
+        self.translate = translate
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[date, str], dict] = {}
+        self._version = None
+        self._checked_at = None
+
+    def _check_stamp(self) -> None:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            version = self.stamp.version()
+            if version != self._version:
+                self._entries = {}
+                self._version = version
+            self._checked_at = now
+
+    def _build(self, today: date, lang: str) -> dict:
+        week, day = menu_cycle(today)
+        foods = Eat.query.filter_by(type='school', week=week, day=day).order_by(Eat.id).all()
+        day_names = DAY_NAMES.get(lang, DAY_NAMES['ru'])
+        return {
+            'date': today.isoformat(),
+            'week': week,
+            'day': day,
+            'day_name': day_names[day - 1],
+            'title': self.translate(lang, 'todays_menu'),
+            'empty_text': self.translate(lang, 'no_menu_today'),
+            'foods': [serialize_food(f) for f in foods],
+        }
+
+    def today(self, lang: str = 'ru', today: Optional[date] = None) -> dict:
+        """Меню на дату (по умолчанию сегодня) для языка интерфейса."""
+        today = today or date.today()
+        self._check_stamp()
+        key = (today, lang)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        entry = self._build(today, lang)
+        with self._lock:
+            # записи за прошедшие дни больше не понадобятся
+            entries = {k: v for k, v in self._entries.items() if k[0] == today}
+            entries[key] = entry
+            self._entries = entries
+        return entry
+
+    def invalidate(self) -> None:
+        """Сбрасывает меню в этом воркере и сообщает остальным через stamp-файл."""
+        with self._lock:
+            self._entries = {}
+        self.stamp.touch()
+
+
+def _affects_menu(obj) -> bool:
+    if isinstance(obj, PackItem):
+        return True
+    # блюдо, которое перестало быть школьным, тоже нужно убрать из меню
+    return obj.type == 'school' or 'school' in (inspect(obj).attrs.type.history.deleted or ())
+
+
+def watch_menu_changes(menu: SchoolMenuCache) -> None:
+    """Сбрасывает меню после commit, затронувшего школьные блюда или элементы паков."""
+    watch_commits((Eat, PackItem), menu.invalidate, _affects_menu)
+
+
+__all__ = ["DAY_NAMES", "REFERENCE_DATE", "SchoolMenuCache", "menu_cycle", "serialize_food", "watch_menu_changes"]
@@ -1,6 +1,10 @@
 import os
+import random
+import socket
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 from google.oauth2.credentials import Credentials
 from google.oauth2 import service_account
@@ -8,40 +12,333 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+CREDENTIALS_FILE = os.path.join(os.path.dirname(__file__), 'google_credentials.json')
 
-def get_credentials():
-    """Получает учетные данные для доступа к Google Sheets API"""
+DAILY_SHEET_ID = 0
+SUMMARY_SHEET_ID = 1
+DAILY_SHEET_TITLE = 'Ежедневный отчет'
+# листы таблицы инкрементальной выгрузки (см. sheets_sync.py)
+LOG_SHEET_TITLE = 'Журнал'
+SUMMARY_SHEET_TITLE = 'Итоговый анализ'
+LOG_HEADER = ['Дата', 'Время', 'Блюдо', 'Калории', 'Белки', 'Жиры', 'Углеводы', 'ID']
+NUTRIENTS = ('calories', 'protein', 'fat', 'carbs')
+
+OVER_COLOR = {'red': 0.9, 'green': 0.8, 'blue': 0.8}   # превышение на 10%
+UNDER_COLOR = {'red': 0.8, 'green': 0.8, 'blue': 0.9}  # недобор на 10%
+
+# Квота Sheets API по умолчанию — 60 запросов на запись в минуту на пользователя;
+# лимитер общий для всех потоков процесса (у каждого воркера gunicorn — свой)
+SHEETS_REQUESTS_PER_MINUTE = float(os.environ.get('SHEETS_REQUESTS_PER_MINUTE', 60))
+SHEETS_BURST = int(os.environ.get('SHEETS_BURST', 5))
+# статусы, при которых запрос повторяется с экспоненциальной задержкой
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class SheetsExportError(Exception):
+    """Ошибка выгрузки в Google Sheets; текст можно показать пользователю"""
+
+
+class SheetsQuotaError(SheetsExportError):
+    """Квота Sheets API исчерпана и после повторов"""
+
+
+class SheetsNotFoundError(SheetsExportError):
+    """Таблица удалена или к ней больше нет доступа"""
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate запросов в секунду, всплеск до capacity.
+
+    acquire() резервирует токен под блокировкой, а ждёт (если токенов нет) уже без
+    неё, поэтому потоки встают в очередь в порядке обращения.
+    """
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def acquire(self) -> float:
+        """Берёт токен; возвращает, сколько секунд пришлось ждать"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class SheetsMetrics:
+    """Счётчики обращений к Sheets API на процесс"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.retries = 0
+            self.retries_by_status = {}
+            self.failures = 0
+            self.throttled_seconds = 0.0
+            self.backoff_seconds = 0.0
+
+    def record_request(self, waited: float):
+        with self._lock:
+            self.requests += 1
+            self.throttled_seconds += waited
+
+    def record_retry(self, status, delay: float):
+        with self._lock:
+            self.retries += 1
+            self.retries_by_status[status] = self.retries_by_status.get(status, 0) + 1
+            self.backoff_seconds += delay
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'retries_by_status': dict(self.retries_by_status),
+                'failures': self.failures,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'backoff_seconds': round(self.backoff_seconds, 3),
+            }
+
+
+class SheetsClient:
+    """Выполняет запросы googleapiclient через лимитер с повторами при 429/5xx.
+
+    Задержка — full jitter: случайная в [0, min(max_delay, base_delay * 2**попытка)],
+    но не меньше Retry-After, если сервер его прислал. Неидемпотентные запросы
+    (создание таблицы) повторяются только при 429 — такой запрос сервер точно не выполнил.
+    """
+
+    def __init__(self, limiter: TokenBucket, metrics: SheetsMetrics, max_retries: int = 5,
+                 base_delay: float = 1.0, max_delay: float = 32.0, sleep=time.sleep, rand=random.random):
+        self.limiter = limiter
+        self.metrics = metrics
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rand = rand
+
+    def backoff(self, attempt: int, retry_after=None) -> float:
+        delay = self.rand() * min(self.max_delay, self.base_delay * (2 ** attempt))
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def execute(self, request, idempotent: bool = True):
+        attempt = 0
+        while True:
+            self.metrics.record_request(self.limiter.acquire())
+            retry_after = None
+            try:
+                return request.execute()
+            except HttpError as e:
+                status = e.resp.status
+                retryable = status == 429 or (idempotent and status in RETRY_STATUSES)
+                if not retryable or attempt >= self.max_retries:
+                    self.metrics.record_failure()
+                    raise
+                retry_after = e.resp.get('retry-after')
+            except (ConnectionError, TimeoutError, socket.timeout):
+                if not idempotent or attempt >= self.max_retries:
+                    self.metrics.record_failure()
+                    raise
+                status = 'network'
+            delay = self.backoff(attempt, retry_after)
+            self.metrics.record_retry(status, delay)
+            print(f'Google Sheets API: {status}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s')
+            self.sleep(delay)
+            attempt += 1
+
+
+sheets_limiter = TokenBucket(SHEETS_REQUESTS_PER_MINUTE / 60.0, SHEETS_BURST)
+sheets_metrics = SheetsMetrics()
+sheets_client = SheetsClient(sheets_limiter, sheets_metrics)
+
+
+# Учётные данные сервисного аккаунта читаются один раз на процесс, клиент API
+# (discovery) строится один раз на поток: объекты googleapiclient используют
+# httplib2, который не потокобезопасен, а выгрузки идут из пула потоков.
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+
+def _load_credentials():
     try:
         # Используем service account
-        creds_file = os.path.join(os.path.dirname(__file__), 'google_credentials.json')
-        if os.path.exists(creds_file):
+        if os.path.exists(CREDENTIALS_FILE):
             return service_account.Credentials.from_service_account_file(
-                creds_file, scopes=SCOPES)
+                CREDENTIALS_FILE, scopes=SCOPES)
     except Exception as e:
         print(f"Error loading credentials: {e}")
     return None
 
-def create_nutrition_report(student_name: str, logs: List[Dict], 
+
+def get_credentials():
+    """Получает учетные данные для доступа к Google Sheets API (кэшируются на процесс)"""
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = _load_credentials()
+    return _credentials
+
+
+def get_service():
+    """Клиент Sheets API текущего потока; None, если нет учетных данных"""
+    service = getattr(_local, 'service', None)
+    if service is None:
+        creds = get_credentials()
+        if not creds:
+            return None
+        service = build('sheets', 'v4', credentials=creds, cache_discovery=False)
+        _local.service = service
+    return service
+
+
+def reset_clients():
+    """Сбрасывает кэш учетных данных и клиента (например, после замены ключа)"""
+    global _credentials
+    with _credentials_lock:
+        _credentials = None
+    _local.__dict__.pop('service', None)
+
+
+def build_daily_rows(student_name: str, logs: List[Dict],
+                     targets: Dict[str, float]) -> Tuple[List[list], Dict[Tuple[int, int], dict]]:
+    """Строки листа «Ежедневный отчет» и цвета ячеек {(row, col): color} (индексы с 0)"""
+    # Группируем логи по дням
+    daily_logs = {}
+    for log in logs:
+        date = log['created_at'].date()
+        daily_logs.setdefault(date, []).append(log)
+
+    daily_rows = [
+        ['Отчет питания для ' + student_name],
+        ['Дата', 'Блюдо', 'Время', 'Калории', 'Белки', 'Жиры', 'Углеводы']
+    ]
+    daily_colors = {}
+    current_row = 2  # начинаем после заголовков
+
+    for date in sorted(daily_logs.keys()):
+        day_logs = daily_logs[date]
+        first_row = current_row
+
+        # Добавляем записи за день
+        for log in sorted(day_logs, key=lambda x: x['created_at']):
+            daily_rows.append([
+                date.strftime('%Y-%m-%d'),
+                log['name'],
+                log['created_at'].strftime('%H:%M'),
+                log['calories'],
+                log['protein'],
+                log['fat'],
+                log['carbs']
+            ])
+
+            # Отмечаем цветом отклонения от нормы
+            for col, field in enumerate(NUTRIENTS, start=3):
+                value = log[field]
+                target = targets[field]
+                if value > target * 1.1:  # превышение на 10%
+                    daily_colors[(current_row, col)] = OVER_COLOR
+                elif value < target * 0.9:  # недобор на 10%
+                    daily_colors[(current_row, col)] = UNDER_COLOR
+
+            current_row += 1
+
+        # Добавляем итоги за день (в формулах строки A1 — с единицы)
+        daily_rows.append(['ИТОГО за ' + date.strftime('%Y-%m-%d'), '', ''] + [
+            f"=SUM({letter}{first_row + 1}:{letter}{current_row})" for letter in 'DEFG'
+        ])
+        daily_rows.append([])  # пустая строка после итогов
+        current_row += 2
+
+    return daily_rows, daily_colors
+
+
+def merge_color_ranges(colors: Dict[Tuple[int, int], dict]) -> List[Tuple[int, int, int, int, dict]]:
+    """Склеивает соседние ячейки одного цвета в прямоугольники (start_row, end_row, start_col, end_col, color).
+
+    Сначала ячейки строки объединяются по колонкам, затем одинаковые
+    по колонкам и цвету отрезки соседних строк — по строкам. Концы не включаются.
+    """
+    def key(color):
+        return tuple(sorted(color.items()))
+
+    runs = []  # (row, start_col, end_col, color)
+    for row, col in sorted(colors):
+        color = colors[(row, col)]
+        if runs and runs[-1][0] == row and runs[-1][2] == col and key(runs[-1][3]) == key(color):
+            runs[-1] = (row, runs[-1][1], col + 1, color)
+        else:
+            runs.append((row, col, col + 1, color))
+
+    open_ranges = {}  # (start_col, end_col, цвет) -> [start_row, end_row, color]
+    merged = []
+    for row, start_col, end_col, color in runs:
+        span = (start_col, end_col, key(color))
+        current = open_ranges.get(span)
+        if current is not None and current[1] == row:
+            current[1] = row + 1
+        else:
+            if current is not None:
+                merged.append((current[0], current[1], start_col, end_col, current[2]))
+            open_ranges[span] = [row, row + 1, color]
+    for (start_col, end_col, _), (start_row, end_row, color) in open_ranges.items():
+        merged.append((start_row, end_row, start_col, end_col, color))
+    return sorted(merged, key=lambda r: (r[0], r[2]))
+
+
+def create_nutrition_report(student_name: str, logs: List[Dict],
                           targets: Dict[str, float]) -> Optional[str]:
     """
     Создает отчет о питании в Google Sheets
-    
+
+    Всего три обращения к API: создание таблицы (со сразу закреплёнными
+    строками), один values.batchUpdate со всеми значениями и один
+    spreadsheets.batchUpdate со всем форматированием. Запросы идут через
+    sheets_client (лимитер и повторы при 429/5xx).
+
     Args:
         student_name: Имя ученика
         logs: Список логов питания [{created_at, name, calories, protein, fat, carbs}]
         targets: Целевые показатели {'calories': float, 'protein': float, 'fat': float, 'carbs': float}
-    
+
     Returns:
-        URL созданной таблицы или None в случае ошибки
+        URL созданной таблицы
+
+    Raises:
+        SheetsQuotaError: квота API исчерпана и после повторов
+        SheetsExportError: нет учетных данных или другая ошибка API
     """
+    service = get_service()
+    if not service:
+        print("Failed to get credentials")
+        raise SheetsExportError('Google Sheets не настроен: нет учетных данных сервисного аккаунта')
+
     try:
-        creds = get_credentials()
-        if not creds:
-            print("Failed to get credentials")
-            return None
 
-        service = build('sheets', 'v4', credentials=creds)
-        
         # Создаем новую таблицу
         title = f"Отчет питания - {student_name} ({datetime.now().strftime('%Y-%m-%d')})"
         spreadsheet = {
@@ -51,7 +348,8 @@ def create_nutrition_report(student_name: str, logs: List[Dict],
             'sheets': [
                 {
                     'properties': {
-                        'title': 'Ежедневный отчет',
+                        'sheetId': DAILY_SHEET_ID,
+                        'title': DAILY_SHEET_TITLE,
                         'gridProperties': {
                             'frozenRowCount': 2
                         }
@@ -59,93 +357,33 @@ def create_nutrition_report(student_name: str, logs: List[Dict],
                 },
                 {
                     'properties': {
+                        'sheetId': SUMMARY_SHEET_ID,
                         'title': 'Итоговый анализ'
                     }
                 }
             ]
         }
-        
-        spreadsheet = service.spreadsheets().create(body=spreadsheet).execute()
+
+        spreadsheet = sheets_client.execute(service.spreadsheets().create(body=spreadsheet), idempotent=False)
         spreadsheet_id = spreadsheet['spreadsheetId']
-        
-        # Группируем логи по дням
-        daily_logs = {}
-        for log in logs:
-            date = log['created_at'].date()
-            if date not in daily_logs:
-                daily_logs[date] = []
-            daily_logs[date].append(log)
-        
-        # Формируем данные для ежедневного отчета
-        daily_rows = [
-            ['Отчет питания для ' + student_name],
-            ['Дата', 'Блюдо', 'Время', 'Калории', 'Белки', 'Жиры', 'Углеводы']
-        ]
-        
-        daily_colors = []  # [(row, col, color), ...]
-        current_row = 2  # начинаем после заголовков
-        
-        for date in sorted(daily_logs.keys()):
-            day_logs = daily_logs[date]
-            
-            # Считаем дневные суммы
-            day_total = {
-                'calories': sum(log['calories'] for log in day_logs),
-                'protein': sum(log['protein'] for log in day_logs),
-                'fat': sum(log['fat'] for log in day_logs),
-                'carbs': sum(log['carbs'] for log in day_logs)
-            }
-            
-            # Добавляем записи за день
-            for log in sorted(day_logs, key=lambda x: x['created_at']):
-                daily_rows.append([
-                    date.strftime('%Y-%m-%d'),
-                    log['name'],
-                    log['created_at'].strftime('%H:%M'),
-                    log['calories'],
-                    log['protein'],
-                    log['fat'],
-                    log['carbs']
-                ])
-                
-                # Отмечаем цветом отклонения от нормы
-                for col, (field, target) in enumerate(['calories', 'protein', 'fat', 'carbs'], start=3):
-                    value = log[field]
-                    if value > target * 1.1:  # превышение на 10%
-                        daily_colors.append((current_row, col, {'red': 0.9, 'green': 0.8, 'blue': 0.8}))
-                    elif value < target * 0.9:  # недобор на 10%
-                        daily_colors.append((current_row, col, {'red': 0.8, 'green': 0.8, 'blue': 0.9}))
-                
-                current_row += 1
-            
-            # Добавляем итоги за день
-            daily_rows.append([
-                'ИТОГО за ' + date.strftime('%Y-%m-%d'),
-                '',
-                '',
-                f"=SUM(D{current_row-len(day_logs)}:D{current_row-1})",
-                f"=SUM(E{current_row-len(day_logs)}:E{current_row-1})",
-                f"=SUM(F{current_row-len(day_logs)}:F{current_row-1})",
-                f"=SUM(G{current_row-len(day_logs)}:G{current_row-1})"
-            ])
-            current_row += 2  # пустая строка после итогов
-            
+
+        daily_rows, daily_colors = build_daily_rows(student_name, logs, targets)
+
         # Обновляем данные в таблице
-        range_name = 'Ежедневный отчет!A1'
-        body = {
-            'values': daily_rows
-        }
-        service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id, range=range_name,
-            valueInputOption='USER_ENTERED', body=body).execute()
-        
+        sheets_client.execute(service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={
+                'valueInputOption': 'USER_ENTERED',
+                'data': [{'range': f"'{DAILY_SHEET_TITLE}'!A1", 'values': daily_rows}]
+            }))
+
         # Применяем форматирование
         requests = []
-        
+
         # Форматирование заголовков
         requests.append({
             'repeatCell': {
-                'range': {'sheetId': 0, 'startRowIndex': 0, 'endRowIndex': 2},
+                'range': {'sheetId': DAILY_SHEET_ID, 'startRowIndex': 0, 'endRowIndex': 2},
                 'cell': {
                     'userEnteredFormat': {
                         'backgroundColor': {'red': 0.9, 'green': 0.9, 'blue': 0.9},
@@ -155,17 +393,17 @@ def create_nutrition_report(student_name: str, logs: List[Dict],
                 'fields': 'userEnteredFormat(backgroundColor,textFormat)'
             }
         })
-        
-        # Применяем цветовые выделения
-        for row, col, color in daily_colors:
+
+        # Применяем цветовые выделения: соседние ячейки одного цвета — одним диапазоном
+        for start_row, end_row, start_col, end_col, color in merge_color_ranges(daily_colors):
             requests.append({
                 'repeatCell': {
                     'range': {
-                        'sheetId': 0,
-                        'startRowIndex': row,
-                        'endRowIndex': row + 1,
-                        'startColumnIndex': col,
-                        'endColumnIndex': col + 1
+                        'sheetId': DAILY_SHEET_ID,
+                        'startRowIndex': start_row,
+                        'endRowIndex': end_row,
+                        'startColumnIndex': start_col,
+                        'endColumnIndex': end_col
                     },
                     'cell': {
                         'userEnteredFormat': {
@@ -180,25 +418,170 @@ def create_nutrition_report(student_name: str, logs: List[Dict],
         requests.append({
             'autoResizeDimensions': {
                 'dimensions': {
-                    'sheetId': 0,
+                    'sheetId': DAILY_SHEET_ID,
                     'dimension': 'COLUMNS',
                     'startIndex': 0,
                     'endIndex': 7
                 }
             }
         })
-        
+
         # Применяем форматирование
-        service.spreadsheets().batchUpdate(
+        sheets_client.execute(service.spreadsheets().batchUpdate(
             spreadsheetId=spreadsheet_id,
-            body={'requests': requests}).execute()
-        
+            body={'requests': requests}))
+
         # Возвращаем URL таблицы
-        return f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}'
-        
+        return spreadsheet_url(spreadsheet_id)
+
     except HttpError as e:
-        print(f'Google Sheets API error: {e}')
-        return None
+        raise api_error(e) from e
     except Exception as e:
         print(f'Unexpected error: {e}')
-        return None
\ No newline at end of file
+        raise SheetsExportError('Ошибка при создании отчета в Google Sheets') from e
+
+
+def api_error(e: HttpError) -> SheetsExportError:
+    """Ошибка Sheets API (уже после повторов) -> ошибка выгрузки с текстом для пользователя"""
+    print(f'Google Sheets API error: {e}')
+    status = e.resp.status
+    if status == 429:
+        return SheetsQuotaError('Google Sheets сейчас перегружен запросами, попробуйте через минуту')
+    if status == 404:
+        return SheetsNotFoundError('Таблица Google Sheets не найдена')
+    return SheetsExportError(f'Google Sheets API вернул ошибку {status}')
+
+
+def spreadsheet_url(spreadsheet_id: str) -> str:
+    return f'https://docs.google.com/spreadsheets/d/{spreadsheet_id}'
+
+
+def build_log_rows(logs: List[Dict]) -> List[list]:
+    """Строки листа «Журнал»: по строке на лог, без итогов и пустых строк между днями"""
+    return [[log['created_at'].strftime('%Y-%m-%d'), log['created_at'].strftime('%H:%M'), log['name'],
+             round(log['calories'], 1), round(log['protein'], 1), round(log['fat'], 1),
+             round(log['carbs'], 1), log['id']]
+            for log in logs]
+
+
+def _cell(value) -> dict:
+    if isinstance(value, str) and value.startswith('='):
+        return {'userEnteredValue': {'formulaValue': value}}
+    if isinstance(value, (int, float)):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+
+def _grid_rows(rows: List[list]) -> List[dict]:
+    return [{'values': [_cell(v) for v in row]} for row in rows]
+
+
+def _norms_row(targets: Dict[str, float]) -> list:
+    return [round(float(targets.get(k, 0) or 0), 1) for k in NUTRIENTS]
+
+
+def _summary_rule(formula: str, color: dict) -> dict:
+    return {
+        'addConditionalFormatRule': {
+            'rule': {
+                'ranges': [{'sheetId': SUMMARY_SHEET_ID, 'startRowIndex': 4,
+                            'startColumnIndex': 1, 'endColumnIndex': 5}],
+                'booleanRule': {
+                    'condition': {'type': 'CUSTOM_FORMULA', 'values': [{'userEnteredValue': formula}]},
+                    'format': {'backgroundColor': color},
+                },
+            },
+            'index': 0,
+        }
+    }
+
+
+def create_sync_spreadsheet(student_name: str, targets: Dict[str, float]) -> str:
+    """
+    Создает таблицу для инкрементальной выгрузки; возвращает ее id
+
+    Лист «Журнал» — плоский список логов (строка 1 — заголовок), лист
+    «Итоговый анализ» считает суммы по дням формулой QUERY по журналу и
+    подсвечивает их условным форматированием относительно норм в строке 2.
+    Поэтому новые логи дописываются в конец журнала без пересчета итогов и
+    перекраски на нашей стороне. Таблица с листами, заголовками и формулой
+    создается одним запросом, правила подсветки — вторым.
+
+    Raises:
+        SheetsQuotaError, SheetsExportError
+    """
+    service = get_service()
+    if not service:
+        raise SheetsExportError('Google Sheets не настроен: нет учетных данных сервисного аккаунта')
+
+    log_range = f"'{LOG_SHEET_TITLE}'!A1:G"
+    summary_rows = [
+        ['Питание: ' + student_name],
+        ['Норма:'] + _norms_row(targets),
+        [],
+        [f'=QUERY({log_range}, "select A, sum(D), sum(E), sum(F), sum(G) where A is not null '
+         f"group by A order by A label sum(D) 'Калории', sum(E) 'Белки', sum(F) 'Жиры', "
+         f"sum(G) 'Углеводы'\", 1)"],
+    ]
+    spreadsheet = {
+        'properties': {'title': f'Питание - {student_name}'},
+        'sheets': [
+            {
+                'properties': {'sheetId': DAILY_SHEET_ID, 'title': LOG_SHEET_TITLE,
+                               'gridProperties': {'frozenRowCount': 1}},
+                'data': [{'startRow': 0, 'startColumn': 0, 'rowData': _grid_rows([LOG_HEADER])}],
+            },
+            {
+                'properties': {'sheetId': SUMMARY_SHEET_ID, 'title': SUMMARY_SHEET_TITLE,
+                               'gridProperties': {'frozenRowCount': 4}},
+                'data': [{'startRow': 0, 'startColumn': 0, 'rowData': _grid_rows(summary_rows)}],
+            },
+        ],
+    }
+    try:
+        spreadsheet_id = sheets_client.execute(
+            service.spreadsheets().create(body=spreadsheet, fields='spreadsheetId'),
+            idempotent=False)['spreadsheetId']
+        # дни, где сумма больше нормы на 10% / меньше на 10% (норма в строке 2)
+        sheets_client.execute(service.spreadsheets().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'requests': [
+                _summary_rule('=AND(B5<>"", B5>B$2*1.1)', OVER_COLOR),
+                _summary_rule('=AND(B5<>"", B5<B$2*0.9)', UNDER_COLOR),
+            ]}))
+        return spreadsheet_id
+    except HttpError as e:
+        raise api_error(e) from e
+
+
+def write_sync_delta(spreadsheet_id: str, start_row: int, rows: List[list],
+                     targets: Optional[Dict[str, float]] = None) -> None:
+    """
+    Дописывает строки журнала и (если переданы) нормы одним values.batchUpdate
+
+    start_row — индекс строки журнала (с 0), с которой пишутся rows. Запись
+    по фиксированному адресу, а не append: повторная выгрузка той же дельты
+    (например, из двух воркеров одновременно) перезапишет те же ячейки, а не
+    продублирует строки.
+
+    Raises:
+        SheetsNotFoundError: таблица удалена
+        SheetsQuotaError, SheetsExportError
+    """
+    service = get_service()
+    if not service:
+        raise SheetsExportError('Google Sheets не настроен: нет учетных данных сервисного аккаунта')
+
+    data = []
+    if rows:
+        data.append({'range': f"'{LOG_SHEET_TITLE}'!A{start_row + 1}", 'values': rows})
+    if targets is not None:
+        data.append({'range': f"'{SUMMARY_SHEET_TITLE}'!B2:E2", 'values': [_norms_row(targets)]})
+    if not data:
+        return
+    try:
+        sheets_client.execute(service.spreadsheets().values().batchUpdate(
+            spreadsheetId=spreadsheet_id,
+            body={'valueInputOption': 'USER_ENTERED', 'data': data}))
+    except HttpError as e:
+        raise api_error(e) from e
@@ -0,0 +1,141 @@
+"""Инкрементальная выгрузка логов питания в одну постоянную таблицу Google Sheets.
+
+fmt=sheets каждый раз создает новую таблицу и заливает всю историю. Здесь на
+ученика заводится одна таблица (SheetsSync хранит ее id), а при повторной
+выгрузке в лист «Журнал» дописываются только логи с EatLog.id больше
+последнего выгруженного. Итоги по дням на листе «Итоговый анализ» считает
+формула по журналу, так что из приложения обновляются лишь нормы — и только
+если они изменились. Без новых логов и с теми же нормами выгрузка не делает
+ни одного запроса к API.
+
+Состояние сдвигается compare-and-set'ом по last_log_id: если две выгрузки
+одного ученика идут одновременно, обе пишут одну дельту по одним и тем же
+адресам строк, а состояние обновит только первая.
+
+Строка SheetsSync резервируется (spreadsheet_id = NULL) до создания таблицы:
+из двух одновременных первых выгрузок таблицу создает только та, что заняла
+строку, вторая получает SheetsExportError и не оставляет в Drive сервисного
+аккаунта лишней таблицы. Резервацию упавшего воркера через
+RESERVATION_TIMEOUT забирает следующая выгрузка.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+
+from models import db, EatLog, SheetsSync
+from report_cache import targets_digest
+from services import google_sheets
+from services.google_sheets import SheetsExportError, SheetsNotFoundError
+
+# резервация без таблицы дольше этого считается брошенной (воркер упал при создании)
+RESERVATION_TIMEOUT = timedelta(minutes=5)
+
+
+def new_logs(student_id: int, after_id: int):
+    """Логи ученика с id > after_id (только нужные колонки) по возрастанию id."""
+    rows = db.session.execute(
+        select(EatLog.id, EatLog.created_at, EatLog.name, EatLog.calories,
+               EatLog.protein, EatLog.fat, EatLog.carbs)
+        .where(EatLog.student_id == student_id, EatLog.id > after_id)
+        .order_by(EatLog.id)
+    ).all()
+    return [{
+        'id': row.id,
+        'created_at': row.created_at,
+        'name': row.name,
+        'calories': float(row.calories or 0),
+        'protein': float(row.protein or 0),
+        'fat': float(row.fat or 0),
+        'carbs': float(row.carbs or 0),
+    } for row in rows]
+
+
+def _reserve(student_id: int, reserved_at: datetime) -> bool:
+    """Занимает строку SheetsSync ученика под создание таблицы; False — строка уже занята."""
+    inserted = db.session.execute(
+        insert(SheetsSync).prefix_with('OR IGNORE', dialect='sqlite')
+        .values(student_id=student_id, spreadsheet_id=None, last_log_id=0, next_row=1, synced_at=reserved_at)
+    ).rowcount
+    if inserted != 1:
+        # брошенную резервацию забираем compare-and-set'ом по времени резервации
+        inserted = db.session.execute(
+            update(SheetsSync)
+            .where(SheetsSync.student_id == student_id, SheetsSync.spreadsheet_id.is_(None),
+                   SheetsSync.synced_at < reserved_at - RESERVATION_TIMEOUT)
+            .values(synced_at=reserved_at)
+        ).rowcount
+    db.session.commit()
+    return inserted == 1
+
+
+def _create_state(child, targets) -> SheetsSync:
+    reserved_at = datetime.utcnow()
+    if not _reserve(child.id, reserved_at):
+        state = db.session.get(SheetsSync, child.id)
+        if state is not None and state.spreadsheet_id is not None:
+            # параллельная первая выгрузка успела создать свою таблицу — пишем в нее
+            return state
+        raise SheetsExportError('Таблица ученика еще создается, повторите выгрузку через минуту')
+
+    mine = (SheetsSync.student_id == child.id, SheetsSync.spreadsheet_id.is_(None),
+            SheetsSync.synced_at == reserved_at)
+    try:
+        spreadsheet_id = google_sheets.create_sync_spreadsheet(child.name or child.login, targets)
+    except Exception:
+        db.session.rollback()
+        db.session.execute(delete(SheetsSync).where(*mine))
+        db.session.commit()
+        raise
+    db.session.execute(
+        update(SheetsSync).where(*mine)
+        .values(spreadsheet_id=spreadsheet_id, targets_digest=targets_digest(targets))
+    )
+    db.session.commit()
+    return db.session.get(SheetsSync, child.id)
+
+
+def _push(state: SheetsSync, child, targets) -> None:
+    digest = targets_digest(targets)
+    logs = new_logs(child.id, state.last_log_id)
+    if not logs and digest == state.targets_digest:
+        return
+
+    google_sheets.write_sync_delta(state.spreadsheet_id, state.next_row,
+                                   google_sheets.build_log_rows(logs),
+                                   targets if digest != state.targets_digest else None)
+
+    values = {'targets_digest': digest, 'synced_at': datetime.utcnow()}
+    if logs:
+        values.update(last_log_id=logs[-1]['id'], next_row=state.next_row + len(logs))
+    db.session.execute(
+        update(SheetsSync)
+        .where(SheetsSync.student_id == child.id, SheetsSync.last_log_id == state.last_log_id)
+        .values(**values)
+    )
+    db.session.commit()
+
+
+def sync_student_sheet(child, targets) -> str:
+    """Дописывает новые логи ученика в его таблицу (создает ее при первой выгрузке); возвращает URL.
+
+    Если таблицу удалили в Google Drive, она создается заново со всей историей.
+
+    Raises:
+        SheetsQuotaError, SheetsExportError (см. services.google_sheets)
+    """
+    state = db.session.get(SheetsSync, child.id)
+    if state is None or state.spreadsheet_id is None:
+        state = _create_state(child, targets)
+    try:
+        _push(state, child, targets)
+    except SheetsNotFoundError:
+        # удаляем только строку с пропавшей таблицей: резервацию параллельной выгрузки не трогаем
+        db.session.execute(delete(SheetsSync).where(SheetsSync.student_id == child.id,
+                                                    SheetsSync.spreadsheet_id == state.spreadsheet_id))
+        db.session.commit()
+        state = _create_state(child, targets)
+        _push(state, child, targets)
+    return google_sheets.spreadsheet_url(state.spreadsheet_id)
+
+
+__all__ = ["new_logs", "sync_student_sheet"]
@@ -0,0 +1,54 @@
+"""Настройки SQLite для продакшена.
+
+Gunicorn запускает несколько sync-воркеров с потоками против одного файла
+instance/school_food.db. В режиме rollback-журнала читатели блокируются на
+время записи, а параллельные вставки EatLog в обед падают с
+"database is locked". Эти PRAGMA применяются к каждому новому соединению
+из пула (см. flask_app.py, событие connect).
+"""
+import sqlite3
+from typing import Dict, Union
+
+DEFAULT_PRAGMAS: Dict[str, Union[str, int]] = {
+    # ждать освобождения блокировки (мс) вместо немедленной ошибки;
+    # идёт первым, чтобы следующие PRAGMA тоже его учитывали
+    'busy_timeout': 5000,
+    # читатели не блокируются писателем, коммит не делает fsync всего журнала
+    'journal_mode': 'WAL',
+    # в WAL-режиме NORMAL безопасен при сбое приложения и заметно быстрее FULL
+    'synchronous': 'NORMAL',
+    # отрицательное значение — размер в КиБ (~20 МБ кэша страниц на соединение)
+    'cache_size': -20000,
+    # чтение через mmap (256 МБ)
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+
+def apply_pragmas(dbapi_connection, pragmas: Dict[str, Union[str, int]] = None) -> None:
+    """Выполняет PRAGMA на DB-API соединении SQLite (для других СУБД ничего не делает)."""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    if pragmas is None:
+        pragmas = DEFAULT_PRAGMAS
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if name == 'journal_mode':
+                # режим журнала хранится в файле БД; повторное переключение
+                # требует эксклюзивной блокировки, поэтому делаем его только один раз
+                current = cursor.execute('PRAGMA journal_mode').fetchone()
+                if current and str(current[0]).lower() == str(value).lower():
+                    continue
+                try:
+                    cursor.execute(f'PRAGMA {name}={value}')
+                except sqlite3.OperationalError:
+                    # режим одновременно переключает соседний воркер
+                    pass
+                continue
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+__all__ = ["DEFAULT_PRAGMAS", "apply_pragmas"]
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from flask_app import app
+from barcode_lookup import BarcodeCache, barcode_cache, find_food_by_barcode
+from models import db, Eat
+
+
+@pytest.fixture
+def juice(app_db):
+    with app.app_context():
+        barcode_cache.clear()
+        food = Eat(name='Сок яблочный', calories=90, protein=0, fat=0, carbs=22, type='normal',
+                   barcode='4600000000017')
+        db.session.add(food)
+        db.session.commit()
+        yield food
+        db.session.remove()
+
+
+def barcode_queries(statements):
+    return [s for s in statements if 'eat.barcode =' in s]
+
+
+def test_barcode_is_unique(juice):
+    db.session.add(Eat(name='Другой сок', calories=80, protein=0, fat=0, carbs=20, barcode='4600000000017'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+    # продукты без штрихкода не конфликтуют
+    db.session.add(Eat(name='Яблоко', calories=50, protein=0, fat=0, carbs=12))
+    db.session.add(Eat(name='Груша', calories=55, protein=0, fat=0, carbs=13))
+    db.session.commit()
+
+
+def test_repeated_scans_resolve_barcode_once(juice, count_queries):
+    with count_queries() as statements:
+        food = find_food_by_barcode(' 4600000000017 ')
+    assert food.id == juice.id
+    assert len(barcode_queries(statements)) == 1
+
+    db.session.expunge_all()
+    for _ in range(5):
+        with count_queries() as statements:
+            food = find_food_by_barcode('4600000000017')
+        assert food.name == 'Сок яблочный'
+        assert barcode_queries(statements) == []
+    assert barcode_cache.hits == 5
+
+
+def test_stale_cache_entry_is_rechecked(juice):
+    find_food_by_barcode('4600000000017')
+    juice.barcode = '4600000000024'
+    db.session.commit()
+
+    assert find_food_by_barcode('4600000000017') is None
+    assert find_food_by_barcode('4600000000024').id == juice.id
+
+    db.session.delete(juice)
+    db.session.commit()
+    assert find_food_by_barcode('4600000000024') is None
+
+
+def test_unknown_and_empty_barcodes_are_not_cached(juice):
+    assert find_food_by_barcode('   ') is None
+    assert find_food_by_barcode('0000') is None
+    assert len(barcode_cache) == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = BarcodeCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
@@ -0,0 +1,160 @@
+import io
+import threading
+
+import pytest
+from google.api_core.exceptions import DeadlineExceeded
+from PIL import Image
+
+import flask_app
+import food_detection_impl
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, LatencyHistogram
+from export_jobs import ExportJobQueue
+from flask_app import app
+from food_detection_impl import GeminiClient
+from models import db, Admin
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError('upstream down')
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = Clock()
+    breaker = CircuitBreaker('api', failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    # успех сбрасывает счетчик: нужны именно ошибки подряд
+    assert breaker.call(lambda: 'ok') == 'ok'
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN
+
+    calls = []
+    clock.now = 10
+    with pytest.raises(CircuitOpenError) as err:
+        breaker.call(calls.append, 1)
+    assert calls == [] and err.value.retry_after == 20
+    stats = breaker.stats()
+    assert (stats['calls'], stats['failures'], stats['rejected'], stats['opened']) == (6, 5, 1, 1)
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker('api', failure_threshold=1, reset_timeout=30, clock=clock)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+
+    # пока идет проба, остальные вызовы отклоняются
+    assert breaker.allow() is True
+    assert breaker.allow() is False
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.retry_after() == 30
+
+    clock.now = 60
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED and breaker.allow() is True
+
+
+def test_latency_histogram_is_cumulative():
+    hist = LatencyHistogram(buckets=(0.5, 1, 5))
+    for seconds in (0.1, 0.5, 0.7, 3, 12):
+        hist.observe(seconds)
+    snap = hist.snapshot()
+    assert snap['buckets'] == {'0.5': 2, '1': 3, '5': 4, '+Inf': 5}
+    assert snap['count'] == 5 and snap['sum'] == 16.3
+
+
+class HungModel:
+    """Модель, у которой каждый запрос упирается в дедлайн."""
+
+    def __init__(self):
+        self.options = []
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        self.options.append(request_options)
+        raise DeadlineExceeded('Deadline Exceeded')
+
+
+@pytest.fixture
+def hung(monkeypatch):
+    model = HungModel()
+    breaker = CircuitBreaker('gemini', failure_threshold=2, reset_timeout=60,
+                             is_timeout=food_detection_impl._is_timeout)
+    monkeypatch.setattr(food_detection_impl, 'breaker', breaker)
+    monkeypatch.setattr(food_detection_impl, 'get_client', lambda: GeminiClient(model, 'config'))
+    monkeypatch.setattr(food_detection_impl, 'GEMINI_TIMEOUT', 7.5)
+    return model, breaker
+
+
+def test_gemini_call_has_deadline_and_fails_fast(hung):
+    model, breaker = hung
+    img = Image.new('RGB', (64, 48), (200, 100, 50))
+    for _ in range(4):
+        assert food_detection_impl._analyze_with_gemini(img) is None
+    # после двух таймаутов API больше не вызывается
+    assert model.options == [{'timeout': 7.5, 'retry': None}] * 2
+    stats = breaker.stats()
+    assert stats['state'] == OPEN and stats['timeouts'] == 2 and stats['rejected'] == 2
+    assert stats['latency']['timeout']['count'] == 2 and stats['latency']['ok']['count'] == 0
+
+
+def test_open_breaker_gives_unavailable_message(hung, tmp_path, monkeypatch, app_db):
+    _, breaker = hung
+    monkeypatch.setattr(flask_app, 'breakers', lambda: {'gemini': breaker})
+    monkeypatch.setattr(flask_app, 'UPLOAD_FOLDER', tmp_path)
+    monkeypatch.setattr(flask_app, 'photo_jobs', ExportJobQueue(tmp_path / 'photo_jobs'))
+    monkeypatch.setattr(app, '_analyze_image_checked', True, raising=False)
+    monkeypatch.setattr(app, '_analyze_image', lambda path: None, raising=False)
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    client = app.test_client()
+    client.get('/photo_analyze')
+
+    def job_error():
+        buf = io.BytesIO()
+        Image.new('RGB', (32, 32), (10, 200, 30)).save(buf, 'JPEG')
+        buf.seek(0)
+        resp = client.post('/photo_analyze', data={'file': (buf, 'meal.jpg')}, content_type='multipart/form-data',
+                           headers={'Accept': 'application/json'})
+        flask_app.photo_jobs.wait(5)
+        return client.get(resp.get_json()['status_url'], headers={'Accept': 'application/json'}).get_json()['error']
+
+    assert job_error() == flask_app.PHOTO_ANALYSIS_FAILED
+    for _ in range(2):
+        with pytest.raises(DeadlineExceeded):
+            breaker.call(HungModel().generate_content, 'prompt')
+    assert job_error() == flask_app.PHOTO_ANALYSIS_UNAVAILABLE
+
+    assert client.get('/api/v1/photo_analysis_status').status_code == 302
+    with app.app_context():
+        admin = Admin(login='root', password='x')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['role'] = 'admin'
+    status = client.get('/api/v1/photo_analysis_status').get_json()
+    assert status['breakers']['gemini']['state'] == OPEN
+    assert status['breakers']['gemini']['latency']['timeout']['buckets']['+Inf'] == 2
+
+
+def test_breaker_is_thread_safe():
+    breaker = CircuitBreaker('api', failure_threshold=1000)
+    threads = [threading.Thread(target=lambda: [breaker.call(lambda: None) for _ in range(200)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert breaker.stats()['calls'] == 1600 and breaker.latency['ok'].snapshot()['count'] == 1600
@@ -0,0 +1,43 @@
+import pytest
+
+from flask_app import app
+from models import db, Student
+
+
+@pytest.fixture
+def client(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False, DB_QUERY_COUNT_HEADER=True)
+    with app.app_context():
+        student = Student(login='kid', password='x')
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['role'] = 'student'
+    # первый запрос процесса дополнительно проверяет наличие админа
+    client.get('/dashboard')
+    yield client
+    app.config.pop('DB_QUERY_COUNT_HEADER', None)
+
+
+def test_student_row_loaded_once_per_request(client, count_queries):
+    with count_queries() as statements:
+        resp = client.get('/dashboard')
+
+    assert resp.status_code == 200
+    student_selects = [s for s in statements if 'FROM student' in s]
+    assert len(student_selects) == 1
+    assert resp.headers['X-DB-Queries'] == str(len(statements))
+
+
+def test_deleted_user_session_is_cleared(client):
+    with app.app_context():
+        Student.query.delete()
+        db.session.commit()
+
+    resp = client.get('/eat')
+    assert resp.status_code == 302
+    with client.session_transaction() as sess:
+        assert 'user_id' not in sess
@@ -0,0 +1,111 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+import daily_nutrition
+from flask_app import app, get_children_today
+from models import db, Student, EatLog, DailyNutrition
+from daily_nutrition import add_log, backfill, get_daily_totals, get_day_totals
+
+
+@pytest.fixture
+def student(app_db):
+    with app.app_context():
+        s = Student(login='kid', password='x')
+        db.session.add(s)
+        db.session.commit()
+        yield s
+        db.session.remove()
+
+
+def make_log(student_id, calories, created_at=None):
+    log = EatLog(student_id=student_id, food_id=None, name='Каша',
+                 calories=calories, protein=1.0, fat=2.0, carbs=3.0)
+    log.created_at = created_at
+    return log
+
+
+def test_add_log_updates_rollup_in_same_transaction(student):
+    add_log(make_log(student.id, 100))
+    add_log(make_log(student.id, 50.5))
+    db.session.commit()
+
+    row = db.session.get(DailyNutrition, (student.id, datetime.utcnow().date()))
+    assert row.calories == pytest.approx(150.5)
+    assert row.carbs == pytest.approx(6.0)
+    assert row.log_count == 2
+
+
+def test_rollback_discards_rollup(student):
+    add_log(make_log(student.id, 100))
+    db.session.rollback()
+    assert DailyNutrition.query.count() == 0
+
+
+def test_backfill_matches_incremental(student):
+    days = [datetime(2025, 3, 1, 9), datetime(2025, 3, 1, 13), datetime(2025, 3, 2, 12)]
+    for i, created in enumerate(days):
+        add_log(make_log(student.id, 100 + i, created))
+    db.session.commit()
+    incremental = get_daily_totals(student.id)
+
+    DailyNutrition.query.delete()
+    db.session.commit()
+    assert backfill() == 2
+    db.session.commit()
+
+    assert get_daily_totals(student.id) == incremental
+    assert incremental['2025-03-01']['calories'] == 201.0
+    assert incremental['2025-03-01']['count'] == 2
+
+
+def test_get_day_totals_returns_zeros_for_missing(student):
+    totals = get_day_totals([student.id, 999])
+    assert totals[999]['calories'] == 0.0
+    assert totals[student.id]['count'] == 0
+
+
+def test_today_follows_utc_log_dates(student, monkeypatch):
+    # 23:30 UTC — на сервере в UTC+3 уже 02:30 следующего дня
+    class PinnedDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return datetime(2025, 3, 1, 23, 30)
+
+    monkeypatch.setattr(daily_nutrition, 'datetime', PinnedDatetime)
+    add_log(make_log(student.id, 120))
+    db.session.commit()
+
+    assert daily_nutrition.today_key().isoformat() == '2025-03-01'
+    child_logs, summaries = get_children_today([student])
+    assert [log.calories for log in child_logs[student.id]] == [120]
+    assert summaries[student.id]['sum_cal'] == 120.0
+
+
+def test_first_log_of_day_is_one_upsert(student, count_queries):
+    with count_queries() as statements:
+        add_log(make_log(student.id, 100))
+        db.session.flush()
+    rollup = [s for s in statements if 'daily_nutrition' in s]
+    assert len(rollup) == 1 and 'ON CONFLICT' in rollup[0]
+    db.session.commit()
+    assert get_day_totals([student.id])[student.id]['calories'] == 100.0
+
+
+def test_startup_builds_empty_rollup_from_history(app_db):
+    with app.app_context():
+        kid = Student(login='kid', password='x')
+        db.session.add(kid)
+        db.session.commit()
+        kid_id = kid.id
+        db.session.add(make_log(kid_id, 300, datetime(2025, 3, 1, 9)))
+        db.session.commit()
+    # существующая база без сводки: ее строит импорт приложения, а не ручной скрипт
+    env = dict(os.environ, DATABASE_URL=str(app_db.url))
+    subprocess.run([sys.executable, '-c', 'import flask_app'], cwd=os.path.dirname(__file__),
+                   env=env, check=True, capture_output=True)
+    with app.app_context():
+        assert get_daily_totals(kid_id)['2025-03-01']['calories'] == 300.0
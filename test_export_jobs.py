@@ -0,0 +1,236 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+import flask_app
+from export_jobs import DONE, FAILED, ExportJobQueue
+from flask_app import app
+from models import db, EatLog, Parents, Student
+from report_cache import ExportFileCache
+from services.google_sheets import SheetsQuotaError
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    queue = ExportJobQueue(tmp_path / 'exports', max_workers=2, ttl=3600)
+    monkeypatch.setattr(flask_app, 'export_jobs', queue)
+    monkeypatch.setattr(flask_app, 'export_files', ExportFileCache(tmp_path / 'cache'))
+    return queue
+
+
+@pytest.fixture
+def family(jobs, app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        parent = Parents(login='mom', password='x')
+        db.session.add(parent)
+        db.session.flush()
+        child = Student(login='kid', password='x', parent_id=parent.id, calories=2000)
+        db.session.add(child)
+        db.session.flush()
+        for day, kcal in ((1, 300), (2, 500)):
+            log = EatLog(student_id=child.id, food_id=None, name=f'Блюдо {day}',
+                         calories=kcal, protein=10, fat=5, carbs=40)
+            log.created_at = datetime(2025, 3, day, 12, 0)
+            db.session.add(log)
+        db.session.commit()
+        ids = {'parent': parent.id, 'child': child.id}
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['parent']
+        sess['role'] = 'parent'
+    yield client, ids
+
+
+def test_csv_job_is_rendered_in_background(family, jobs):
+    client, ids = family
+    resp = client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'csv'})
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert job['period'] == ['2025-03-01', '2025-03-02']
+
+    jobs.wait(timeout=10)
+    status = client.get(job['status_url']).get_json()
+    assert status['status'] == DONE
+    assert status['expires_at']
+
+    download = client.get(status['download_url'])
+    assert download.status_code == 200
+    assert download.headers['Content-Disposition'].endswith('kid_nutrition_2025-03-01_to_2025-03-02.csv')
+    lines = download.get_data().decode('utf-8').splitlines()
+    assert lines[-1] == 'Итого,,,800.0,20.0,10.0,80.0'
+    download.close()
+
+
+def test_sheets_job_returns_link(family, jobs, monkeypatch):
+    client, ids = family
+    calls = []
+
+    def fake_report(login, logs, targets):
+        calls.append((login, len(logs)))
+        return 'https://docs.google.com/spreadsheets/d/abc'
+
+    monkeypatch.setattr(flask_app, 'create_nutrition_report', fake_report)
+    job = client.post('/api/v1/exports', data={'student_id': ids['child']}).get_json()
+    jobs.wait(timeout=10)
+    status = client.get(job['status_url']).get_json()
+    assert status['status'] == DONE
+    assert status['url'] == 'https://docs.google.com/spreadsheets/d/abc'
+    assert 'download_url' not in status
+    assert calls == [('kid', 2)]
+
+
+def test_export_link_waits_for_background_job(family, jobs, monkeypatch):
+    client, ids = family
+    release = threading.Event()
+
+    def slow_report(login, logs, targets):
+        release.wait(5)
+        return 'https://docs.google.com/spreadsheets/d/abc'
+
+    monkeypatch.setattr(flask_app, 'create_nutrition_report', slow_report)
+    # ссылка из кабинета родителя отвечает сразу, не дожидаясь Sheets API
+    page = client.get(f"/parent/child/{ids['child']}/export?fmt=sheets")
+    assert page.status_code == 200
+    assert '/api/v1/exports/' in page.get_data(as_text=True)
+    job = client.get(f"/parent/child/{ids['child']}/export", headers={'Accept': 'application/json'})
+    assert job.status_code == 202 and job.get_json()['fmt'] == 'sheets'
+    # та же выгрузка еще идет — вторая задача не создается
+    assert job.get_json()['status_url'] in page.get_data(as_text=True)
+
+    release.set()
+    jobs.wait(timeout=10)
+    assert client.get(job.get_json()['status_url']).get_json()['url'] == 'https://docs.google.com/spreadsheets/d/abc'
+
+
+def test_failed_job_reports_error(family, jobs, monkeypatch):
+    client, ids = family
+    monkeypatch.setattr(flask_app, 'create_nutrition_report', lambda *args: None)
+    job = client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'sheets'}).get_json()
+    jobs.wait(timeout=10)
+    status = client.get(job['status_url']).get_json()
+    assert status['status'] == FAILED
+    assert 'Google Sheets' in status['error']
+    assert client.get(f"/api/v1/exports/{job['id']}/download").status_code == 404
+
+
+def test_sheets_quota_error_is_reported(family, jobs, monkeypatch):
+    client, ids = family
+
+    def over_quota(*args):
+        raise SheetsQuotaError('Google Sheets сейчас перегружен запросами, попробуйте через минуту')
+
+    monkeypatch.setattr(flask_app, 'create_nutrition_report', over_quota)
+    job = client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'sheets'}).get_json()
+    jobs.wait(timeout=10)
+    status = client.get(job['status_url']).get_json()
+    assert status['status'] == FAILED
+    assert status['error'] == 'Google Sheets сейчас перегружен запросами, попробуйте через минуту'
+
+
+def test_foreign_child_and_job_are_hidden(family, jobs):
+    client, ids = family
+    job = client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'csv'}).get_json()
+    jobs.wait(timeout=10)
+    assert client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'pdf'}).status_code == 400
+
+    with app.app_context():
+        stranger = Parents(login='stranger', password='x')
+        db.session.add(stranger)
+        db.session.commit()
+        stranger_id = stranger.id
+    with client.session_transaction() as sess:
+        sess['user_id'] = stranger_id
+    assert client.post('/api/v1/exports', json={'student_id': ids['child'], 'fmt': 'csv'}).status_code == 403
+    assert client.get(job['status_url']).status_code == 404
+    assert client.get(f"/api/v1/exports/{job['id']}/download").status_code == 404
+
+
+def test_inflight_jobs_are_deduplicated(tmp_path):
+    queue = ExportJobQueue(tmp_path, max_workers=2)
+    release = threading.Event()
+    calls = []
+
+    def render(path):
+        calls.append(path)
+        release.wait(5)
+        path.write_bytes(b'data')
+        return {'download_name': 'r.csv', 'mimetype': 'text/csv'}
+
+    first = queue.submit((1, '2025-03-01', '2025-03-02', 'csv'), 7, render)
+    second = queue.submit((1, '2025-03-01', '2025-03-02', 'csv'), 7, render)
+    other = queue.submit((1, '2025-03-01', '2025-03-02', 'xlsx'), 7, render)
+    assert first['id'] == second['id']
+    assert other['id'] != first['id']
+
+    release.set()
+    queue.wait(timeout=5)
+    assert len(calls) == 2
+    # после завершения такая же выгрузка строится заново
+    third = queue.submit((1, '2025-03-01', '2025-03-02', 'csv'), 7, render)
+    assert third['id'] != first['id']
+    queue.wait(timeout=5)
+
+
+def test_inflight_jobs_are_deduplicated_across_workers(tmp_path):
+    # два воркера gunicorn — две очереди над одним каталогом
+    worker_a = ExportJobQueue(tmp_path, max_workers=1)
+    worker_b = ExportJobQueue(tmp_path, max_workers=1)
+    release = threading.Event()
+    calls = []
+
+    def render(path):
+        calls.append(path)
+        release.wait(5)
+        path.write_bytes(b'data')
+        return {'download_name': 'r.csv', 'mimetype': 'text/csv'}
+
+    key = (1, 'sheets', (2, 2, '2025-03-02T12:00:00'))
+    first = worker_a.submit(key, 7, render)
+    second = worker_b.submit(key, 7, render)
+    assert second['id'] == first['id'] and second['status'] in ('queued', 'running')
+    assert worker_b.submit((1, 'sheets', (3, 3, '2025-03-03T12:00:00')), 7, render)['id'] != first['id']
+
+    release.set()
+    worker_a.wait(timeout=5)
+    worker_b.wait(timeout=5)
+    assert len(calls) == 2
+    assert list(tmp_path.glob('*.lock')) == []
+    # после завершения такая же выгрузка строится заново
+    assert worker_b.submit(key, 7, render)['id'] != first['id']
+    worker_b.wait(timeout=5)
+
+
+def test_lock_of_finished_job_is_taken_over(tmp_path):
+    queue = ExportJobQueue(tmp_path, max_workers=1)
+    done = queue.submit((1, 'csv'), 7, lambda path: {'url': 'x'})
+    queue.wait(timeout=5)
+    # воркер умер между завершением задачи и снятием lock-файла
+    queue._lock_path((1, 'csv')).write_text(done['id'])
+    job = queue.submit((1, 'csv'), 7, lambda path: {'url': 'y'})
+    assert job['id'] != done['id']
+    queue.wait(timeout=5)
+    assert queue.get(job['id'])['result'] == {'url': 'y'}
+
+
+def test_results_are_shared_between_workers_and_expire(tmp_path, monkeypatch):
+    queue = ExportJobQueue(tmp_path, ttl=60)
+
+    def render(path):
+        path.write_bytes(b'data')
+        return {'download_name': 'r.csv', 'mimetype': 'text/csv'}
+
+    job = queue.submit('key', 7, render)
+    queue.wait(timeout=5)
+    # другой воркер видит задачу через файлы в result_dir
+    other_worker = ExportJobQueue(tmp_path, ttl=60)
+    assert other_worker.get(job['id'])['status'] == DONE
+    assert other_worker.result_path(job['id']).read_bytes() == b'data'
+    assert other_worker.get('../../etc/passwd') is None
+
+    now = flask_app.time.time()
+    monkeypatch.setattr('export_jobs.time.time', lambda: now + 61)
+    assert queue.purge_expired() == 1
+    assert queue.get(job['id']) is None
+    assert list(tmp_path.iterdir()) == []
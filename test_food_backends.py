@@ -0,0 +1,131 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+import flask_app
+import food_detection
+from export_jobs import ExportJobQueue
+from flask_app import app
+from food_detection import AnalysisBackend, StubBackend, analyze_image, parse_chain, register_backend
+from food_detection_local import LocalClassifierBackend, LocalFoodClassifier, watch_food_images
+from models import db, Eat
+
+
+class Fixed(AnalysisBackend):
+    def __init__(self, name, result=None, error=None):
+        self.name = name
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def analyze(self, image_path):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.result
+
+
+def dish(path, color, size=(400, 300), spots=None):
+    img = Image.new('RGB', size, color)
+    if spots:
+        draw = ImageDraw.Draw(img)
+        draw.ellipse((50, 50, 150, 150), fill=spots)
+    img.save(path, 'JPEG', quality=90)
+    return path
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    monkeypatch.setattr(food_detection, '_backends', dict(food_detection._backends))
+    return food_detection._backends
+
+
+def test_chain_falls_back_to_next_backend(backends, tmp_path):
+    down = Fixed('down', error=ConnectionError('timeout'))
+    empty = Fixed('empty')
+    ok = Fixed('ok', {'name': 'Суп', 'calories': 100.0})
+    for backend in (down, empty, ok):
+        register_backend(backend)
+
+    result = analyze_image(str(tmp_path / 'x.jpg'), 'down, missing, empty, ok')
+    assert result == {'name': 'Суп', 'calories': 100.0, 'source': 'ok'}
+    assert (down.calls, empty.calls, ok.calls) == (1, 1, 1)
+    assert analyze_image(str(tmp_path / 'x.jpg'), ['down', 'empty']) is None
+    assert parse_chain(' Gemini , local,,') == ['gemini', 'local']
+
+
+def test_stub_is_deterministic(tmp_path):
+    first = dish(tmp_path / 'a.jpg', (200, 40, 40))
+    second = dish(tmp_path / 'b.jpg', (40, 200, 40))
+    stub = StubBackend()
+    assert stub.analyze(str(first)) == stub.analyze(str(first))
+    assert analyze_image(str(first), 'stub')['source'] == 'stub'
+    names = {dish_[0] for dish_ in StubBackend.DISHES}
+    assert stub.analyze(str(second))['name'] in names
+
+
+@pytest.fixture
+def menu(tmp_path, app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    images = tmp_path / 'images'
+    images.mkdir()
+    dish(images / 'borsch.jpg', (170, 30, 40), spots=(240, 240, 230))
+    dish(images / 'omelet.jpg', (240, 210, 90))
+    with app.app_context():
+        db.session.add_all([
+            Eat(name='Борщ', calories=180, protein=6, fat=9, carbs=18, image='borsch.jpg'),
+            Eat(name='Омлет', calories=230, protein=15, fat=17, carbs=3, image='omelet.jpg'),
+            Eat(name='Чай', calories=30, protein=0, fat=0, carbs=8),
+            Eat(name='Сок', calories=90, protein=1, fat=0, carbs=21, image='https://example.com/juice.jpg'),
+        ])
+        db.session.commit()
+    return images, LocalFoodClassifier(tmp_path / 'classifier.stamp', [images], check_interval=0)
+
+
+def test_local_classifier_uses_eat_table(menu, tmp_path):
+    images, classifier = menu
+    backend = LocalClassifierBackend(classifier)
+    photo = dish(tmp_path / 'lunch.jpg', (165, 35, 45), size=(1200, 900), spots=(235, 235, 225))
+    with app.app_context():
+        result = backend.analyze(str(photo))
+        assert result['name'] == 'Борщ'
+        assert (result['calories'], result['protein'], result['fat'], result['carbs']) == (180.0, 6.0, 9.0, 18.0)
+        assert result['confidence'] >= classifier.min_similarity
+        # незнакомое блюдо — пусть отвечает следующий бэкенд
+        assert backend.analyze(str(dish(tmp_path / 'salad.jpg', (30, 160, 60)))) is None
+
+
+def test_local_references_follow_eat_changes(menu, tmp_path):
+    images, classifier = menu
+    watch_food_images(classifier)
+    salad = dish(tmp_path / 'salad.jpg', (30, 160, 40))
+    with app.app_context():
+        assert classifier.classify(str(salad)) is None
+        dish(images / 'salad.jpg', (35, 155, 45))
+        db.session.add(Eat(name='Салат', calories=60, protein=2, fat=3, carbs=7, image='salad.jpg'))
+        db.session.commit()
+        food, score = classifier.classify(str(salad))
+        assert food['name'] == 'Салат'
+
+
+def test_photo_upload_falls_back_offline(menu, tmp_path, monkeypatch):
+    monkeypatch.setattr(flask_app, 'UPLOAD_FOLDER', tmp_path)
+    monkeypatch.setattr(flask_app, 'photo_jobs', ExportJobQueue(tmp_path / 'photo_jobs'))
+    monkeypatch.setattr(app, '_analyze_image_checked', False, raising=False)
+    monkeypatch.setitem(app.config, 'FOOD_ANALYSIS_BACKENDS', 'gemini,stub')
+    # сети нет: Gemini ничего не вернул
+    gemini_calls = []
+    monkeypatch.setattr(food_detection, 'analyze_image_with_gemini', lambda path: gemini_calls.append(path))
+
+    client = app.test_client()
+    client.get('/photo_analyze')
+    buf = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 100, 50)).save(buf, 'JPEG')
+    buf.seek(0)
+    resp = client.post('/photo_analyze', data={'file': (buf, 'meal.jpg')}, content_type='multipart/form-data',
+                       headers={'Accept': 'application/json'})
+    flask_app.photo_jobs.wait(5)
+    job = client.get(resp.get_json()['status_url'], headers={'Accept': 'application/json'}).get_json()
+    assert len(gemini_calls) == 1
+    assert job['status'] == 'done' and job['data']['source'] == 'stub'
@@ -0,0 +1,70 @@
+import pytest
+
+import food_search
+from flask_app import app
+from food_search import build_match_query, ensure_fts_index, fts_enabled, search_foods
+from models import db, Eat
+
+
+@pytest.fixture
+def foods(app_db):
+    with app.app_context():
+        for name in ('Борщ украинский', 'Суп с борщевым соусом', 'Котлета куриная', 'Ёжики мясные'):
+            db.session.add(Eat(name=name, calories=100, protein=5, fat=5, carbs=10, type='normal'))
+        db.session.add(Eat(name='Компот', calories=60, protein=0, fat=0, carbs=15, type='school', week=1, day=1))
+        db.session.commit()
+        yield
+        db.session.remove()
+
+
+def names(result):
+    return [f.name for f in result]
+
+
+def test_build_match_query_quotes_words():
+    assert build_match_query('бор ку') == '"бор"* "ку"*'
+    assert build_match_query('борщ OR -"x"') == '"борщ"* "OR"* "x"*'
+    assert build_match_query('  ,, ') is None
+
+
+def test_prefix_search_is_case_insensitive_for_cyrillic(foods):
+    assert fts_enabled()
+    assert names(search_foods('БОР')) == ['Борщ украинский', 'Суп с борщевым соусом']
+    assert names(search_foods('борщ у')) == ['Борщ украинский']
+    assert names(search_foods('кот кур')) == ['Котлета куриная']
+    assert names(search_foods('ежик')) == ['Ёжики мясные']
+    assert names(search_foods('ёжик')) == ['Ёжики мясные']
+    assert names(search_foods('school')) == ['Компот']
+
+
+def test_results_ranked_by_relevance(foods):
+    db.session.add(Eat(name='Суп', calories=50, protein=1, fat=1, carbs=5, type='normal'))
+    db.session.commit()
+    assert names(search_foods('суп'))[0] == 'Суп'
+
+
+def test_existing_foods_indexed_on_startup(foods):
+    # база без индекса (например, созданная до появления поиска)
+    db.session.execute(db.text('DROP TABLE eat_fts'))
+    db.session.commit()
+    assert ensure_fts_index()
+    assert names(search_foods('ёжики')) == ['Ёжики мясные']
+
+
+def test_index_follows_update_and_delete(foods):
+    food = Eat.query.filter_by(name='Котлета куриная').one()
+    food.name = 'Тефтели'
+    db.session.commit()
+    assert search_foods('котл') == []
+    assert names(search_foods('тефт')) == ['Тефтели']
+
+    db.session.delete(food)
+    db.session.commit()
+    assert search_foods('тефт') == []
+
+
+def test_like_fallback_without_fts(foods, monkeypatch):
+    monkeypatch.setattr(food_search, 'fts_enabled', lambda: False)
+    # LIKE ищет подстроку в любом месте названия, но в SQLite не сворачивает регистр кириллицы
+    assert names(search_foods('борщ')) == ['Суп с борщевым соусом']
+    assert names(search_foods('рщ укр')) == ['Борщ украинский']
@@ -0,0 +1,92 @@
+import pytest
+
+import food_suggest
+from flask_app import app, food_suggest_index
+from food_suggest import FoodSuggestIndex
+from models import db, Eat, Student
+
+
+@pytest.fixture
+def catalogue(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        for name, kcal in (('Борщ', 120), ('Суп с борщом', 90), ('Бородинский хлеб', 210), ('Ёжики', 180)):
+            db.session.add(Eat(name=name, calories=kcal, protein=5, fat=5, carbs=10, type='normal'))
+        db.session.commit()
+        yield
+        db.session.remove()
+
+
+def names(result):
+    return [f['name'] for f in result]
+
+
+def test_prefix_matches_any_word_name_start_first(catalogue, tmp_path):
+    index = FoodSuggestIndex(tmp_path / 'stamp')
+    assert names(index.suggest('бор')) == ['Борщ', 'Бородинский хлеб', 'Суп с борщом']
+    assert names(index.suggest('БОРЩ', limit=1)) == ['Борщ']
+    assert names(index.suggest('ёж')) == names(index.suggest('еж')) == ['Ёжики']
+    assert index.suggest('') == []
+    assert index.suggest('щи') == []
+
+
+def test_name_start_matches_are_not_cut_by_candidate_cap(catalogue, tmp_path, monkeypatch):
+    for name in ('Суп с аааа', 'Суп с абв', 'Каша с абрикосом', 'Арбуз'):
+        db.session.add(Eat(name=name, calories=50, protein=1, fat=1, carbs=10, type='normal'))
+    db.session.commit()
+    # ключи второго слова ("аааа", "абв", "абрикосом") по алфавиту идут раньше "арбуз"
+    monkeypatch.setattr(food_suggest, 'MAX_CANDIDATES', 2)
+    index = FoodSuggestIndex(tmp_path / 'stamp')
+    assert names(index.suggest('а', limit=3)) == ['Арбуз', 'Суп с абв', 'Суп с аааа']
+
+
+def test_steady_state_suggest_does_not_query_db(catalogue, tmp_path, count_queries):
+    index = FoodSuggestIndex(tmp_path / 'stamp', check_interval=0)
+    index.suggest('бор')
+
+    with count_queries() as statements:
+        for _ in range(20):
+            index.suggest('бор')
+    assert statements == []
+
+
+def test_commit_touching_eat_invalidates_all_workers(catalogue):
+    # food_suggest_index — индекс этого воркера, other_worker — соседний процесс
+    other_worker = FoodSuggestIndex(food_suggest_index.stamp_path, check_interval=0)
+    for index in (food_suggest_index, other_worker):
+        assert names(index.suggest('кот')) == []
+
+    db.session.add(Eat(name='Котлета', calories=250, protein=15, fat=15, carbs=10, type='school'))
+    db.session.commit()
+
+    assert names(food_suggest_index.suggest('кот')) == ['Котлета']
+    assert names(other_worker.suggest('кот')) == ['Котлета']
+
+
+def test_rolled_back_change_keeps_index(catalogue):
+    food_suggest_index.suggest('бор')
+    built = food_suggest_index._index
+    db.session.add(Eat(name='Котлета', calories=250, protein=15, fat=15, carbs=10, type='school'))
+    db.session.flush()
+    db.session.rollback()
+    assert food_suggest_index._index is built
+
+
+def test_suggest_endpoint(catalogue):
+    with app.app_context():
+        student = Student(login='kid', password='x')
+        db.session.add(student)
+        db.session.commit()
+        student_id = student.id
+    food_suggest_index.invalidate()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = student_id
+        sess['role'] = 'student'
+    resp = client.get('/api/v1/food/suggest?q=бор&limit=2')
+    assert resp.status_code == 200
+    assert resp.get_json() == [
+        {'id': 1, 'name': 'Борщ', 'calories': 120.0},
+        {'id': 3, 'name': 'Бородинский хлеб', 'calories': 210.0},
+    ]
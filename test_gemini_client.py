@@ -0,0 +1,83 @@
+import json
+import runpy
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+import food_detection_impl
+from food_detection_impl import GeminiClient
+
+
+class FakeModel:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None, request_options=None):
+        self.prompts.append((prompt, generation_config))
+        self.options = request_options
+        return SimpleNamespace(text=json.dumps({'foodName': 'Каша', 'servingSize': '200г', 'calories': 180,
+                                                'protein': 6, 'fat': 4, 'carbohydrates': '30,5'}))
+
+
+@pytest.fixture
+def created(monkeypatch):
+    created = []
+
+    def create():
+        time.sleep(0.01)  # окно для гонки между потоками
+        client = GeminiClient(FakeModel(), 'config')
+        created.append(client)
+        return client
+
+    food_detection_impl.reset_client()
+    monkeypatch.setattr(food_detection_impl, '_create_client', create)
+    yield created
+    food_detection_impl.reset_client()
+
+
+def test_client_is_created_once_across_threads(created):
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(food_detection_impl.get_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(client is created[0] for client in clients)
+
+
+def test_missing_key_is_not_cached(monkeypatch):
+    food_detection_impl.reset_client()
+    attempts = []
+    monkeypatch.setattr(food_detection_impl, '_create_client', lambda: attempts.append(1))
+    assert food_detection_impl.get_client() is None
+    assert food_detection_impl.warm_up() is False
+    assert len(attempts) == 2
+    food_detection_impl.reset_client()
+
+
+def test_analysis_reuses_client(created):
+    img = Image.new('RGB', (64, 48), (200, 100, 50))
+    first = food_detection_impl._analyze_with_gemini(img)
+    second = food_detection_impl._analyze_with_gemini(img)
+    assert first == second
+    assert first['name'] == 'Каша' and first['carbs'] == 30.5
+    assert len(created) == 1
+    prompts = created[0].model.prompts
+    assert len(prompts) == 2
+    prompt, config = prompts[0]
+    assert prompt[0] == food_detection_impl.PROMPT and prompt[1]['mime_type'] == 'image/jpeg'
+    assert config == 'config'
+    assert created[0].model.options == {'timeout': food_detection_impl.GEMINI_TIMEOUT, 'retry': None}
+
+
+def test_gunicorn_post_fork_warms_up(created):
+    conf = runpy.run_path('gunicorn.conf.py')
+    log = SimpleNamespace(warning=lambda *a: pytest.fail('warm-up failed'),
+                          exception=lambda *a: pytest.fail('warm-up raised'))
+    conf['post_fork'](SimpleNamespace(log=log), SimpleNamespace(pid=1))
+    assert len(created) == 1
+    assert food_detection_impl.get_client() is created[0]
@@ -0,0 +1,290 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+import httplib2
+from googleapiclient.discovery import build
+
+from services import google_sheets
+from services.google_sheets import (SheetsClient, SheetsExportError, SheetsMetrics, SheetsQuotaError,
+                                    TokenBucket)
+
+
+class FakeRequest:
+    def __init__(self, service, method, kwargs, result):
+        self.service = service
+        self.method = method
+        self.kwargs = kwargs
+        self.result = result
+
+    def execute(self):
+        self.service.calls.append((self.method, self.kwargs))
+        return self.result
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(self.service, 'values.batchUpdate', kwargs, {})
+
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def create(self, **kwargs):
+        return FakeRequest(self.service, 'create', kwargs, {'spreadsheetId': 'sheet123'})
+
+    def values(self):
+        return FakeValues(self.service)
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(self.service, 'batchUpdate', kwargs, {})
+
+
+class FakeSheetsService:
+    """Sheets API v4 в памяти: каждое execute() — одно обращение к API."""
+
+    def __init__(self):
+        self.calls = []
+
+    def spreadsheets(self):
+        return FakeSpreadsheets(self)
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    built = []
+    loaded = []
+
+    def fake_build(name, version, credentials=None, cache_discovery=True):
+        service = FakeSheetsService()
+        built.append(service)
+        return service
+
+    def fake_load():
+        loaded.append(1)
+        return object()
+
+    monkeypatch.setattr(google_sheets, 'build', fake_build)
+    monkeypatch.setattr(google_sheets, '_load_credentials', fake_load)
+    monkeypatch.setattr(google_sheets, 'sheets_client', SheetsClient(TokenBucket(1000, 1000), SheetsMetrics()))
+    google_sheets.reset_clients()
+    yield built, loaded
+    google_sheets.reset_clients()
+
+
+def make_logs(days, per_day):
+    start = datetime(2025, 3, 1, 8, 0)
+    return [{'created_at': start + timedelta(days=d, hours=i), 'name': f'Блюдо {i}',
+             'calories': 100.0 * (i + 1), 'protein': 5.0, 'fat': 3.0, 'carbs': 20.0}
+            for d in range(days) for i in range(per_day)]
+
+
+TARGETS = {'calories': 400.0, 'protein': 75.0, 'fat': 60.0, 'carbs': 250.0}
+
+
+def test_report_is_three_round_trips(fake_api):
+    built, _ = fake_api
+    url = google_sheets.create_nutrition_report('kid', make_logs(30, 5), TARGETS)
+    assert url == 'https://docs.google.com/spreadsheets/d/sheet123'
+
+    calls = built[0].calls
+    assert [method for method, _ in calls] == ['create', 'values.batchUpdate', 'batchUpdate']
+    daily = calls[0][1]['body']['sheets'][0]['properties']
+    assert daily['sheetId'] == 0 and daily['gridProperties']['frozenRowCount'] == 2
+
+    data = calls[1][1]['body']['data']
+    assert len(data) == 1 and calls[1][1]['body']['valueInputOption'] == 'USER_ENTERED'
+    rows = data[0]['values']
+    assert rows[2][:3] == ['2025-03-01', 'Блюдо 0', '08:00']
+    # итог первого дня — по его пяти строкам (3..7 в A1), затем пустая строка
+    assert rows[7][3] == '=SUM(D3:D7)'
+    assert rows[8] == []
+    assert rows[9][0] == '2025-03-02' and rows[14][3] == '=SUM(D10:D14)'
+
+    requests = calls[2][1]['body']['requests']
+    colored = [r for r in requests if r.get('repeatCell', {}).get('fields') == 'userEnteredFormat.backgroundColor']
+    # 570 раскрашенных ячеек, но соседние ячейки одного цвета идут одним диапазоном:
+    # по дню — недобор в строках 1–3, недобор белков/жиров/углеводов в 4–5, превышение калорий в 5
+    assert len(colored) == 3 * 30
+    assert requests[-1]['autoResizeDimensions']['dimensions']['sheetId'] == 0
+
+
+def test_merged_ranges_cover_exactly_the_colored_cells():
+    _, colors = google_sheets.build_daily_rows('kid', make_logs(3, 5), TARGETS)
+    merged = google_sheets.merge_color_ranges(colors)
+    assert len(merged) < len(colors)
+
+    covered = {}
+    for start_row, end_row, start_col, end_col, color in merged:
+        for row in range(start_row, end_row):
+            for col in range(start_col, end_col):
+                assert (row, col) not in covered
+                covered[(row, col)] = color
+    assert covered == colors
+
+
+def test_merge_keeps_different_colors_apart():
+    red, blue = google_sheets.OVER_COLOR, google_sheets.UNDER_COLOR
+    colors = {(2, 3): red, (2, 4): red, (2, 5): blue, (3, 3): red, (3, 4): red, (5, 3): red, (5, 4): red}
+    assert google_sheets.merge_color_ranges(colors) == [
+        (2, 4, 3, 5, red),
+        (2, 3, 5, 6, blue),
+        (5, 6, 3, 5, red),
+    ]
+
+
+def test_client_and_credentials_are_cached(fake_api):
+    built, loaded = fake_api
+    google_sheets.create_nutrition_report('kid', make_logs(1, 2), TARGETS)
+    google_sheets.create_nutrition_report('kid', make_logs(1, 2), TARGETS)
+    assert len(built) == 1 and len(loaded) == 1
+    assert len(built[0].calls) == 6
+
+    # у другого потока свой клиент, но учетные данные те же
+    thread = threading.Thread(target=google_sheets.create_nutrition_report, args=('kid', make_logs(1, 2), TARGETS))
+    thread.start()
+    thread.join()
+    assert len(built) == 2 and len(loaded) == 1
+
+
+def test_no_credentials(monkeypatch):
+    monkeypatch.setattr(google_sheets, '_load_credentials', lambda: None)
+    google_sheets.reset_clients()
+    with pytest.raises(SheetsExportError):
+        google_sheets.create_nutrition_report('kid', make_logs(1, 1), TARGETS)
+    google_sheets.reset_clients()
+
+
+class StubSheetsHandler(BaseHTTPRequestHandler):
+    """Локальный Sheets API: отвечает ошибками из server.failures, затем 200."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.paths.append(self.path.split('?')[0])
+        if self.server.failures:
+            status, retry_after = self.server.failures.pop(0)
+            body = {'error': {'code': status, 'message': 'Quota exceeded', 'status': 'RESOURCE_EXHAUSTED'}}
+        else:
+            status, retry_after = 200, None
+            body = {'spreadsheetId': 'stub1'} if self.path.startswith('/v4/spreadsheets?') else {}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSheetsHandler)
+    server.paths = []
+    server.failures = []
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    service = build('sheets', 'v4', http=httplib2.Http(timeout=5), static_discovery=True,
+                    client_options={'api_endpoint': f'http://127.0.0.1:{server.server_port}'})
+    monkeypatch.setattr(google_sheets, 'get_service', lambda: service)
+    delays = []
+    client = SheetsClient(TokenBucket(1000, 1000), SheetsMetrics(), max_retries=3,
+                          sleep=delays.append, rand=lambda: 0.5)
+    monkeypatch.setattr(google_sheets, 'sheets_client', client)
+    yield server, client, delays
+    server.shutdown()
+    server.server_close()
+
+
+def test_429_is_retried_with_backoff(stub_api):
+    server, client, delays = stub_api
+    server.failures = [(429, None), (429, None)]
+    url = google_sheets.create_nutrition_report('kid', make_logs(2, 3), TARGETS)
+    assert url == 'https://docs.google.com/spreadsheets/d/stub1'
+    assert server.paths == ['/v4/spreadsheets'] * 3 + ['/v4/spreadsheets/stub1/values:batchUpdate',
+                                                        '/v4/spreadsheets/stub1:batchUpdate']
+    # full jitter: половина от 1 с, затем от 2 с
+    assert delays == [0.5, 1.0]
+    metrics = client.metrics.snapshot()
+    assert metrics['requests'] == 5
+    assert metrics['retries'] == 2 and metrics['retries_by_status'] == {429: 2}
+    assert metrics['failures'] == 0
+
+
+def test_retry_metrics_are_exposed_to_admins(stub_api, app_db):
+    from flask_app import app
+    from models import db, Admin
+
+    server, client, delays = stub_api
+    server.failures = [(429, None)]
+    google_sheets.create_nutrition_report('kid', make_logs(1, 1), TARGETS)
+
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    web = app.test_client()
+    assert web.get('/api/v1/sheets_status').status_code == 302
+    with app.app_context():
+        admin = Admin(login='root', password='x')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+    with web.session_transaction() as sess:
+        sess['user_id'] = admin_id
+        sess['role'] = 'admin'
+    status = web.get('/api/v1/sheets_status').get_json()
+    assert status['api']['retries'] == 1 and status['api']['retries_by_status'] == {'429': 1}
+    assert status['api']['backoff_seconds'] == 0.5
+    assert status['rate_limit'] == {'rate': 1000, 'capacity': 1000}
+
+
+def test_retry_after_is_respected(stub_api):
+    server, client, delays = stub_api
+    server.failures = [(503, 3)]
+    # создание таблицы при 503 не повторяется, поэтому ошибка ждёт на values:batchUpdate
+    client.execute(google_sheets.get_service().spreadsheets().values().batchUpdate(spreadsheetId='stub1', body={}))
+    assert delays == [3.0]
+    assert client.metrics.snapshot()['retries_by_status'] == {503: 1}
+
+
+def test_create_is_not_retried_on_server_error(stub_api):
+    server, client, delays = stub_api
+    server.failures = [(500, None)]
+    with pytest.raises(SheetsExportError) as exc:
+        google_sheets.create_nutrition_report('kid', make_logs(1, 1), TARGETS)
+    assert not isinstance(exc.value, SheetsQuotaError)
+    assert server.paths == ['/v4/spreadsheets']
+    assert delays == []
+    assert client.metrics.snapshot()['failures'] == 1
+
+
+def test_quota_error_after_retries(stub_api):
+    server, client, delays = stub_api
+    server.failures = [(429, None)] * 10
+    with pytest.raises(SheetsQuotaError) as exc:
+        google_sheets.create_nutrition_report('kid', make_logs(1, 1), TARGETS)
+    assert 'попробуйте через минуту' in str(exc.value)
+    assert len(server.paths) == 4
+    assert delays == [0.5, 1.0, 2.0]
+
+
+def test_token_bucket_is_shared_between_threads():
+    waits = []
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: 0.0, sleep=lambda s: None)
+    threads = [threading.Thread(target=lambda: waits.append(bucket.acquire())) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # два токена сразу, дальше каждый следующий — на 0.5 с позже предыдущего
+    assert sorted(waits) == [0.0, 0.0] + [0.5 * i for i in range(1, 9)]
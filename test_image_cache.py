@@ -0,0 +1,124 @@
+import io
+
+import pytest
+from PIL import Image, ImageDraw
+
+import food_detection_impl
+import image_cache
+from image_cache import ImageAnalysisCache, dhash, fingerprint
+
+RESULT = {'name': 'Борщ', 'serving_size': '250г', 'calories': 120.0, 'protein': 4.0, 'fat': 5.0, 'carbs': 14.0}
+
+
+def meal_photo(seed=0, size=(640, 480)):
+    """Синтетическое «фото»: градиент и несколько кругов, разное для разных seed."""
+    img = Image.linear_gradient('L').rotate(90).resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for i in range(4):
+        x = (seed * 97 + i * 151) % (size[0] - 120)
+        y = (seed * 53 + i * 89) % (size[1] - 120)
+        draw.ellipse((x, y, x + 110, y + 110), fill=((seed * 40 + i * 60) % 256, 120, 200 - i * 40))
+    return img
+
+
+def reencode(img, fmt, **params):
+    buf = io.BytesIO()
+    img.save(buf, fmt, **params)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageAnalysisCache(tmp_path / 'cache.db', ttl=3600, max_entries=3, clock=Clock())
+
+
+def test_same_pixels_hit_regardless_of_encoding(cache):
+    photo = meal_photo()
+    cache.put(fingerprint(photo), RESULT)
+    # PNG без потерь с другими метаданными — те же пиксели, тот же ключ
+    assert fingerprint(reencode(photo, 'PNG', compress_level=1))[0] == fingerprint(photo)[0]
+    assert cache.get(fingerprint(reencode(photo, 'PNG', compress_level=9))) == RESULT
+    assert (cache.hits, cache.near_hits, cache.misses) == (1, 0, 0)
+
+
+def test_recompressed_photo_is_a_near_hit(cache):
+    photo = meal_photo()
+    cache.put(fingerprint(photo), RESULT)
+    resent = reencode(photo.resize((600, 450)), 'JPEG', quality=70)
+    assert fingerprint(resent)[0] != fingerprint(photo)[0]
+    assert cache.get(fingerprint(resent)) == RESULT
+    assert cache.near_hits == 1
+
+    assert cache.get(fingerprint(meal_photo(seed=5))) is None
+    assert cache.stats() == {'hits': 0, 'near_hits': 1, 'misses': 1, 'entries': 1}
+
+
+def test_near_matching_can_be_disabled(tmp_path):
+    cache = ImageAnalysisCache(tmp_path / 'cache.db', max_distance=-1)
+    photo = meal_photo()
+    cache.put(fingerprint(photo), RESULT)
+    assert cache.get(fingerprint(reencode(photo, 'JPEG', quality=70))) is None
+
+
+def test_wide_distance_falls_back_to_full_scan(tmp_path):
+    cache = ImageAnalysisCache(tmp_path / 'cache.db', max_distance=64)
+    cache.put(('a' * 64, 0), RESULT)
+    # ни одна 16-битная полоса не совпадает, но расстояние в пределах порога
+    assert cache.get(('b' * 64, (1 << 64) - 1)) == RESULT
+
+
+def test_ttl_and_lru_eviction(cache):
+    clock = cache.clock
+    fps = [fingerprint(meal_photo(seed)) for seed in range(5)]
+    for i, fp in enumerate(fps[:3]):
+        cache.put(fp, dict(RESULT, calories=float(i)))
+        clock.now += 1
+    # первая запись использована недавно — вытесняется вторая
+    assert cache.get(fps[0])['calories'] == 0.0
+    cache.put(fps[3], RESULT)
+    assert len(cache) == 3
+    cache.max_distance = -1
+    assert cache.get(fps[1]) is None
+    assert cache.get(fps[0]) is not None
+
+    clock.now += 3601
+    assert cache.get(fps[3]) is None
+    cache.put(fps[4], RESULT)
+    assert len(cache) == 1
+
+
+def test_dhash_is_stable_under_resize():
+    photo = meal_photo()
+    distance = (dhash(photo) ^ dhash(photo.resize((320, 240)))).bit_count()
+    assert distance <= 3
+
+
+def test_gemini_is_called_once_per_photo(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(image_cache, '_default', ImageAnalysisCache(tmp_path / 'cache.db'))
+    monkeypatch.setattr(food_detection_impl, '_analyze_with_gemini', lambda img: calls.append(img.size) or dict(RESULT))
+
+    photo = meal_photo()
+    first, second = tmp_path / 'a.jpg', tmp_path / 'b.png'
+    photo.save(first, 'JPEG', quality=90)
+    reencode(photo, 'JPEG', quality=90).save(second, 'PNG')
+    assert food_detection_impl.analyze_image_with_gemini(str(first)) == RESULT
+    assert food_detection_impl.analyze_image_with_gemini(str(first)) == RESULT
+    assert food_detection_impl.analyze_image_with_gemini(str(second)) == RESULT
+    assert calls == [(640, 480)]
+
+    # неудачный анализ не кэшируется
+    monkeypatch.setattr(food_detection_impl, '_analyze_with_gemini', lambda img: None)
+    other = tmp_path / 'c.jpg'
+    meal_photo(seed=7).save(other, 'JPEG')
+    assert food_detection_impl.analyze_image_with_gemini(str(other)) is None
+    assert image_cache.default_cache().stats()['entries'] == 1
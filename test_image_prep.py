@@ -0,0 +1,55 @@
+import io
+
+from PIL import Image
+
+import food_detection_impl
+import image_cache
+from image_cache import ImageAnalysisCache
+from image_prep import encode_jpeg, image_blob, load_for_analysis
+
+
+def phone_photo(path, size=(3000, 2000), orientation=None):
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    if orientation:
+        exif[0x0112] = orientation
+    img.save(path, 'JPEG', quality=90, exif=exif.tobytes())
+
+
+def test_photo_is_downscaled_and_rotated(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    phone_photo(path, orientation=6)
+    img = load_for_analysis(path, max_edge=1024)
+    # поворот на 90° по EXIF применен к пикселям, длинная сторона — 1024
+    assert img.size == (683, 1024)
+    assert img.mode == 'RGB' and img.info == {}
+
+
+def test_small_photo_is_not_upscaled(tmp_path):
+    path = tmp_path / 'small.png'
+    Image.new('RGBA', (300, 200), (10, 20, 30, 255)).save(path)
+    img = load_for_analysis(path, max_edge=1024)
+    assert img.size == (300, 200) and img.mode == 'RGB'
+
+
+def test_encoded_jpeg_has_no_metadata(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    phone_photo(path, orientation=6)
+    img = load_for_analysis(path, max_edge=512)
+    blob = image_blob(img)
+    assert blob['mime_type'] == 'image/jpeg'
+    sent = Image.open(io.BytesIO(blob['data']))
+    assert sent.size == (341, 512)
+    assert 'exif' not in sent.info and len(sent.getexif()) == 0
+    assert len(encode_jpeg(img, quality=50)) < len(blob['data'])
+
+
+def test_gemini_gets_prepared_image(tmp_path, monkeypatch):
+    seen = []
+    monkeypatch.setattr(image_cache, '_default', ImageAnalysisCache(tmp_path / 'cache.db'))
+    monkeypatch.setattr(food_detection_impl, '_analyze_with_gemini', lambda img: seen.append(img.size) or {'name': 'x'})
+    path = tmp_path / 'photo.jpg'
+    phone_photo(path)
+    assert food_detection_impl.analyze_image_with_gemini(str(path)) == {'name': 'x'}
+    assert seen == [(1024, 683)]
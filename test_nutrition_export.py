@@ -0,0 +1,122 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import flask_app
+import nutrition_export
+from flask_app import app
+from models import db, EatLog, Parents, Student
+from report_cache import ExportFileCache
+
+
+@pytest.fixture
+def family(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        parent = Parents(login='mom', password='x')
+        db.session.add(parent)
+        db.session.flush()
+        child = Student(login='kid', password='x', parent_id=parent.id, calories=2000)
+        db.session.add(child)
+        db.session.flush()
+        for day, hour, kcal in ((1, 8, 300), (1, 13, 700), (2, 9, 500), (4, 12, 650.5)):
+            log = EatLog(student_id=child.id, food_id=None, name=f'Блюдо {day}.{hour}',
+                         calories=kcal, protein=10, fat=5, carbs=40)
+            log.created_at = datetime(2025, 3, day, hour, 0)
+            db.session.add(log)
+        db.session.commit()
+        ids = {'parent': parent.id, 'child': child.id}
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['parent']
+        sess['role'] = 'parent'
+    yield client, ids
+
+
+def test_csv_is_streamed_with_day_subtotals(family, monkeypatch):
+    client, ids = family
+    # маленькие порции, чтобы проверить чтение курсора по частям
+    monkeypatch.setattr(nutrition_export, 'BATCH_SIZE', 1)
+    monkeypatch.setattr(nutrition_export, 'CHUNK_SIZE', 16)
+
+    resp = client.get(f"/parent/child/{ids['child']}/export?fmt=csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.headers['Content-Disposition'] == 'attachment; filename="kid_nutrition_2025-03-01_to_2025-03-04.csv"'
+
+    text = resp.get_data().decode('utf-8')
+    assert text.startswith('\ufeffДата,Время,Блюдо')
+    lines = text.splitlines()[1:]
+    assert lines == [
+        '2025-03-01,08:00:00,Блюдо 1.8,300.0,10.0,5.0,40.0',
+        '2025-03-01,13:00:00,Блюдо 1.13,700.0,10.0,5.0,40.0',
+        '2025-03-01,,Итого за день,1000.0,20.0,10.0,80.0',
+        '2025-03-02,09:00:00,Блюдо 2.9,500.0,10.0,5.0,40.0',
+        '2025-03-02,,Итого за день,500.0,10.0,5.0,40.0',
+        '2025-03-04,12:00:00,Блюдо 4.12,650.5,10.0,5.0,40.0',
+        '2025-03-04,,Итого за день,650.5,10.0,5.0,40.0',
+        'Итого,,,2150.5,40.0,20.0,160.0',
+    ]
+
+
+def test_ndjson_export(family):
+    client, ids = family
+    resp = client.get(f"/parent/child/{ids['child']}/export?fmt=ndjson")
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+
+    objects = [json.loads(line) for line in resp.get_data().decode('utf-8').splitlines()]
+    assert [o['type'] for o in objects] == ['log', 'log', 'day', 'log', 'day', 'log', 'day', 'total']
+    first_day = objects[2]
+    assert first_day['date'] == '2025-03-01'
+    assert first_day['calories'] == 1000.0
+    assert first_day['deviation']['calories'] == -1000.0
+    assert objects[-1]['calories'] == 2150.5
+
+
+def test_empty_history(family):
+    client, ids = family
+    with app.app_context():
+        EatLog.query.delete()
+        db.session.commit()
+    resp = client.get(f"/parent/child/{ids['child']}/export?fmt=csv")
+    assert resp.get_data().decode('utf-8').splitlines()[1:] == ['Итого,,,0.0,0.0,0.0,0.0']
+
+
+def test_other_parent_cannot_export(family):
+    client, ids = family
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['parent'] + 100
+    resp = client.get(f"/parent/child/{ids['child']}/export?fmt=csv")
+    assert resp.status_code == 302
+
+
+def test_xlsx_export_write_only(family, tmp_path, monkeypatch):
+    openpyxl = pytest.importorskip('openpyxl')
+    client, ids = family
+    monkeypatch.setattr(flask_app, 'export_files', ExportFileCache(tmp_path / 'cache'))
+    resp = client.get(f"/parent/child/{ids['child']}/export?fmt=xlsx")
+    assert resp.status_code == 200
+    assert resp.headers['Content-Disposition'].endswith('kid_nutrition_2025-03-01_to_2025-03-04.xlsx')
+    data = resp.get_data()
+    resp.close()
+    # готовый файл остаётся в кэше выгрузок
+    assert [p.suffix for p in (tmp_path / 'cache').iterdir()] == ['.xlsx']
+
+    path = tmp_path / 'report.xlsx'
+    path.write_bytes(data)
+    ws = openpyxl.load_workbook(path)['Nutrition']
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0][0] == 'Отчёт питания за год — kid'
+    assert rows[2][0] == 'Период: 2025-03-01 — 2025-03-04'
+    assert rows[4][0] == '2025-03-01'
+    assert rows[5][:3] == ('Время', 'Блюдо', 'Калории')
+    assert rows[6][:3] == ('08:00', 'Блюдо 1.8', 300.0)
+    assert rows[8][0] == 'Итого за день:' and rows[8][2] == 1000.0
+    assert rows[9][0] == 'Отклонение' and rows[9][2] == '-1000.0'
+    assert rows[10][0] == 'Норма:' and rows[10][2] == 2000.0
+    assert ws['A6'].font.b
+    assert ws['C10'].font.color.rgb == '000000FF'
+    assert ws.column_dimensions['A'].width == len('Период: 2025-03-01 — 2025-03-04') + 2
+    assert ws.column_dimensions['C'].width == 10
@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import event
+
+from flask_app import app, load_pack_foods
+from daily_nutrition import get_day_totals
+from models import db, Eat, EatLog, Pack, PackItem, Student
+
+
+@pytest.fixture
+def pack(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        student = Student(login='kid', password='x', calories=2000)
+        pack = Pack(week=1, day=1)
+        db.session.add_all([student, pack])
+        db.session.flush()
+        for i in range(6):
+            food = Eat(name=f'Блюдо {i}', calories=100 + i, protein=5, fat=3, carbs=10, type='school', week=1, day=1)
+            db.session.add(food)
+            db.session.flush()
+            # шестое блюдо выключено диетсестрой
+            db.session.add(PackItem(pack_id=pack.id, food_id=food.id, ord=6 - i, is_active=i != 5))
+        db.session.commit()
+        yield {'pack_id': pack.id, 'student_id': student.id}
+        db.session.remove()
+
+
+def test_load_pack_foods_skips_inactive_in_one_query(pack, count_queries):
+    with count_queries() as statements:
+        foods = load_pack_foods(pack['pack_id'])
+    assert len(statements) == 1
+    # порядок по ord
+    assert [f.name for f in foods] == ['Блюдо 4', 'Блюдо 3', 'Блюдо 2', 'Блюдо 1', 'Блюдо 0']
+
+
+def test_pack_add_logs_pack_in_one_insert_and_commit(pack, app_db, count_queries):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = pack['student_id']
+        sess['role'] = 'student'
+    # первый запрос процесса дополнительно проверяет наличие админа
+    client.get('/dashboard')
+
+    commits = []
+    on_commit = lambda conn: commits.append(conn)
+    event.listen(app_db, 'commit', on_commit)
+    try:
+        with count_queries() as statements:
+            resp = client.post('/pack_add', data={'pack_id': pack['pack_id']})
+    finally:
+        event.remove(app_db, 'commit', on_commit)
+
+    assert resp.status_code == 302
+    assert len([s for s in statements if s.startswith('INSERT INTO eatlog')]) == 1
+    assert len([s for s in statements if 'FROM eat ' in s or 'JOIN eat ' in s]) == 1
+    assert len(commits) == 1
+
+    logs = EatLog.query.filter_by(student_id=pack['student_id']).all()
+    assert len(logs) == 5
+    totals = get_day_totals([pack['student_id']])[pack['student_id']]
+    assert totals['count'] == 5
+    assert totals['calories'] == 100 + 101 + 102 + 103 + 104
+    with client.session_transaction() as sess:
+        assert len(sess['eaten']) == 5
+        assert sess['calories'] == 2000 - 510
+
+
+def test_unknown_pack(pack):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = pack['student_id']
+        sess['role'] = 'student'
+    resp = client.post('/pack_add', data={'pack_id': 999})
+    assert resp.status_code == 302
+    assert resp.headers['Location'].endswith('/')
+    assert EatLog.query.count() == 0
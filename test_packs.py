@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import flask_app
+from flask_app import app, ensure_packs_exist, load_cook_menu_packs, merge_duplicate_packs
+from models import db, Eat, Pack, PackItem
+
+
+@pytest.fixture
+def empty_db(app_db):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+def test_packs_seeded_once(empty_db, count_queries):
+    ensure_packs_exist()
+    assert Pack.query.count() == 14
+
+    # все паки на месте — только проверка количества
+    with count_queries() as statements:
+        ensure_packs_exist()
+    assert len(statements) == 1
+    assert Pack.query.count() == 14
+
+
+def test_missing_packs_are_added_without_duplicates(empty_db):
+    # часть паков уже создал другой воркер
+    db.session.add_all([Pack(week=1, day=1), Pack(week=2, day=7)])
+    db.session.commit()
+    ensure_packs_exist()
+    assert sorted(db.session.query(Pack.week, Pack.day).all()) == [(w, d) for w in (1, 2) for d in range(1, 8)]
+
+
+def test_packs_reseeded_after_schema_reset(empty_db):
+    # тот же процесс, новая пустая база (drop_all/create_all)
+    ensure_packs_exist()
+    db.drop_all()
+    db.create_all()
+    ensure_packs_exist()
+    assert Pack.query.count() == 14
+
+
+def test_week_day_is_unique(empty_db):
+    db.session.add_all([Pack(week=1, day=1), Pack(week=1, day=1)])
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_cook_menu_packs_loaded_eagerly(empty_db, count_queries):
+    ensure_packs_exist()
+    for pack in Pack.query.all():
+        for i in range(3):
+            food = Eat(name=f'Блюдо {pack.id}.{i}', calories=100, protein=5, fat=5, carbs=10,
+                       week=pack.week, day=pack.day)
+            db.session.add(food)
+            db.session.flush()
+            db.session.add(PackItem(pack_id=pack.id, food_id=food.id, ord=i))
+    db.session.commit()
+    db.session.expunge_all()
+
+    def render():
+        packs = load_cook_menu_packs()
+        return [(p.name, [(it.food.name, it.is_active) for it in p.items]) for p in packs]
+
+    with count_queries() as statements:
+        rendered = render()
+    assert len(rendered) == 14
+    assert all(len(items) == 3 for _, items in rendered)
+    assert len(statements) == 2
+
+
+def test_duplicate_packs_merged_before_unique_index(empty_db):
+    db.session.execute(text('DROP INDEX uq_packs_week_day'))
+    db.session.add_all([Pack(week=1, day=1), Pack(week=1, day=1), Pack(week=1, day=2)])
+    db.session.flush()
+    food = Eat(name='Суп', calories=100, protein=5, fat=5, carbs=10)
+    db.session.add(food)
+    db.session.flush()
+    db.session.add_all([PackItem(pack_id=1, food_id=food.id), PackItem(pack_id=2, food_id=food.id)])
+    db.session.commit()
+
+    assert merge_duplicate_packs() == 1
+    db.session.execute(text('CREATE UNIQUE INDEX uq_packs_week_day ON packs (week, day)'))
+    db.session.commit()
+    assert [p.id for p in Pack.query.order_by(Pack.id)] == [1, 3]
+    assert [it.pack_id for it in PackItem.query.all()] == [1, 1]
+
+
+def test_cook_menu_does_not_reseed_packs(empty_db, count_queries, monkeypatch):
+    ensure_packs_exist()
+    monkeypatch.setattr(flask_app, 'render_template', lambda template, **context: template)
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['role'] = 'cook'
+    # паки создаются при запуске, а не на каждый запрос
+    with count_queries() as statements:
+        assert client.get('/cook_menu').status_code == 200
+    assert not any('count(packs.id)' in s for s in statements)
@@ -0,0 +1,57 @@
+
+import pytest
+
+from flask_app import app, get_children_today
+from models import db, Parents, Student, EatLog
+from daily_nutrition import add_log
+
+
+def make_family(n_children):
+    parent = Parents(login=f'parent{n_children}', password='x')
+    db.session.add(parent)
+    db.session.flush()
+    for i in range(n_children):
+        child = Student(login=f'kid{n_children}_{i}', password='x', parent_id=parent.id, calories=2000)
+        db.session.add(child)
+        db.session.flush()
+        for kcal in (300, 450):
+            add_log(EatLog(student_id=child.id, food_id=None, name='Суп',
+                           calories=kcal, protein=10, fat=5, carbs=40))
+    db.session.commit()
+    return parent
+
+
+@pytest.fixture
+def families(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        yield {n: make_family(n).id for n in (1, 6)}
+        db.session.remove()
+
+
+def dashboard_queries(parent_id, count_queries):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = parent_id
+        sess['role'] = 'parent'
+    # первый запрос процесса дополнительно проверяет наличие админа
+    client.get('/dashboard')
+    with count_queries() as statements:
+        resp = client.get('/dashboard')
+    assert resp.status_code == 200
+    return len(statements)
+
+
+def test_parent_dashboard_query_count_does_not_depend_on_children(families, count_queries):
+    assert dashboard_queries(families[1], count_queries) == dashboard_queries(families[6], count_queries)
+
+
+def test_get_children_today_uses_two_queries(families, count_queries):
+    children = Student.query.filter_by(parent_id=families[6]).all()
+    with count_queries() as statements:
+        child_logs, child_summaries = get_children_today(children)
+    assert len(statements) == 2
+    for c in children:
+        assert len(child_logs[c.id]) == 2
+        assert child_summaries[c.id]['sum_cal'] == 750.0
+        assert child_summaries[c.id]['remaining_cal'] == 1250.0
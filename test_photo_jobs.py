@@ -0,0 +1,130 @@
+import io
+import os
+import threading
+
+import pytest
+
+import flask_app
+from flask_app import app
+from export_jobs import ExportJobQueue
+from models import db, Parents, Student
+
+JSON = {'Accept': 'application/json'}
+RESULT = {'name': 'Борщ', 'serving_size': '250г', 'calories': 120.0, 'protein': 4.0, 'fat': 5.0, 'carbs': 14.0}
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    """Анализ фото, который ждет release, и очередь на 1 поток / 2 задачи."""
+    release = threading.Event()
+    seen = []
+
+    def analyze(filepath):
+        seen.append(filepath)
+        assert os.path.exists(filepath)
+        release.wait(5)
+        return dict(RESULT)
+
+    uploads = tmp_path / 'uploads'
+    uploads.mkdir()
+    monkeypatch.setattr(flask_app, 'UPLOAD_FOLDER', uploads)
+    monkeypatch.setattr(flask_app, 'photo_jobs', ExportJobQueue(tmp_path / 'photo_jobs', max_workers=1, max_pending=2))
+    monkeypatch.setattr(app, '_analyze_image', analyze, raising=False)
+    monkeypatch.setattr(app, '_analyze_image_checked', True, raising=False)
+    yield release, seen, uploads
+    release.set()
+    flask_app.photo_jobs.wait(5)
+
+
+@pytest.fixture
+def client(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    client = app.test_client()
+    client.get('/photo_analyze')
+    return client
+
+
+def upload(client, url='/photo_analyze', headers=JSON):
+    return client.post(url, data={'file': (io.BytesIO(b'\xff\xd8fake'), 'meal.jpg')},
+                       content_type='multipart/form-data', headers=headers)
+
+
+def test_upload_returns_job_before_analysis_finishes(client, analyzer):
+    release, seen, uploads = analyzer
+    resp = upload(client)
+    assert resp.status_code == 202
+    job = resp.get_json()
+    assert job['status'] in ('queued', 'running') and 'data' not in job
+
+    status = client.get(job['status_url'], headers=JSON).get_json()
+    assert status['status'] in ('queued', 'running')
+
+    release.set()
+    flask_app.photo_jobs.wait(5)
+    status = client.get(job['status_url'], headers=JSON).get_json()
+    assert status['status'] == 'done' and status['data']['name'] == 'Борщ'
+    # загруженный файл удален после анализа
+    assert len(seen) == 1 and list(uploads.iterdir()) == []
+
+
+def test_burst_is_capped_per_worker(client, analyzer):
+    release, _, uploads = analyzer
+    assert upload(client).status_code == 202
+    assert upload(client).status_code == 202
+    busy = upload(client)
+    assert busy.status_code == 503 and busy.headers['Retry-After'] == '5'
+    # отклоненный файл не остается на диске
+    assert len(list(uploads.iterdir())) == 2
+
+    release.set()
+    flask_app.photo_jobs.wait(5)
+    assert upload(client).status_code == 202
+
+
+def test_failed_analysis_is_reported(client, analyzer, monkeypatch):
+    monkeypatch.setattr(app, '_analyze_image', lambda path: None)
+    job = upload(client).get_json()
+    flask_app.photo_jobs.wait(5)
+    status = client.get(job['status_url'], headers=JSON).get_json()
+    assert status['status'] == 'failed'
+    assert status['error'] == flask_app.PHOTO_ANALYSIS_FAILED
+
+
+def test_job_is_hidden_from_other_sessions(client, analyzer):
+    job = upload(client).get_json()
+    other = app.test_client()
+    assert other.get(job['status_url'], headers=JSON).status_code == 404
+
+
+def test_html_upload_renders_polling_page(client, analyzer):
+    resp = upload(client, headers={'Accept': 'text/html'})
+    assert resp.status_code == 200
+    page = resp.get_data(as_text=True)
+    assert '/api/v1/photo_jobs/' in page and 'pollPhotoJob' in page
+
+
+def test_page_form_posts_file_for_polling(client):
+    page = client.get('/photo_analyze').get_data(as_text=True)
+    # форма отправляет поле file на текущий адрес (fetch с Accept: application/json или обычный POST)
+    assert 'enctype="multipart/form-data"' in page and 'name="file"' in page
+    assert 'uploadPhoto(this, file)' in page and 'analyzeFoodImage' not in page
+
+
+def test_child_upload_keeps_student_id(client, analyzer):
+    release, _, _ = analyzer
+    with app.app_context():
+        parent = Parents(login='mom', password='x')
+        db.session.add(parent)
+        db.session.flush()
+        kid = Student(login='kid', password='x', parent_id=parent.id)
+        db.session.add(kid)
+        db.session.commit()
+        ids = (parent.id, kid.id)
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids[0]
+        sess['role'] = 'parent'
+    resp = upload(client, f'/parent/child/{ids[1]}/photo_analyze')
+    assert resp.status_code == 202 and resp.get_json()['student_id'] == ids[1]
+    release.set()
+    flask_app.photo_jobs.wait(5)
+    assert client.get(resp.get_json()['status_url'], headers=JSON).get_json()['data']['calories'] == 120.0
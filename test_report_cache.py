@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import flask_app
+from flask_app import app
+from models import db, EatLog, Parents, Student
+from report_cache import ExportFileCache, ReportCache
+
+
+@pytest.fixture
+def family(tmp_path, monkeypatch, app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    monkeypatch.setattr(flask_app, 'report_summaries', ReportCache())
+    monkeypatch.setattr(flask_app, 'export_files', ExportFileCache(tmp_path / 'cache'))
+    # шаблона отчёта в репозитории нет — проверяем контекст, который ему передаётся
+    rendered = []
+    monkeypatch.setattr(flask_app, 'render_template', lambda name, **ctx: rendered.append(ctx) or 'ok')
+    with app.app_context():
+        parent = Parents(login='mom', password='x')
+        db.session.add(parent)
+        db.session.flush()
+        kids = [Student(login=f'kid{i}', password='x', parent_id=parent.id, calories=2000) for i in range(2)]
+        db.session.add_all(kids)
+        db.session.flush()
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        for kid in kids:
+            for kcal in (300, 500):
+                log = EatLog(student_id=kid.id, food_id=None, name='Суп', calories=kcal, protein=10, fat=5, carbs=40)
+                log.created_at = yesterday
+                db.session.add(log)
+        db.session.commit()
+        ids = {'parent': parent.id, 'kids': [k.id for k in kids]}
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['parent']
+        sess['role'] = 'parent'
+    client.get('/dashboard')
+    yield client, ids, rendered
+
+
+def eatlog_statements(count_queries, fn):
+    with count_queries() as statements:
+        fn()
+    return [s for s in statements if 'eatlog' in s or 'daily_nutrition' in s]
+
+
+def add_meal(student_id, kcal):
+    with app.app_context():
+        db.session.add(EatLog(student_id=student_id, food_id=None, name='Каша', calories=kcal,
+                              protein=5, fat=5, carbs=30))
+        db.session.commit()
+
+
+def test_report_cache_drops_only_changed_student():
+    cache = ReportCache(maxsize=3)
+    cache.put(1, (10, 2, 'a'), 'report', 'r1')
+    cache.put(1, (10, 2, 'a'), 'export', 'e1')
+    cache.put(2, (11, 1, 'b'), 'report', 'r2')
+    assert cache.get(1, (10, 2, 'a'), 'report') == 'r1'
+
+    # новый лог ученика 1: его записи больше не отдаются и вытесняются при записи
+    assert cache.get(1, (12, 3, 'c'), 'report') is None
+    cache.put(1, (12, 3, 'c'), 'report', 'r1new')
+    assert cache.get(1, (12, 3, 'c'), 'export') is None
+    assert cache.get(2, (11, 1, 'b'), 'report') == 'r2'
+    assert len(cache) == 2
+
+    cache.put(3, (13, 1, 'd'), 'report', 'r3')
+    cache.put(4, (14, 1, 'e'), 'report', 'r4')
+    assert len(cache) == 3
+    assert cache.get(1, (12, 3, 'c'), 'report') is None
+
+
+def test_repeat_report_view_costs_one_watermark_query(family, count_queries):
+    client, ids, rendered = family
+    kid, other = ids['kids']
+    url = f'/parent/child/{kid}/report'
+
+    first = eatlog_statements(count_queries, lambda: client.get(url))
+    assert len(first) == 3
+    day = next(iter(rendered[-1]['day_summaries'].values()))
+    assert day['consumed']['calories'] == 800
+    assert [l.name for l in day['logs']] == ['Суп', 'Суп']
+
+    repeat = eatlog_statements(count_queries, lambda: client.get(url))
+    assert len(repeat) == 1
+    assert rendered[-1]['day_summaries'] == rendered[-2]['day_summaries']
+
+    client.get(f'/parent/child/{other}/report')
+    add_meal(kid, 200)
+    assert len(eatlog_statements(count_queries, lambda: client.get(url))) == 3
+    assert sum(d['consumed']['calories'] for d in rendered[-1]['day_summaries'].values()) == 1000
+    # отчёт другого ребёнка по-прежнему из кэша
+    assert len(eatlog_statements(count_queries, lambda: client.get(f'/parent/child/{other}/report'))) == 1
+
+
+def test_export_file_reused_until_new_meal(family, monkeypatch):
+    client, ids, _ = family
+    kid = ids['kids'][0]
+    builds = []
+    real_write = flask_app.write_child_export
+
+    def write(child, fmt, path, start_label, end_label):
+        builds.append(fmt)
+        real_write(child, fmt, path, start_label, end_label)
+
+    monkeypatch.setattr(flask_app, 'write_child_export', write)
+    url = f'/parent/child/{kid}/export?fmt=doc'
+
+    body = client.get(url).get_data()
+    assert client.get(url).get_data() == body
+    assert builds == ['word']
+
+    add_meal(kid, 200)
+    updated = client.get(url).get_data().decode('utf-8')
+    assert builds == ['word', 'word']
+    assert 'Каша' in updated
+    # старая версия файла удалена, осталась одна
+    assert len(list(flask_app.export_files.cache_dir.iterdir())) == 1
+
+    # изменение норм тоже даёт новый файл
+    with app.app_context():
+        db.session.get(Student, kid).calories = 1800
+        db.session.commit()
+    client.get(url).close()
+    assert builds == ['word', 'word', 'word']
@@ -0,0 +1,102 @@
+from datetime import date
+
+import pytest
+
+from flask_app import app, school_menu
+from school_menu import SchoolMenuCache, menu_cycle
+from models import db, Eat, Pack, PackItem
+
+TODAY = date.today()
+WEEK, DAY = menu_cycle(TODAY)
+
+
+@pytest.fixture
+def menu(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        soup = Eat(name='Суп', calories=150, protein=5, fat=5, carbs=20, type='school', week=WEEK, day=DAY)
+        other_day = Eat(name='Плов', calories=400, protein=15, fat=15, carbs=50, type='school',
+                        week=WEEK, day=DAY % 7 + 1)
+        db.session.add_all([soup, other_day])
+        db.session.flush()
+        pack = Pack(week=WEEK, day=DAY)
+        db.session.add(pack)
+        db.session.flush()
+        db.session.add(PackItem(pack_id=pack.id, food_id=soup.id, ord=1))
+        db.session.commit()
+        yield soup
+        db.session.remove()
+
+
+def test_menu_cycle():
+    assert menu_cycle(date(2025, 1, 1)) == (1, 3)  # среда первой недели
+    assert menu_cycle(date(2025, 1, 8)) == (2, 3)
+    assert menu_cycle(date(2025, 1, 15)) == (1, 3)
+
+
+def test_menu_serialized_per_language(menu):
+    ru = school_menu.today('ru')
+    kk = school_menu.today('kk')
+    assert [f['name'] for f in ru['foods']] == ['Суп']
+    assert ru['foods'] == kk['foods']
+    assert ru['title'] != kk['title']
+    assert ru['day_name'] != kk['day_name']
+
+
+def test_index_renders_without_queries_in_steady_state(menu, count_queries):
+    client = app.test_client()
+    client.get('/')
+    with count_queries() as statements:
+        resp = client.get('/')
+    assert resp.status_code == 200
+    assert statements == []
+
+
+def test_cook_menu_changes_invalidate_menu(menu, count_queries):
+    school_menu.today('ru')
+    menu.name = 'Борщ'
+    db.session.commit()
+    assert [f['name'] for f in school_menu.today('ru')['foods']] == ['Борщ']
+
+    item = PackItem.query.one()
+    school_menu.today('ru')
+    item.is_active = False
+    db.session.commit()
+    with count_queries() as statements:
+        school_menu.today('ru')
+    assert len(statements) == 1
+
+
+def test_other_workers_see_changes_through_stamp(menu):
+    other_worker = SchoolMenuCache(school_menu.stamp.path, lambda lang, key: key, check_interval=0)
+    assert len(other_worker.today('ru')['foods']) == 1
+    db.session.add(Eat(name='Компот', calories=60, protein=0, fat=0, carbs=15, type='school', week=WEEK, day=DAY))
+    db.session.commit()
+    assert len(other_worker.today('ru')['foods']) == 2
+
+
+def test_menu_api(menu):
+    client = app.test_client()
+    resp = client.get('/api/v1/menu/today')
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert (data['week'], data['day']) == (WEEK, DAY)
+    assert data['foods'][0]['name'] == 'Суп'
+
+
+def test_only_school_food_invalidates_menu(menu, count_queries):
+    school_menu.today('ru')
+    # свое блюдо ученика не сбрасывает меню
+    own = Eat(name='Бутерброд', calories=250, protein=8, fat=10, carbs=30, type='custom')
+    db.session.add(own)
+    db.session.commit()
+    own.calories = 260
+    db.session.commit()
+    with count_queries() as statements:
+        school_menu.today('ru')
+    assert statements == []
+
+    # блюдо убрали из школьных — сбрасывает
+    menu.type = 'custom'
+    db.session.commit()
+    assert school_menu.today('ru')['foods'] == []
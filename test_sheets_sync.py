@@ -0,0 +1,255 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('googleapiclient')
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+import flask_app
+import sheets_sync
+from export_jobs import ExportJobQueue
+from flask_app import app
+from models import db, EatLog, Parents, SheetsSync, Student
+from services import google_sheets
+from services.google_sheets import SheetsClient, SheetsMetrics, TokenBucket
+
+
+class FakeRequest:
+    def __init__(self, service, method, kwargs, result):
+        self.service = service
+        self.method = method
+        self.kwargs = kwargs
+        self.result = result
+
+    def execute(self):
+        self.service.calls.append((self.method, self.kwargs))
+        if self.kwargs.get('spreadsheetId') in self.service.deleted:
+            raise HttpError(httplib2.Response({'status': 404}), b'{"error": {"code": 404}}')
+        return self.result
+
+
+class FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(self.service, 'values.batchUpdate', kwargs, {})
+
+
+class FakeSpreadsheets:
+    def __init__(self, service):
+        self.service = service
+
+    def create(self, **kwargs):
+        self.service.created += 1
+        return FakeRequest(self.service, 'create', kwargs, {'spreadsheetId': f'sheet{self.service.created}'})
+
+    def values(self):
+        return FakeValues(self.service)
+
+    def batchUpdate(self, **kwargs):
+        return FakeRequest(self.service, 'batchUpdate', kwargs, {})
+
+
+class FakeSheetsService:
+    """Sheets API v4 в памяти: каждое execute() — одно обращение к API."""
+
+    def __init__(self):
+        self.calls = []
+        self.created = 0
+        self.deleted = set()
+
+    def spreadsheets(self):
+        return FakeSpreadsheets(self)
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    monkeypatch.setattr(flask_app, 'export_jobs', ExportJobQueue(tmp_path / 'exports'))
+    service = FakeSheetsService()
+    monkeypatch.setattr(google_sheets, 'get_service', lambda: service)
+    monkeypatch.setattr(google_sheets, 'sheets_client', SheetsClient(TokenBucket(1000, 1000), SheetsMetrics()))
+    return service
+
+
+@pytest.fixture
+def family(app_db):
+    app.config.update(SECRET_KEY='test', SESSION_COOKIE_SECURE=False)
+    with app.app_context():
+        parent = Parents(login='mom', password='x')
+        db.session.add(parent)
+        db.session.flush()
+        kid = Student(login='kid', password='x', parent_id=parent.id, calories=2000, protein=75, fat=60, carbs=250)
+        db.session.add(kid)
+        db.session.flush()
+        for hour, kcal in ((8, 300), (13, 700)):
+            log = EatLog(student_id=kid.id, food_id=None, name='Суп', calories=kcal, protein=10, fat=5, carbs=40)
+            log.created_at = datetime(2025, 3, 1, hour, 0)
+            db.session.add(log)
+        db.session.commit()
+        ids = {'parent': parent.id, 'kid': kid.id}
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['parent']
+        sess['role'] = 'parent'
+    client.get('/dashboard')
+    yield client, ids
+
+
+def add_meal(student_id, kcal):
+    with app.app_context():
+        log = EatLog(student_id=student_id, food_id=None, name='Каша', calories=kcal, protein=5, fat=5, carbs=30)
+        log.created_at = datetime(2025, 3, 2, 9, 30)
+        db.session.add(log)
+        db.session.commit()
+
+
+def export(client, url):
+    """Выгрузка через фоновую задачу: ссылка на таблицу, когда задача выполнена."""
+    resp = client.get(url, headers={'Accept': 'application/json'})
+    assert resp.status_code == 202
+    flask_app.export_jobs.wait(5)
+    job = client.get(resp.get_json()['status_url']).get_json()
+    assert job['status'] == 'done', job['error']
+    return job['url']
+
+
+def sync_state(student_id):
+    with app.app_context():
+        state = db.session.get(SheetsSync, student_id)
+        return state.spreadsheet_id, state.last_log_id, state.next_row
+
+
+def test_repeat_exports_send_only_new_rows(family, api):
+    client, ids = family
+    url = f"/parent/child/{ids['kid']}/export?fmt=sheets_sync"
+
+    assert export(client, url) == 'https://docs.google.com/spreadsheets/d/sheet1'
+    assert [m for m, _ in api.calls] == ['create', 'batchUpdate', 'values.batchUpdate']
+    sheets = api.calls[0][1]['body']['sheets']
+    assert [s['properties']['title'] for s in sheets] == ['Журнал', 'Итоговый анализ']
+    assert 'QUERY' in str(sheets[1]['data'])
+    data = api.calls[2][1]['body']['data']
+    assert len(data) == 1 and data[0]['range'] == "'Журнал'!A2"
+    assert [row[3] for row in data[0]['values']] == [300.0, 700.0]
+    assert sync_state(ids['kid'])[2] == 3
+
+    # без новых логов и с теми же нормами — ни одного запроса
+    api.calls.clear()
+    assert export(client, url).endswith('/sheet1')
+    assert api.calls == []
+
+    # новый приём пищи — одна запись, только он и сразу под предыдущими строками
+    add_meal(ids['kid'], 450)
+    export(client, url)
+    assert [m for m, _ in api.calls] == ['values.batchUpdate']
+    data = api.calls[0][1]['body']['data']
+    assert data == [{'range': "'Журнал'!A4",
+                     'values': [['2025-03-02', '09:30', 'Каша', 450.0, 5.0, 5.0, 30.0, 3]]}]
+    assert sync_state(ids['kid']) == ('sheet1', 3, 4)
+
+
+def test_changed_targets_update_summary_in_place(family, api):
+    client, ids = family
+    url = f"/parent/child/{ids['kid']}/export?fmt=sheets_sync"
+    export(client, url)
+    api.calls.clear()
+
+    with app.app_context():
+        db.session.get(Student, ids['kid']).calories = 1800
+        db.session.commit()
+    export(client, url)
+    assert [m for m, _ in api.calls] == ['values.batchUpdate']
+    assert api.calls[0][1]['body']['data'] == [{'range': "'Итоговый анализ'!B2:E2",
+                                                'values': [[1800.0, 75.0, 60.0, 250.0]]}]
+
+    api.calls.clear()
+    export(client, url)
+    assert api.calls == []
+
+
+def test_deleted_spreadsheet_is_recreated(family, api):
+    client, ids = family
+    url = f"/parent/child/{ids['kid']}/export?fmt=sheets_sync"
+    export(client, url)
+    api.deleted.add('sheet1')
+    add_meal(ids['kid'], 450)
+
+    assert export(client, url).endswith('/sheet2')
+    # новая таблица получает всю историю
+    data = api.calls[-1][1]['body']['data']
+    assert api.calls[-1][1]['spreadsheetId'] == 'sheet2'
+    assert [row[7] for row in data[0]['values']] == [1, 2, 3]
+    assert sync_state(ids['kid']) == ('sheet2', 3, 4)
+
+
+def test_sync_job_returns_link(family, api):
+    client, ids = family
+    resp = client.post('/api/v1/exports', json={'student_id': ids['kid'], 'fmt': 'sync'})
+    assert resp.status_code == 202 and resp.get_json()['fmt'] == 'sheets_sync'
+    flask_app.export_jobs.wait(5)
+    job = client.get(resp.get_json()['status_url']).get_json()
+    assert job['status'] == 'done'
+    assert job['url'] == 'https://docs.google.com/spreadsheets/d/sheet1'
+
+
+def test_racing_first_exports_create_one_spreadsheet(family, api, monkeypatch):
+    client, ids = family
+    create = google_sheets.create_sync_spreadsheet
+    racer = {}
+
+    def create_while_other_worker_syncs(title, targets):
+        # вторая первая выгрузка приходит, пока первая создает таблицу
+        def other_worker():
+            with app.app_context():
+                try:
+                    sheets_sync.sync_student_sheet(db.session.get(Student, ids['kid']), {})
+                except Exception as e:
+                    racer['error'] = e
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        thread.join()
+        return create(title, targets)
+
+    monkeypatch.setattr(google_sheets, 'create_sync_spreadsheet', create_while_other_worker_syncs)
+    assert export(client, f"/parent/child/{ids['kid']}/export?fmt=sheets_sync").endswith('/sheet1')
+    # проигравшая выгрузка не создала своей таблицы
+    assert api.created == 1
+    assert isinstance(racer['error'], google_sheets.SheetsExportError)
+    assert sync_state(ids['kid']) == ('sheet1', 2, 3)
+
+
+def test_abandoned_reservation_is_taken_over(family, api):
+    client, ids = family
+    url = f"/parent/child/{ids['kid']}/export?fmt=sheets_sync"
+    with app.app_context():
+        db.session.add(SheetsSync(student_id=ids['kid'], spreadsheet_id=None, synced_at=datetime.utcnow()))
+        db.session.commit()
+    resp = client.get(url, headers={'Accept': 'application/json'})
+    flask_app.export_jobs.wait(5)
+    job = client.get(resp.get_json()['status_url']).get_json()
+    assert job['status'] == 'failed' and 'еще создается' in job['error']
+    assert api.created == 0
+
+    # воркер, занявший строку, упал — через RESERVATION_TIMEOUT ее забирает следующая выгрузка
+    with app.app_context():
+        db.session.get(SheetsSync, ids['kid']).synced_at -= sheets_sync.RESERVATION_TIMEOUT + timedelta(seconds=1)
+        db.session.commit()
+    assert export(client, url).endswith('/sheet1')
+    assert sync_state(ids['kid']) == ('sheet1', 2, 3)
+
+
+def test_failed_create_releases_reservation(family, api, monkeypatch):
+    client, ids = family
+
+    def quota_exceeded(title, targets):
+        raise google_sheets.SheetsQuotaError('quota')
+
+    monkeypatch.setattr(google_sheets, 'create_sync_spreadsheet', quota_exceeded)
+    with app.app_context():
+        with pytest.raises(google_sheets.SheetsQuotaError):
+            sheets_sync.sync_student_sheet(db.session.get(Student, ids['kid']), {})
+        assert db.session.get(SheetsSync, ids['kid']) is None
@@ -0,0 +1,49 @@
+import json
+import os
+
+from unittest import mock
+
+import flask_app
+from flask_app import TranslationCatalog
+
+
+def write_catalog(path, data, mtime):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+
+
+def test_nested_keys_are_flattened(tmp_path):
+    write_catalog(tmp_path / 'ru.json', {'welcome': 'Привет', 'auth': {'login': 'Вход'}}, 1000)
+    catalog = TranslationCatalog(tmp_path)
+
+    assert catalog.lookup('ru', 'auth.login') == 'Вход'
+    assert catalog.lookup('ru', 'welcome') == 'Привет'
+    assert catalog.get('ru')['auth']['login'] == 'Вход'
+
+
+def test_file_read_once_and_missing_keys_cached(tmp_path):
+    write_catalog(tmp_path / 'ru.json', {'welcome': 'Привет'}, 1000)
+    catalog = TranslationCatalog(tmp_path, check_interval=60)
+
+    with mock.patch.object(flask_app, 'load_translations', wraps=flask_app.load_translations) as loader:
+        for _ in range(50):
+            assert catalog.lookup('ru', 'welcome') == 'Привет'
+            assert catalog.lookup('ru', 'no.such.key') == ''
+    assert loader.call_count == 1
+
+
+def test_reload_on_mtime_change(tmp_path):
+    path = tmp_path / 'kk.json'
+    write_catalog(tmp_path / 'ru.json', {}, 1000)
+    write_catalog(path, {'welcome': 'Сәлем'}, 1000)
+    catalog = TranslationCatalog(tmp_path, check_interval=0)
+    assert catalog.lookup('kk', 'welcome') == 'Сәлем'
+
+    write_catalog(path, {'welcome': 'Қош келдіңіз'}, 2000)
+    assert catalog.lookup('kk', 'welcome') == 'Қош келдіңіз'
+
+
+def test_unknown_language_falls_back_to_ru(tmp_path):
+    write_catalog(tmp_path / 'ru.json', {'welcome': 'Привет'}, 1000)
+    catalog = TranslationCatalog(tmp_path)
+    assert catalog.lookup('de', 'welcome') == 'Привет'
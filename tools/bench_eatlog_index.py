@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Бенчмарк выборок EatLog до и после индекса (student_id, created_at).
+
+Usage:
+  python tools/bench_eatlog_index.py [--rows 10000000] [--students 5000] [--db path]
+
+Что делает:
+- создаёт временную SQLite-базу с таблицей eatlog (схема как в models.EatLog, без индекса)
+- заполняет её синтетическими логами (по умолчанию 10M строк)
+- замеряет типичные запросы горячих страниц (логи за сегодня, отчёт за год)
+- создаёт индекс ix_eatlog_student_created и повторяет замеры
+
+Генерация 10M строк занимает несколько минут и ~1 ГБ на диске.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+INDEX_NAME = 'ix_eatlog_student_created'
+
+QUERIES = {
+    'today (dashboard)': (
+        "SELECT * FROM eatlog WHERE student_id = ? AND created_at >= ? ORDER BY created_at",
+        lambda sid, now: (sid, (now - timedelta(hours=12)).isoformat(sep=' ')),
+    ),
+    'year (child_report)': (
+        "SELECT * FROM eatlog WHERE student_id = ? AND created_at >= ? AND created_at <= ? ORDER BY created_at",
+        lambda sid, now: (sid, (now - timedelta(days=365)).isoformat(sep=' '), now.isoformat(sep=' ')),
+    ),
+    'all (export)': (
+        "SELECT * FROM eatlog WHERE student_id = ? ORDER BY created_at",
+        lambda sid, now: (sid,),
+    ),
+}
+
+
+def create_schema(conn):
+    """Создаёт таблицу eatlog как в models.EatLog, но без индексов."""
+    conn.execute(
+        "CREATE TABLE eatlog ("
+        " id INTEGER PRIMARY KEY,"
+        " student_id INTEGER NOT NULL,"
+        " food_id INTEGER,"
+        " name VARCHAR(200) NOT NULL,"
+        " calories FLOAT NOT NULL,"
+        " protein FLOAT NOT NULL,"
+        " fat FLOAT NOT NULL,"
+        " carbs FLOAT NOT NULL,"
+        " created_at DATETIME NOT NULL)"
+    )
+
+
+def populate(conn, rows, students, batch=50_000):
+    now = datetime.utcnow()
+    span = 3 * 365 * 24 * 3600
+    inserted = 0
+    t0 = time.perf_counter()
+    while inserted < rows:
+        n = min(batch, rows - inserted)
+        data = []
+        for _ in range(n):
+            created = now - timedelta(seconds=random.randint(0, span))
+            data.append((random.randint(1, students), None, 'Блюдо', 250.0, 10.0, 8.0, 30.0,
+                         created.isoformat(sep=' ')))
+        conn.executemany(
+            "INSERT INTO eatlog (student_id, food_id, name, calories, protein, fat, carbs, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", data)
+        conn.commit()
+        inserted += n
+        print(f'\r  inserted {inserted}/{rows}', end='', flush=True)
+    print(f'\n  populate: {time.perf_counter() - t0:.1f}s')
+
+
+def run_queries(conn, students, repeats):
+    now = datetime.utcnow()
+    results = {}
+    for label, (sql, params) in QUERIES.items():
+        sids = [random.randint(1, students) for _ in range(repeats)]
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params(sids[0], now)).fetchall()
+        t0 = time.perf_counter()
+        for sid in sids:
+            conn.execute(sql, params(sid, now)).fetchall()
+        avg_ms = (time.perf_counter() - t0) / repeats * 1000
+        results[label] = avg_ms
+        print(f'  {label:22s} {avg_ms:10.2f} ms   plan: {plan[-1][-1]}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--students', type=int, default=5000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--db', default=None, help='путь к файлу БД (по умолчанию временный)')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_eatlog.db')
+    print(f'DB: {path}')
+    conn = sqlite3.connect(path)
+    try:
+        create_schema(conn)
+        populate(conn, args.rows, args.students)
+
+        print('Before index:')
+        before = run_queries(conn, args.students, args.repeats)
+
+        t0 = time.perf_counter()
+        conn.execute(f'CREATE INDEX {INDEX_NAME} ON eatlog (student_id, created_at)')
+        conn.commit()
+        print(f'Index build: {time.perf_counter() - t0:.1f}s')
+
+        print('After index:')
+        after = run_queries(conn, args.students, args.repeats)
+
+        print('Speedup:')
+        for label in QUERIES:
+            print(f'  {label:22s} x{before[label] / max(after[label], 1e-6):.0f}')
+    finally:
+        conn.close()
+        if not args.db:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
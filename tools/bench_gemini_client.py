@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Микробенчмарк подготовки клиента Gemini на один анализ фото (без сети).
+
+Usage:
+  python tools/bench_gemini_client.py [--calls 200]
+
+Что делает:
+- legacy — то, что раньше делал каждый вызов analyze_image_with_gemini:
+  load_dotenv(), import google.generativeai, genai.configure(api_key=...),
+  GenerativeModel('gemini-2.5-flash'), новый словарь схемы и GenerationConfig;
+  configure() сбрасывает клиентов SDK, поэтому generate_content каждый раз
+  строил новый GenerativeServiceClient (здесь он строится явно)
+- cached — food_detection_impl.get_client() (всё это один раз на процесс)
+- печатает первый вызов отдельно (холодный импорт SDK) и медиану остальных;
+  запросов к API нет, ключ — фиктивный. Новый клиент — это еще и новое
+  gRPC-соединение с TLS-рукопожатием на первом запросе; в бенчмарк без сети
+  оно не входит
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Ensure project root is on sys.path so imports work when script is run from any cwd
+proj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if proj_root not in sys.path:
+    sys.path.insert(0, proj_root)
+
+os.environ.setdefault('GEMINI_API_KEY', 'bench-not-a-real-key')
+
+import food_detection_impl
+
+
+def legacy_setup():
+    from dotenv import load_dotenv
+    load_dotenv()
+    import google.generativeai as genai
+    from google.generativeai import client as genai_client
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    schema = {
+        "type": "OBJECT",
+        "properties": {
+            "foodName": {"type": "STRING", "description": "Detected food name"},
+            "servingSize": {"type": "STRING", "description": "Estimated serving size"},
+            "calories": {"type": "NUMBER", "description": "Estimated calories"},
+            "protein": {"type": "NUMBER", "description": "Protein grams"},
+            "fat": {"type": "NUMBER", "description": "Fat grams"},
+            "carbohydrates": {"type": "NUMBER", "description": "Carbs grams"},
+        },
+        "required": ["foodName", "servingSize", "calories", "protein", "fat", "carbohydrates"],
+    }
+    model = genai.GenerativeModel('gemini-2.5-flash')
+    config = genai.types.GenerationConfig(response_mime_type='application/json', response_schema=schema)
+    return model, config, genai_client.get_default_generative_client()
+
+
+def cached_setup():
+    return food_detection_impl.get_client()
+
+
+def measure(fn, calls):
+    start = time.perf_counter()
+    fn()
+    first = time.perf_counter() - start
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return first, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200)
+    args = parser.parse_args()
+
+    # первым идёт legacy, поэтому холодный импорт SDK попадает в его первый вызов
+    for name, fn in (('legacy', legacy_setup), ('cached', cached_setup)):
+        first, per_call = measure(fn, args.calls)
+        print(f'{name:>7}: first call {first * 1000:.1f} ms, then {per_call * 1e6:.1f} us per call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Бенчмарк подготовки фото перед отправкой в Gemini: байты запроса и задержка.
+
+Usage:
+  python tools/bench_image_prep.py [--width 4032] [--height 3024] [--runs 3] [--uplink-mbit 10] [--max-edge 1024]
+  python tools/bench_image_prep.py --image path/to/photo.jpg
+
+Что делает:
+- берёт фото (по умолчанию синтетический JPEG с телефона 4032x3024 с EXIF)
+- готовит запрос двумя способами:
+  legacy — как раньше в food_detection_impl: Image.open + img.copy(); SDK
+  google.generativeai кодирует такой (не файловый) PIL-образ в lossless WebP
+  prepared — image_prep.load_for_analysis (draft + thumbnail) + JPEG без EXIF
+- печатает размер декодированного кадра, байты запроса, время подготовки и
+  оценку до ответа модели: подготовка + загрузка на uplink-mbit (+ --model-ms)
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Ensure project root is on sys.path so imports work when script is run from any cwd
+proj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if proj_root not in sys.path:
+    sys.path.insert(0, proj_root)
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from image_prep import encode_jpeg, load_for_analysis
+
+
+def make_photo(path, width, height):
+    """Похожий на фото JPEG: шум, размытые пятна и EXIF (поворот, «GPS»)."""
+    img = Image.effect_noise((width, height), 40).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        x, y = (i * 733) % width, (i * 419) % height
+        draw.ellipse((x, y, x + width // 4, y + height // 4), fill=(200 - i * 12, 90 + i * 10, 60 + i * 8))
+    img = img.filter(ImageFilter.GaussianBlur(2))
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    exif[0x010F] = 'PhoneMaker'
+    img.save(path, 'JPEG', quality=92, exif=exif.tobytes())
+
+
+def legacy(path):
+    with Image.open(path) as img:
+        img_copy = img.copy()
+    buf = io.BytesIO()
+    img_copy.save(buf, format='webp', lossless=True)
+    return img_copy.size, buf.getvalue()
+
+
+def prepared(path, max_edge):
+    img = load_for_analysis(path, max_edge)
+    return img.size, encode_jpeg(img)
+
+
+def measure(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size, data = fn()
+        times.append(time.perf_counter() - start)
+    return size, len(data), statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', help='готовое фото вместо синтетического')
+    parser.add_argument('--width', type=int, default=4032)
+    parser.add_argument('--height', type=int, default=3024)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--max-edge', type=int, default=1024)
+    parser.add_argument('--uplink-mbit', type=float, default=10.0, help='скорость канала до API, Мбит/с')
+    parser.add_argument('--model-ms', type=float, default=0.0, help='время ответа модели (добавляется к обоим)')
+    args = parser.parse_args()
+
+    path = args.image
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(), 'photo.jpg')
+        make_photo(path, args.width, args.height)
+    print(f'photo: {path} ({os.path.getsize(path) / 1024:.0f} KiB on disk)')
+
+    for name, fn in (('legacy', lambda: legacy(path)), ('prepared', lambda: prepared(path, args.max_edge))):
+        (w, h), sent, prep = measure(fn, args.runs)
+        upload = sent * 8 / (args.uplink_mbit * 1e6)
+        total = prep + upload + args.model_ms / 1000
+        print(f'{name:>9}: {w}x{h} ({w * h * 3 / 2**20:.1f} MiB RGB), sent {sent / 1024:.0f} KiB, '
+              f'prep {prep * 1000:.0f} ms, upload {upload * 1000:.0f} ms, total {total * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
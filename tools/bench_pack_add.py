@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Бенчмарк добавления пака: класс одновременно нажимает «Съел весь пак».
+
+Usage:
+  python tools/bench_pack_add.py [--students 30] [--dishes 6] [--rounds 5]
+
+Что делает:
+- создаёт временную базу (настройки SQLite как в приложении), учеников и пак из `dishes` блюд
+- `students` потоков одновременно логируют пак `rounds` раз каждый, двумя способами:
+  legacy — как раньше в pack_add (Eat.query.get и commit на каждое блюдо),
+  bulk — load_pack_foods (один JOIN) + add_logs (одна вставка) + один commit
+- печатает время, задержки на один пак, число SQL-запросов и commit'ов
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure project root is on sys.path so imports work when script is run from any cwd
+proj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if proj_root not in sys.path:
+    sys.path.insert(0, proj_root)
+
+# отдельная база, чтобы не трогать instance/school_food.db
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_pack_add.db')
+
+from sqlalchemy import event
+
+from flask_app import app, build_pack_log, load_pack_foods
+from daily_nutrition import add_log, add_logs
+from models import db, Eat, EatLog, Pack, PackItem, Student
+
+
+def legacy_pack_add(sid, pack_id):
+    items = PackItem.query.filter_by(pack_id=pack_id).all()
+    for it in items:
+        food = Eat.query.get(it.food_id)
+        if food:
+            try:
+                add_log(build_pack_log(sid, food, 1))
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+
+
+def bulk_pack_add(sid, pack_id):
+    foods = load_pack_foods(pack_id)
+    try:
+        add_logs([build_pack_log(sid, food, 1) for food in foods])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def seed(students, dishes):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        pack = Pack(week=1, day=1)
+        db.session.add(pack)
+        db.session.flush()
+        for i in range(dishes):
+            food = Eat(name=f'Блюдо {i}', calories=150, protein=6, fat=5, carbs=20, type='school', week=1, day=1)
+            db.session.add(food)
+            db.session.flush()
+            db.session.add(PackItem(pack_id=pack.id, food_id=food.id, ord=i + 1))
+        ids = []
+        for i in range(students):
+            student = Student(login=f'bench{i}', password='x')
+            db.session.add(student)
+            db.session.flush()
+            ids.append(student.id)
+        db.session.commit()
+        return pack.id, ids
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run(label, fn, pack_id, student_ids, rounds):
+    counters = {'queries': 0, 'commits': 0}
+    lock = threading.Lock()
+
+    def on_execute(*args):
+        with lock:
+            counters['queries'] += 1
+
+    def on_commit(conn):
+        with lock:
+            counters['commits'] += 1
+
+    with app.app_context():
+        EatLog.query.delete()
+        db.session.commit()
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', on_execute)
+    event.listen(engine, 'commit', on_commit)
+
+    latencies = []
+
+    def student(sid):
+        with app.app_context():
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                fn(sid, pack_id)
+                latencies.append(time.perf_counter() - t0)
+            db.session.remove()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(student_ids)) as pool:
+        list(pool.map(student, student_ids))
+    elapsed = time.perf_counter() - t0
+    event.remove(engine, 'before_cursor_execute', on_execute)
+    event.remove(engine, 'commit', on_commit)
+
+    with app.app_context():
+        logged = EatLog.query.count()
+    packs = len(student_ids) * rounds
+    print(f'{label}:')
+    print(f'  {packs} packs ({logged} logs) in {elapsed:.2f}s, {packs / elapsed:.0f} packs/s')
+    print(f'  per pack ms  p50={percentile(latencies, 0.5) * 1000:.1f} p95={percentile(latencies, 0.95) * 1000:.1f}')
+    print(f'  SQL statements {counters["queries"]} ({counters["queries"] / packs:.1f}/pack), '
+          f'commits {counters["commits"]} ({counters["commits"] / packs:.1f}/pack)')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--dishes', type=int, default=6)
+    parser.add_argument('--rounds', type=int, default=5, help='сколько раз каждый ученик добавляет пак')
+    args = parser.parse_args()
+
+    pack_id, student_ids = seed(args.students, args.dishes)
+    print(f'{args.students} concurrent students, {args.dishes}-dish pack, {args.rounds} rounds')
+    legacy = run('legacy (per-dish get + commit)', legacy_pack_add, pack_id, student_ids, args.rounds)
+    bulk = run('bulk (join + single insert + one commit)', bulk_pack_add, pack_id, student_ids, args.rounds)
+    print(f'Speedup x{legacy / max(bulk, 1e-9):.1f}')
+
+
+if __name__ == '__main__':
+    main()
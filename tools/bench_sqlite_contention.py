@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Бенчмарк конкурентной записи в SQLite: обеденный час, все ученики логируют еду.
+
+Usage:
+  python tools/bench_sqlite_contention.py [--workers 9] [--threads 2] [--meals 200] [--readers 1]
+
+Что делает:
+- моделирует gunicorn (workers процессов × threads потоков), каждый поток
+  записывает `meals` приёмов пищи: INSERT в eatlog + обновление daily_nutrition
+  в одной транзакции (как daily_nutrition.add_log)
+- параллельно в каждом процессе `readers` потоков читают логи за сегодня (dashboard)
+- прогоняет сценарий дважды: с настройками SQLite по умолчанию (rollback-журнал)
+  и с PRAGMA из sqlite_tuning.DEFAULT_PRAGMAS
+- печатает пропускную способность, задержки записи/чтения и число ошибок "database is locked"
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Ensure project root is on sys.path so imports work when script is run from any cwd
+proj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if proj_root not in sys.path:
+    sys.path.insert(0, proj_root)
+
+from sqlite_tuning import DEFAULT_PRAGMAS, apply_pragmas
+
+STUDENTS = 2000
+
+
+def create_schema(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        "CREATE TABLE eatlog ("
+        " id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL, food_id INTEGER,"
+        " name VARCHAR(200) NOT NULL, calories FLOAT NOT NULL, protein FLOAT NOT NULL,"
+        " fat FLOAT NOT NULL, carbs FLOAT NOT NULL, created_at DATETIME NOT NULL);"
+        "CREATE INDEX ix_eatlog_student_created ON eatlog (student_id, created_at);"
+        "CREATE TABLE daily_nutrition ("
+        " student_id INTEGER NOT NULL, day DATE NOT NULL, calories FLOAT NOT NULL,"
+        " protein FLOAT NOT NULL, fat FLOAT NOT NULL, carbs FLOAT NOT NULL,"
+        " log_count INTEGER NOT NULL, PRIMARY KEY (student_id, day));"
+    )
+    conn.commit()
+    conn.close()
+
+
+def connect(path, tuned):
+    # у каждого потока своё соединение, как у воркера gunicorn из пула SQLAlchemy
+    conn = sqlite3.connect(path)
+    if tuned:
+        apply_pragmas(conn, DEFAULT_PRAGMAS)
+    return conn
+
+
+def log_meal(conn, student_id):
+    now = datetime.utcnow()
+    conn.execute(
+        "INSERT INTO eatlog (student_id, food_id, name, calories, protein, fat, carbs, created_at) "
+        "VALUES (?, 1, 'Обед', 550, 20, 15, 70, ?)", (student_id, now.isoformat(sep=' ')))
+    cur = conn.execute(
+        "UPDATE daily_nutrition SET calories = calories + 550, protein = protein + 20, "
+        "fat = fat + 15, carbs = carbs + 70, log_count = log_count + 1 "
+        "WHERE student_id = ? AND day = ?", (student_id, now.date().isoformat()))
+    if cur.rowcount == 0:
+        conn.execute(
+            "INSERT INTO daily_nutrition (student_id, day, calories, protein, fat, carbs, log_count) "
+            "VALUES (?, ?, 550, 20, 15, 70, 1)", (student_id, now.date().isoformat()))
+    conn.commit()
+
+
+def writer_thread(path, tuned, meals, latencies, errors):
+    conn = connect(path, tuned)
+    for _ in range(meals):
+        t0 = time.perf_counter()
+        try:
+            log_meal(conn, random.randint(1, STUDENTS))
+            latencies.append(time.perf_counter() - t0)
+        except sqlite3.OperationalError:
+            conn.rollback()
+            errors.append(1)
+    conn.close()
+
+
+def reader_thread(path, tuned, stop, latencies, errors):
+    conn = connect(path, tuned)
+    start_of_day = datetime.combine(datetime.utcnow().date(), datetime.min.time()).isoformat(sep=' ')
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            conn.execute(
+                "SELECT * FROM eatlog WHERE student_id = ? AND created_at >= ? ORDER BY created_at",
+                (random.randint(1, STUDENTS), start_of_day)).fetchall()
+            latencies.append(time.perf_counter() - t0)
+        except sqlite3.OperationalError:
+            errors.append(1)
+    conn.close()
+
+
+def worker_process(args):
+    path, tuned, threads, meals, readers = args
+    write_lat, read_lat, write_err, read_err = [], [], [], []
+    stop = threading.Event()
+    rthreads = [threading.Thread(target=reader_thread, args=(path, tuned, stop, read_lat, read_err))
+                for _ in range(readers)]
+    wthreads = [threading.Thread(target=writer_thread, args=(path, tuned, meals, write_lat, write_err))
+                for _ in range(threads)]
+    for t in rthreads + wthreads:
+        t.start()
+    for t in wthreads:
+        t.join()
+    stop.set()
+    for t in rthreads:
+        t.join()
+    return write_lat, read_lat, len(write_err), len(read_err)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(label, tuned, args):
+    path = os.path.join(tempfile.mkdtemp(), 'bench_contention.db')
+    create_schema(path)
+    jobs = [(path, tuned, args.threads, args.meals, args.readers) for _ in range(args.workers)]
+    t0 = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.map(worker_process, jobs)
+    elapsed = time.perf_counter() - t0
+
+    write_lat = [x for r in results for x in r[0]]
+    read_lat = [x for r in results for x in r[1]]
+    write_err = sum(r[2] for r in results)
+    read_err = sum(r[3] for r in results)
+    print(f'{label}:')
+    print(f'  meals logged      {len(write_lat)} in {elapsed:.2f}s ({len(write_lat) / elapsed:.0f}/s), '
+          f'locked errors: {write_err}')
+    print(f'  write latency ms  p50={percentile(write_lat, 0.5) * 1000:.2f} '
+          f'p95={percentile(write_lat, 0.95) * 1000:.2f} max={max(write_lat or [0]) * 1000:.2f}')
+    print(f'  reads             {len(read_lat)} (errors: {read_err}), '
+          f'p50={percentile(read_lat, 0.5) * 1000:.2f} ms p95={percentile(read_lat, 0.95) * 1000:.2f} ms')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return len(write_lat) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count() * 2 + 1)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--meals', type=int, default=200, help='приёмов пищи на поток')
+    parser.add_argument('--readers', type=int, default=1, help='читающих потоков на процесс')
+    args = parser.parse_args()
+
+    print(f'{args.workers} workers x {args.threads} threads, {args.meals} meals per thread, '
+          f'{args.readers} reader(s) per worker')
+    baseline = run('default (rollback journal)', False, args)
+    tuned = run('tuned (' + ', '.join(f'{k}={v}' for k, v in DEFAULT_PRAGMAS.items()) + ')', True, args)
+    print(f'Throughput x{tuned / max(baseline, 1e-6):.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Бенчмарк Excel-экспорта всей истории ребёнка: память и время.
+
+Usage:
+  python tools/bench_xlsx_export.py [--days 365] [--per-day 8]
+
+Что делает:
+- создаёт временную базу с историей одного ученика (`days` дней по `per_day` блюд)
+- строит отчёт двумя способами:
+  legacy — как раньше в export_child_year (все логи в память, ws.cell на каждую ячейку,
+  повторный обход ячеек для ширин, книга целиком в BytesIO)
+  write-only — xlsx_column_widths + write_xlsx (порции из курсора, write-only книга во временный файл)
+- печатает время и пиковую память (tracemalloc) для каждого способа
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Ensure project root is on sys.path so imports work when script is run from any cwd
+proj_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if proj_root not in sys.path:
+    sys.path.insert(0, proj_root)
+
+# отдельная база, чтобы не трогать instance/school_food.db
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_xlsx_export.db')
+
+from sqlalchemy import insert
+
+from flask_app import app
+from models import db, EatLog, Student
+from nutrition_export import iter_events, iter_logs, write_xlsx, xlsx_column_widths
+
+TARGETS = {'calories': 2000.0, 'protein': 75.0, 'fat': 67.0, 'carbs': 275.0}
+
+
+def seed(days, per_day):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        student = Student(login='bench', password='x', calories=2000)
+        db.session.add(student)
+        db.session.flush()
+        start = datetime(2025, 1, 1, 8, 0)
+        rows = []
+        for d in range(days):
+            for i in range(per_day):
+                rows.append({'student_id': student.id, 'food_id': None, 'name': f'Блюдо {i} с гарниром',
+                             'calories': 150.0 + i, 'protein': 6.0, 'fat': 5.0, 'carbs': 20.0,
+                             'created_at': start + timedelta(days=d, minutes=30 * i)})
+        db.session.execute(insert(EatLog), rows)
+        db.session.commit()
+        return student.id
+
+
+def legacy_export(student_id, title_lines):
+    from openpyxl import Workbook
+    from openpyxl.styles import Font
+
+    logs = EatLog.query.filter_by(student_id=student_id).order_by(EatLog.created_at).all()
+    daily = defaultdict(list)
+    for l in logs:
+        daily[l.created_at.date().isoformat()].append(l)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Nutrition'
+    bold = Font(bold=True)
+    row = 1
+    for line in title_lines:
+        ws.cell(row=row, column=1, value=line)
+        row += 2
+    for date_key in sorted(daily.keys()):
+        ws.cell(row=row, column=1, value=date_key).font = bold
+        row += 1
+        for col, h in enumerate(['Время', 'Блюдо', 'Калории', 'Белки', 'Жиры', 'Углеводы'], start=1):
+            ws.cell(row=row, column=col, value=h).font = bold
+        row += 1
+        total = defaultdict(float)
+        for l in daily[date_key]:
+            ws.cell(row=row, column=1, value=l.created_at.time().strftime('%H:%M'))
+            ws.cell(row=row, column=2, value=l.name)
+            for col, k in enumerate(('calories', 'protein', 'fat', 'carbs'), start=3):
+                value = float(getattr(l, k) or 0)
+                ws.cell(row=row, column=col, value=round(value, 1))
+                total[k] += value
+            row += 1
+        ws.cell(row=row, column=1, value='Итого за день:').font = bold
+        for col, k in enumerate(('calories', 'protein', 'fat', 'carbs'), start=3):
+            ws.cell(row=row, column=col, value=round(total[k], 1))
+        row += 1
+        ws.cell(row=row, column=1, value='Отклонение').font = bold
+        for col, k in enumerate(('calories', 'protein', 'fat', 'carbs'), start=3):
+            diff = round(total[k] - TARGETS[k], 1)
+            c = ws.cell(row=row, column=col, value=f'+{diff}' if diff > 0 else (f'-{abs(diff)}' if diff < 0 else '0'))
+            if diff:
+                c.font = Font(color='00FF0000' if diff > 0 else '000000FF', bold=True)
+        row += 1
+        ws.cell(row=row, column=1, value='Норма:')
+        for col, k in enumerate(('calories', 'protein', 'fat', 'carbs'), start=3):
+            ws.cell(row=row, column=col, value=round(TARGETS[k], 1))
+        row += 2
+    for col in range(1, 7):
+        max_len = 0
+        for r in range(1, row):
+            v = ws.cell(row=r, column=col).value
+            if v is not None:
+                max_len = max(max_len, len(str(v)))
+        ws.column_dimensions[chr(64 + col)].width = min(50, max(10, max_len + 2))
+    bio = io.BytesIO()
+    wb.save(bio)
+    return len(bio.getvalue())
+
+
+def write_only_export(student_id, title_lines):
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        widths = xlsx_column_widths(student_id, title_lines, TARGETS)
+        write_xlsx(path, iter_events(iter_logs(student_id), TARGETS), title_lines, TARGETS, widths)
+        return os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+
+def measure(label, fn, student_id):
+    title_lines = ['Отчёт питания за год — bench', 'Период: 2025-01-01 — 2025-12-31']
+    with app.app_context():
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        size = fn(student_id, title_lines)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    print(f'{label}: {elapsed:.2f}s, peak {peak / 1024 / 1024:.1f} MiB, file {size / 1024:.0f} KiB')
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=8, help='сколько блюд в день')
+    args = parser.parse_args()
+
+    student_id = seed(args.days, args.per_day)
+    print(f'{args.days * args.per_day} logs over {args.days} days')
+    legacy_time, legacy_peak = measure('legacy (in-memory workbook)', legacy_export, student_id)
+    new_time, new_peak = measure('write-only (temp file)', write_only_export, student_id)
+    print(f'Peak memory x{legacy_peak / max(new_peak, 1):.1f} lower, time x{legacy_time / max(new_time, 1e-9):.1f}')
+
+
+if __name__ == '__main__':
+    main()